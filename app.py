@@ -17,11 +17,19 @@ import time
 import sys
 import subprocess
 import uuid
-from config import MONGO_DB_NAME, MONGO_ENV, APP_LOGS_PER_PAGE_HOME, FYERS_REDIRECT_URI, ACCESS_TOKEN_VALIDITY, REFRESH_TOKEN_VALIDITY, STRATEGY_CAPITAL, MAX_TRADE_VALUE, MA_PERIOD
+from config import QUOTE_REPLAY_SOURCE, QUOTE_MAX_AGE_DISPLAY
+from config import MONGO_DB_NAME, MONGO_ENV, APP_LOGS_PER_PAGE_HOME, APP_LOGS_PER_DAY_PAGE, FYERS_REDIRECT_URI, ACCESS_TOKEN_VALIDITY, REFRESH_TOKEN_VALIDITY, STRATEGY_CAPITAL, MAX_TRADE_VALUE, MA_PERIOD
 
 # Import Connectors
 from connectors.fyers import FyersConnector
 from connectors.zerodha import ZerodhaConnector
+from connectors.registry import connector_registry
+from connectors.circuit_breaker import broker_health
+from connectors.models import Holding
+from connectors.quote_cache import quote_cache
+from connectors.quote_stream import replay_stream_from_config
+from holdings_snapshots import HoldingsSnapshotService
+from daily_activity import DailyActivityStore
 
 # Define timezones
 UTC = pytz.utc
@@ -82,6 +90,41 @@ else:
     # ... (Handlers for no DB)
     sys.exit(1)
 
+# Last known holdings per broker account, served to pages while they refresh in the background
+holdings_snapshots = HoldingsSnapshotService(db)
+
+# Log / trade counts per account and IST day (dashboard pagination)
+activity_store = DailyActivityStore(db)
+
+# Replayed quote feed for offline dashboard load tests (test environment only): ticks land in quote_cache
+quote_stream = replay_stream_from_config(QUOTE_REPLAY_SOURCE, env=MONGO_ENV, loop=True) if QUOTE_REPLAY_SOURCE else None
+if quote_stream:
+    quote_stream.subscribe(quote_stream.symbols)
+    quote_stream.start()
+
+def broker_token_live(broker):
+    """Basic check that the account's access token hasn't expired (no API call)."""
+    gen_at = broker.get('token_generated_at')
+    if isinstance(gen_at, (int, float)): gen_at = datetime.fromtimestamp(gen_at, tz=UTC)
+    elif gen_at and gen_at.tzinfo is None: gen_at = UTC.localize(gen_at)
+    if not gen_at:
+        return False
+    age = (datetime.now(UTC) - gen_at).total_seconds()
+    if broker.get('broker_type') == 'zerodha':
+        return age < 86400
+    if broker.get('broker_type') == 'fyers':
+        return age < ACCESS_TOKEN_VALIDITY
+    return False
+
+def snapshot_note(b_name, snapshot):
+    """Flash text for a holdings snapshot served despite a failed refresh, or None."""
+    if not snapshot.last_error:
+        return None
+    if snapshot.fetched_at is None:
+        return f"{b_name}: Failed to fetch positions ({snapshot.last_error})."
+    as_of = snapshot.fetched_at.astimezone(IST).strftime('%d %b %H:%M')
+    return f"{b_name}: {snapshot.last_error}; showing holdings as of {as_of}."
+
 @app.before_request
 def load_logged_in_user():
     g.user = None
@@ -176,6 +219,7 @@ def not_found(error):
 
 # --- Admin Routes ---
 from utils.email_notifications import send_approval_email, send_removal_email
+from utils.symbol_registry import symbol_registry
 
 @app.route('/admin')
 @admin_required
@@ -547,18 +591,10 @@ def is_token_valid(broker, token_data):
     # Verify with API
     try:
         if broker == 'fyers':
-            temp_connector = FyersConnector(
-                api_key=FYERS_CLIENT_ID,
-                api_secret=FYERS_SECRET_ID,
-                access_token=token_data['access_token']
-            )
+            temp_connector = connector_registry.get('fyers', FYERS_CLIENT_ID, FYERS_SECRET_ID, token_data['access_token'])
             return temp_connector.is_token_valid()
         elif broker == 'zerodha':
-            temp_connector = ZerodhaConnector(
-                api_key=ZERODHA_API_KEY,
-                api_secret=ZERODHA_API_SECRET,
-                access_token=token_data['access_token']
-            )
+            temp_connector = connector_registry.get('zerodha', ZERODHA_API_KEY, ZERODHA_API_SECRET, token_data['access_token'])
             return temp_connector.is_token_valid()
     except Exception as e:
         print(f"[ERROR] Error validating {broker} token via API: {e}")
@@ -696,22 +732,13 @@ def _deprecated_dashboard_old():
                 broker_errors.append(f"{b_name}: Token expired.")
                 continue
 
+            if not broker_health.available(b_type, 'holdings'):
+                broker_errors.append(f"{b_name}: Broker API degraded, skipped.")
+                continue
+
             # Initialize Connector
-            if b_type == 'fyers':
-                 client_id = broker.get('client_id') or broker.get('api_key')
-                 secret_id = broker.get('secret_id') or broker.get('api_secret')
-                 connector = FyersConnector(
-                     api_key=client_id, 
-                     api_secret=secret_id, 
-                     access_token=broker.get('access_token'),
-                     pin=broker.get('pin')
-                 )
-            elif b_type == 'zerodha':
-                 connector = ZerodhaConnector(
-                     api_key=broker.get('api_key'),
-                     api_secret=broker.get('api_secret'),
-                     access_token=broker.get('access_token')
-                 )
+            if b_type in ('fyers', 'zerodha'):
+                 connector = connector_registry.for_account(broker)
             
             if connector:
                 active_connectors.append(connector)
@@ -720,20 +747,18 @@ def _deprecated_dashboard_old():
                 try:
                     b_holdings = connector.get_holdings()
                     for p in b_holdings:
-                        qty = p.get('quantity', 0)
-                        if qty != 0:
-                            holdings_pnl += p.get('pl', 0)
+                        if p.quantity != 0:
+                            holdings_pnl += p.pnl
                             open_positions_count += 1
                             
                             # For capital calc
-                            cost = p.get('costPrice', 0)
-                            pos_value = cost * abs(qty)
+                            pos_value = p.avg_price * abs(p.quantity)
                             used_capital += pos_value
                             broker_used_capital += pos_value
                             num_positions += 1
                             
                             # Append to raw positions (maybe add broker tag?)
-                            p['broker'] = b_name
+                            p.broker = b_name
                             raw_positions.append(p)
                 except Exception as e:
                     print(f"Error fetching holdings for {b_name}: {e}")
@@ -921,8 +946,7 @@ def _deprecated_dashboard_old():
 @app.route('/trading-overview')
 @login_required
 def trading_overview():
-    # --- Broker Management & Connector Initialization ---
-    active_connectors = []
+    # --- Broker Management ---
     current_positions = []
     
     # Get all enabled brokers for dropdown
@@ -934,81 +958,52 @@ def trading_overview():
     # Filter brokers for processing positions
     brokers_to_process = all_brokers
     if selected_broker_id != 'all':
-        brokers_to_process = [b for b in all_brokers if b['broker_id'] == selected_broker_id]
+        brokers_to_process = [b for b in all_brokers if b.get('broker_id') == selected_broker_id]
         if not brokers_to_process:
             selected_broker_id = 'all'
             brokers_to_process = all_brokers
 
     
+    live_brokers = []
     for broker in brokers_to_process:
-        b_type = broker.get('broker_type')
-        b_name = broker.get('display_name', b_type)
-        connector = None
-        
-        try:
-            # Check Token Validity (Basic Check)
-            gen_at = broker.get('token_generated_at')
-            if isinstance(gen_at, (int, float)): gen_at = datetime.fromtimestamp(gen_at, tz=UTC)
-            elif gen_at and gen_at.tzinfo is None: gen_at = UTC.localize(gen_at)
-            
-            is_valid = False
-            if gen_at:
-                age = (datetime.now(UTC) - gen_at).total_seconds()
-                if b_type == 'zerodha':
-                     if age < 86400: is_valid = True
-                elif b_type == 'fyers':
-                     if age < ACCESS_TOKEN_VALIDITY: is_valid = True
-            
-            if not is_valid:
-                flash(f"{b_name}: Token expired.", "warning")
-                continue
-
-            # Initialize Connector
-            if b_type == 'fyers':
-                 client_id = broker.get('client_id') or broker.get('api_key')
-                 secret_id = broker.get('secret_id') or broker.get('api_secret')
-                 connector = FyersConnector(
-                     api_key=client_id, 
-                     api_secret=secret_id, 
-                     access_token=broker.get('access_token'),
-                     pin=broker.get('pin')
-                 )
-            elif b_type == 'zerodha':
-                 connector = ZerodhaConnector(
-                     api_key=broker.get('api_key'),
-                     api_secret=broker.get('api_secret'),
-                     access_token=broker.get('access_token')
-                 )
-            
-            if connector:
-                active_connectors.append(connector)
-                
-                # Fetch Holdings
-                try:
-                    b_holdings = connector.get_holdings()
-                    for p in b_holdings:
-                        if p.get('quantity', 0) != 0:
-                            cost_price = p.get('costPrice', 0)
-                            pnl = p.get('pl', 0)
-                            pnl_pct = (pnl / (cost_price * p.get('quantity', 1))) * 100 if cost_price > 0 else 0
-                            invested_val = cost_price * p.get('quantity', 0)
-            
-                            current_positions.append({
-                                'symbol': p.get('symbol'),
-                                'quantity': p.get('quantity'),
-                                'avg_price': cost_price,
-                                'current_price': p.get('ltp'),
-                                'invested_value': invested_val,
-                                'pnl': pnl,
-                                'pnl_pct': pnl_pct,
-                                'broker': b_name
-                            })
-                except Exception as e:
-                    print(f"Error fetching holdings for {b_name}: {e}")
-                    flash(f"{b_name}: Failed to fetch positions.", "warning")
+        if broker.get('broker_type') not in ('fyers', 'zerodha') or not broker.get('broker_id'):
+            continue
+        if broker_token_live(broker):
+            live_brokers.append(broker)
+        else:
+            flash(f"{broker.get('display_name', broker.get('broker_type'))}: Token expired.", "warning")
 
-        except Exception as e:
-             print(f"Error initializing {b_name}: {e}")
+    # Stored snapshots (refreshed in the background once stale) instead of a broker call per page load
+    try:
+        snapshots = holdings_snapshots.get(live_brokers)
+    except Exception as e:
+        print(f"Error loading holdings snapshots: {e}")
+        snapshots = {}
+
+    for broker in live_brokers:
+        b_name = broker.get('display_name', broker.get('broker_type'))
+        snapshot = snapshots.get(broker.get('broker_id'))
+        if snapshot is None:
+            flash(f"{b_name}: Failed to fetch positions.", "warning")
+            continue
+        note = snapshot_note(b_name, snapshot)
+        if note:
+            flash(note, "warning")
+        for p in snapshot.holdings:
+            if p.quantity != 0:
+                # Latest tick (quote stream / recent quotes) when newer than the holdings LTP
+                current_price = quote_cache.get(p.symbol, QUOTE_MAX_AGE_DISPLAY) or p.ltp
+                pnl = (current_price - p.avg_price) * p.quantity if current_price != p.ltp else p.pnl
+                current_positions.append({
+                    'symbol': p.symbol,
+                    'quantity': p.quantity,
+                    'avg_price': p.avg_price,
+                    'current_price': current_price,
+                    'invested_value': p.invested,
+                    'pnl': pnl,
+                    'pnl_pct': pnl / p.invested * 100 if p.invested > 0 else 0.0,
+                    'broker': b_name
+                })
 
 
     # Removed duplicated holdings fetch block as it's handled in the loop above
@@ -1050,19 +1045,14 @@ def trading_overview():
                  # If tokens expired, we just skip sync silently or log.
                  
                  # Instantiate
+                 # Raw SDK client of the pooled connector (FyersModel / KiteConnect): it raises
+                 # on failure, where the connector would report an empty portfolio
                  broker_instance = None
-                 if b_type == 'fyers':
-                      # Fetch Token
-                      token_doc = db['fyers_tokens'].find_one({'broker_id': b_id})
-                      if token_doc and token_doc.get('access_token'):
-                           from fyers_apiv3 import fyersModel
-                           broker_instance = fyersModel.FyersModel(client_id=b_conf['client_id'], token=token_doc['access_token'], log_path=os.getcwd())
-                 
-                 elif b_type == 'zerodha':
-                      token_doc = db['zerodha_tokens'].find_one({'broker_id': b_id})
+                 if b_type in ('fyers', 'zerodha') and broker_health.available(b_type):
+                      token_doc = db[f'{b_type}_tokens'].find_one({'broker_id': b_id})
                       if token_doc and token_doc.get('access_token'):
-                           from kiteconnect import KiteConnect
-                           broker_instance = KiteConnect(api_key=b_conf['api_key'], access_token=token_doc['access_token'])
+                           connector = connector_registry.for_account({**b_conf, 'broker_type': b_type, 'access_token': token_doc['access_token']})
+                           broker_instance = connector.fyers if b_type == 'fyers' else connector.kite
                  
                  if broker_instance:
                       # Call Helper
@@ -1283,6 +1273,16 @@ def logs_page():
         return "Database connection failed. Please check your MongoDB URI in files.txt"
     return render_template('logs.html', active_page='logs')
 
+@app.route('/api/broker-health')
+@login_required
+def api_broker_health():
+    """Circuit breaker state per broker endpoint (open = calls fail fast)."""
+    breakers = broker_health.snapshot()
+    return jsonify({
+        "brokers": {b_type: broker_health.status(b_type) for b_type in sorted({b['broker_type'] for b in breakers})},
+        "endpoints": breakers
+    })
+
 @app.route('/api/logs')
 @login_required
 def api_logs():
@@ -1322,6 +1322,29 @@ def api_logs():
 
     return jsonify({"logs": all_logs, "has_more": has_more, "next_page": page + 1})
 
+@app.route('/api/daily-logs/<date_str>')
+@login_required
+def api_daily_logs(date_str):
+    """One IST day's logs for the dashboard's expandable log table."""
+    if db is None:
+        return jsonify({"error": "Database connection failed."}), 500
+    try:
+        day = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({"error": "Invalid date."}), 400
+
+    page = request.args.get('page', 1, type=int)
+    broker_id = request.args.get('broker')
+    logs, has_more = activity_store.logs_for_day(
+        g.user['username'],
+        broker_id if broker_id and broker_id != 'all' else None,
+        day,
+        skip=(page - 1) * APP_LOGS_PER_DAY_PAGE
+    )
+    for log in logs:
+        log['timestamp'] = log['timestamp'].strftime('%H:%M:%S')
+    return jsonify({"logs": logs, "has_more": has_more, "next_page": page + 1})
+
 @app.route('/token-refresh')
 @login_required
 def token_refresh():
@@ -1643,6 +1666,9 @@ def run_executor(run_type="scheduled", broker_id=None, run_id=None):
             print(result.stderr, file=sys.stderr)
             
         # executor.py handles the success DB record.
+        # Orders may have changed the holdings: refresh the snapshot on the next page load
+        if broker_id:
+            holdings_snapshots.invalidate(broker_id)
     except subprocess.CalledProcessError as e:
         # Print error output to terminal
         if e.stdout:
@@ -1788,8 +1814,7 @@ def dashboard():
             flash("Database connection error.", "error")
             return render_template('login.html')
 
-        # --- Broker Management & Connector Initialization ---
-        active_connectors = []
+        # --- Broker Management ---
         broker_errors = []
         
         # Get all enabled brokers for dropdown (User Filtered)
@@ -1817,69 +1842,34 @@ def dashboard():
         total_positions_can_open = 0
         total_strategy_capital = 0  
         
+        # Stored holdings snapshots: served immediately, refreshed concurrently in the background
+        live_brokers = [b for b in brokers_to_process
+                        if b.get('broker_type') in ('fyers', 'zerodha') and b.get('broker_id') and broker_token_live(b)]
+        try:
+            snapshots = holdings_snapshots.get(live_brokers)
+        except Exception as e:
+            print(f"Error loading holdings snapshots: {e}")
+            snapshots = {}
+
         for broker in brokers_to_process:
-            b_type = broker.get('broker_type')
-            b_name = broker.get('display_name', b_type)
-            connector = None
+            b_name = broker.get('display_name', broker.get('broker_type'))
             broker_used_capital = 0 
             
-            try:
-                # Check Token Validity (Basic Check)
-                gen_at = broker.get('token_generated_at')
-                if isinstance(gen_at, (int, float)): gen_at = datetime.fromtimestamp(gen_at, tz=UTC)
-                elif gen_at and gen_at.tzinfo is None: gen_at = UTC.localize(gen_at)
-                
-                is_valid = False
-                if gen_at:
-                    age = (datetime.now(UTC) - gen_at).total_seconds()
-                    if b_type == 'zerodha':
-                         if age < 86400: is_valid = True
-                    elif b_type == 'fyers':
-                         if age < ACCESS_TOKEN_VALIDITY: is_valid = True
-                
-                if not is_valid:
-                    # Silently skip API calls for expired tokens to prevent slow load/errors
-                    pass
-                else:
-                    # Initialize Connector
-                    if b_type == 'fyers':
-                         client_id = broker.get('client_id') or broker.get('api_key')
-                         secret_id = broker.get('secret_id') or broker.get('api_secret')
-                         connector = FyersConnector(
-                             api_key=client_id, 
-                             api_secret=secret_id, 
-                             access_token=broker.get('access_token'),
-                             pin=broker.get('pin')
-                         )
-                    elif b_type == 'zerodha':
-                         connector = ZerodhaConnector(
-                             api_key=broker.get('api_key'),
-                             api_secret=broker.get('api_secret'),
-                             access_token=broker.get('access_token')
-                         )
-                
-                if connector:
-                    active_connectors.append(connector)
-                    # Fetch Holdings
-                    try:
-                        b_holdings = connector.get_holdings()
-                        for p in b_holdings:
-                            qty = p.get('quantity', 0)
-                            if qty != 0:
-                                holdings_pnl += p.get('pl', 0)
-                                open_positions_count += 1
-                                cost = p.get('costPrice', 0)
-                                pos_value = cost * abs(qty)
-                                used_capital += pos_value
-                                broker_used_capital += pos_value
-                                num_positions += 1
-                                p['broker'] = b_name
-                                raw_positions.append(p)
-                    except Exception as e:
-                        print(f"Error fetching holdings for {b_name}: {e}")
-
-            except Exception as e:
-                 print(f"Error initializing {b_name}: {e}")
+            snapshot = snapshots.get(broker.get('broker_id'))
+            if snapshot is not None:
+                note = snapshot_note(b_name, snapshot)
+                if note:
+                    broker_errors.append(note)
+                for p in snapshot.holdings:
+                    if p.quantity != 0:
+                        holdings_pnl += p.pnl
+                        open_positions_count += 1
+                        pos_value = p.avg_price * abs(p.quantity)
+                        used_capital += pos_value
+                        broker_used_capital += pos_value
+                        num_positions += 1
+                        p.broker = b_name
+                        raw_positions.append(p)
             
             # Calculate per-broker metrics
             b_capital = broker.get('capital', 0)
@@ -1909,53 +1899,28 @@ def dashboard():
         page = request.args.get('page', 1, type=int)
         skip_days = (page - 1) * APP_LOGS_PER_PAGE_HOME
         
-        # Date Query Filters
-        date_filter_logs = {**user_filter, "timestamp": {"$ne": None}}
-        date_filter_trades = {**user_filter, "date": {"$ne": None}}
-        
-        if selected_broker_id != 'all':
-            date_filter_logs['broker_id'] = selected_broker_id
-            date_filter_trades['broker_id'] = selected_broker_id
-
-        distinct_log_dates = db[f"logs_{MONGO_ENV}"].distinct("timestamp", date_filter_logs)
-        distinct_trade_dates = db[f"trades_{MONGO_ENV}"].distinct("date", date_filter_trades)
-
-        distinct_log_dates_ist = [d.astimezone(IST) for d in distinct_log_dates]
-        distinct_trade_dates_ist = [d.astimezone(IST) for d in distinct_trade_dates]
-
-        all_distinct_dates = sorted(list(set([d.date() for d in distinct_log_dates_ist] + [d.date() for d in distinct_trade_dates_ist])), reverse=True)
-
-        total_days = len(all_distinct_dates)
+        # Active days come from the daily activity rollup (indexed), not distinct() over every log
+        page_broker_id = selected_broker_id if selected_broker_id != 'all' else None
+        current_page_days, total_days = activity_store.page(
+            g.user['username'],
+            broker_id=page_broker_id,
+            skip=skip_days,
+            limit=APP_LOGS_PER_PAGE_HOME
+        )
         has_more_days = total_days > (skip_days + APP_LOGS_PER_PAGE_HOME)
 
-        current_page_dates = all_distinct_dates[skip_days : skip_days + APP_LOGS_PER_PAGE_HOME]
-
+        # Trades of the whole page window in one aggregate (bucketed by IST day in the database);
+        # logs are loaded per day through /api/daily-logs when a day is expanded
+        trades_by_day = activity_store.trades_by_day(g.user['username'], page_broker_id,
+                                                     [day['date'] for day in current_page_days])
         daily_data = {}
 
-        for date_obj in current_page_dates:
-            start_of_day_ist = IST.localize(datetime(date_obj.year, date_obj.month, date_obj.day, 0, 0, 0))
-            end_of_day_ist = IST.localize(datetime(date_obj.year, date_obj.month, date_obj.day, 23, 59, 59))
-            start_of_day_utc = start_of_day_ist.astimezone(UTC)
-            end_of_day_utc = end_of_day_ist.astimezone(UTC)
-
-            logs_query = {**user_filter, "timestamp": {"$gte": start_of_day_utc, "$lte": end_of_day_utc}}
-            if selected_broker_id != 'all': logs_query['broker_id'] = selected_broker_id
-            
-            logs_for_day = list(db[f"logs_{MONGO_ENV}"].find(logs_query).sort("timestamp", -1))
-            for log in logs_for_day:
-                log['timestamp'] = log['timestamp'].astimezone(IST)
-
-            trades_query = {**user_filter, "date": {"$gte": start_of_day_utc, "$lte": end_of_day_utc}}
-            if selected_broker_id != 'all': trades_query['broker_id'] = selected_broker_id
-
-            trades_for_day = list(db[f"trades_{MONGO_ENV}"].find(trades_query).sort("date", -1))
-            for trade in trades_for_day:
-                trade['date'] = trade['date'].astimezone(IST)
-
+        for day in current_page_days:
+            date_str = day['date'].strftime('%Y-%m-%d')
             executed_trades_daily = []
             cancelled_trades_daily = []
 
-            for trade in trades_for_day:
+            for trade in trades_by_day.get(date_str, []):
                 if 'profit' not in trade: trade['profit'] = 0.0
                 if 'profit_pct' not in trade: trade['profit_pct'] = 0.0
                 
@@ -1964,8 +1929,8 @@ def dashboard():
                 else:
                     cancelled_trades_daily.append(trade)
             
-            daily_data[date_obj.strftime('%Y-%m-%d')] = {
-                'logs': logs_for_day,
+            daily_data[date_str] = {
+                'log_count': day['logs'],
                 'executed_trades': executed_trades_daily,
                 'cancelled_trades': cancelled_trades_daily
             }
@@ -2033,6 +1998,7 @@ def dashboard():
                                capital_utilization=capital_utilization,
                                cumulative_pnl_data=json.dumps(cumulative_pnl_data),
                                brokers=all_brokers,
+                               broker_status={b.get('broker_type'): broker_health.status(b.get('broker_type')) for b in all_brokers},
                                selected_broker_id=selected_broker_id)
 
     except Exception as e:
@@ -2313,33 +2279,18 @@ def sync_broker_positions(broker_id, broker_instance):
              # Normalize Response
              holdings_list = []
              if isinstance(response, dict):
-                 # Likely Fyers
-                 if 'holdings' in response:
-                     holdings_list = response['holdings']
+                 # Fyers
+                 holdings_list = [Holding.from_fyers(h) for h in response.get('holdings', [])]
              elif isinstance(response, list):
-                 # Likely Zerodha
-                 holdings_list = response
+                 # Zerodha
+                 holdings_list = [Holding.from_kite(h) for h in response]
              
-             # Process List
+             # Fyers returns 'NSE:SBIN-EQ', Zerodha 'NSE:SBIN', DB uses 'NSE:SBIN-EQ':
+             # key by the canonical form so reconciliation is an exact lookup.
              for h in holdings_list:
-                 # Helper to get attr or dict key
-                 symbol = h['tradingsymbol'] if 'tradingsymbol' in h else h.get('symbol')
-                 # Zerodha uses 'quantity' or 'open_quantity'?? KiteConnect uses 'quantity' (net) in holdings
-                 qty = h.get('quantity', 0)
-                 
-                 # Exchange Prefix Logic
-                 # Fyers returns 'NSE:SBIN-EQ', Zerodha returns 'SBIN' (?)
-                 # DB uses 'NSE:SBIN-EQ'.
-                 # We need to map if necessary. 
-                 # Fyers usually has exchange prefix. Zerodha might not.
-                 # Let's rely on loose matching later, but store exact symbol here.
-                 
                  # Accumulate (Fix for split holdings)
-                 if symbol:
-                     if symbol in real_holdings:
-                          real_holdings[symbol] += qty
-                     else:
-                          real_holdings[symbol] = qty
+                 if h.symbol:
+                     real_holdings[h.key] = real_holdings.get(h.key, 0) + h.quantity
 
         except Exception as e:
              print(f"Sync Skipped: Failed to fetch holdings for {broker_id}: {e}")
@@ -2396,11 +2347,7 @@ def sync_broker_positions(broker_id, broker_instance):
             if net_system_qty <= 0: continue
 
             # Get Real Holding (K)
-            real_k = 0
-            for r_sym, r_qty in real_holdings.items():
-                if symbol == r_sym or (symbol in r_sym and 'NSE:' not in symbol):
-                    real_k = r_qty
-                    break
+            real_k = real_holdings.get(symbol_registry.canonical(symbol), 0)
             
             # Gap
             gap = net_system_qty - real_k
@@ -2426,6 +2373,8 @@ def sync_broker_positions(broker_id, broker_instance):
                     'order_id': 'MANUAL',
                     'status': 'PENDING_MANUAL_PRICE'
                 })
+                for pending in existing_pendings:
+                    activity_store.record_trade(pending, -1)
                 
                 # Consolidate Logic: Weighted Average
                 missing_needed = gap
@@ -2463,6 +2412,7 @@ def sync_broker_positions(broker_id, broker_instance):
                     'comment': f"Manual Close (Consolidated). Avg Buy: {final_avg_price:.2f}"
                 }
                 db[f"trades_{MONGO_ENV}"].insert_one(new_trade)
+                activity_store.record_trade(new_trade)
                 updates_count += 1
 
     except Exception as e:
@@ -2744,6 +2694,8 @@ def broker_delete(broker_id):
     is_default = broker.get('is_default', False)
     
     db['broker_accounts'].delete_one({'broker_id': broker_id})
+    connector_registry.evict(broker_id)
+    holdings_snapshots.delete(broker_id)
     
     # If we deleted the default broker, make another one default (if exists)
     if is_default:
@@ -3024,6 +2976,7 @@ def update_manual_trade(trade_ids):
                 profit_pct = ((close_price - buy_price) / buy_price * 100) if buy_price > 0 else 0
                 comment_str = f"Manual Close. Profit: {profit_pct:.2f}%"
             
+            activity_store.move_trade(trade, close_date)
             db[f"trades_{MONGO_ENV}"].update_one(
                 {'_id': ObjectId(tid)},
                 {'$set': {
@@ -3058,7 +3011,9 @@ def delete_manual_trade(trade_ids):
         deleted_count = 0
         for tid in id_list:
             try:
-                db[f"trades_{MONGO_ENV}"].delete_one({'_id': ObjectId(tid)})
+                trade = db[f"trades_{MONGO_ENV}"].find_one_and_delete({'_id': ObjectId(tid)})
+                if trade:
+                    activity_store.record_trade(trade, -1)
                 deleted_count += 1
             except Exception:
                 continue # Skip invalid individual IDs
@@ -1,19 +1,55 @@
 import yfinance as yf
 import pandas as pd
 import os
+import sys
 from datetime import datetime, timedelta
 
-def download_nifty50_data(symbols, start_date, end_date, data_dir='backtest/data'):
+# Allow importing the warehouse cache from the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.symbol_registry import symbol_registry
+
+def load_from_candle_cache(symbols, start_date, end_date):
+    """
+    Load symbols from the local memory-mapped candle cache (populated by
+    MarketDataManager). Only symbols whose cached history reaches back to
+    start_date are returned; the rest fall back to CSV/yfinance.
+    """
+    try:
+        from candle_cache import CandleCache
+    except Exception as e:
+        print(f"Candle cache unavailable: {e}")
+        return {}
+
+    cache = CandleCache()
+    start = pd.Timestamp(start_date)
+    data_feed = {}
+    for symbol in symbols:
+        df = cache.load_frame(symbol, end=pd.Timestamp(end_date).tz_localize('Asia/Kolkata'))
+        if df is None or df.empty:
+            continue
+        # Backtest works on naive (IST) dates
+        df['date'] = df['date'].dt.tz_localize(None)
+        if df['date'].iloc[0] > start:
+            continue
+        data_feed[symbol] = df
+    return data_feed
+
+def download_nifty50_data(symbols, start_date, end_date, data_dir='backtest/data', use_cache=True):
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
 
-    data_feed = {}
+    data_feed = load_from_candle_cache(symbols, start_date, end_date) if use_cache else {}
+    if data_feed:
+        print(f"Loaded {len(data_feed)} symbols from the local candle cache.")
     
-    print(f"Downloading data for {len(symbols)} symbols...")
+    print(f"Downloading data for {len(symbols) - len(data_feed)} symbols...")
     
     for symbol in symbols:
+        if symbol in data_feed:
+            continue
         # Fyers symbol format: NSE:RELIANCE-EQ -> Yahoo format: RELIANCE.NS
-        yahoo_symbol = symbol.replace('NSE:', '').replace('-EQ', '') + '.NS'
+        yahoo_symbol = symbol_registry.to_yahoo(symbol)
         file_path = os.path.join(data_dir, f"{yahoo_symbol}.csv")
         
         if os.path.exists(file_path):
@@ -0,0 +1,153 @@
+"""
+Candle Cache
+
+On-disk columnar tier in front of the Mongo candle warehouse. Each symbol is
+stored as a float64 NumPy array of shape (n, 6) with columns
+[ts, open, high, low, close, volume], sorted by ts, and is memory-mapped by
+readers so loading the whole universe costs a few file opens and no network.
+
+MarketDataManager republishes changed symbols after every sync and stamps the
+cache with the sync watermark. Readers only trust the cache while its
+watermark matches the one recorded in Mongo (or unconditionally for offline
+use such as backtests).
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from config import MONGO_ENV, CANDLE_CACHE_DIR
+
+UTC = pytz.utc
+IST = pytz.timezone('Asia/Kolkata')
+
+CANDLE_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+MANIFEST_FILE = 'manifest.json'
+EPOCH = pd.Timestamp(0, tz='UTC')
+
+
+def _file_name(symbol: str) -> str:
+    """NSE:BAJAJ-AUTO-EQ -> NSE_BAJAJ-AUTO-EQ.npy"""
+    return symbol.replace(':', '_') + '.npy'
+
+
+class CandleCache:
+    """Memory-mapped per-symbol candle arrays plus a manifest holding the sync watermark."""
+
+    def __init__(self, cache_dir: Optional[str] = None, env: str = MONGO_ENV):
+        self.cache_dir = os.path.join(cache_dir or CANDLE_CACHE_DIR, env)
+        self._manifest = None
+
+    # --- Manifest ---
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    def read_manifest(self) -> Dict:
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path) as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {"watermark": None, "symbols": {}}
+        return self._manifest
+
+    def _write_manifest(self, manifest: Dict):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.manifest_path)
+        self._manifest = manifest
+
+    @property
+    def watermark(self):
+        return self.read_manifest().get('watermark')
+
+    def is_fresh(self, watermark) -> bool:
+        """True when the cache was published for the given sync watermark."""
+        return watermark is not None and self.watermark == watermark
+
+    def symbols(self) -> Iterable[str]:
+        return self.read_manifest().get('symbols', {}).keys()
+
+    def adjustment_versions(self) -> Dict[str, int]:
+        """Adjustment version each cached symbol was published at."""
+        return {s: meta.get('adjustment_version', 0) for s, meta in self.read_manifest().get('symbols', {}).items()}
+
+    # --- Writes ---
+    def publish(self, frames: Dict[str, pd.DataFrame], watermark, versions: Optional[Dict[str, int]] = None):
+        """
+        Replace the arrays for the given symbols and stamp the cache with `watermark`.
+        frames: {symbol: DataFrame[date, open, high, low, close, volume]} (full history).
+        versions: {symbol: adjustment version} the frames were read at.
+        """
+        versions = versions or {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        manifest = dict(self.read_manifest())
+        manifest['symbols'] = dict(manifest.get('symbols', {}))
+
+        for symbol, df in frames.items():
+            if df.empty:
+                continue
+            ts = (pd.to_datetime(df['date'], utc=True) - EPOCH) // pd.Timedelta(seconds=1)
+            arr = np.column_stack([
+                ts.to_numpy(dtype='float64'),
+                df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype='float64')
+            ])
+            arr = arr[np.argsort(arr[:, 0], kind='stable')]
+
+            path = os.path.join(self.cache_dir, _file_name(symbol))
+            # np.save appends .npy to names without it, so keep the suffix on the temp file
+            tmp = path[:-4] + '.tmp.npy'
+            np.save(tmp, arr)
+            os.replace(tmp, path)
+
+            manifest['symbols'][symbol] = {
+                "rows": int(arr.shape[0]),
+                "last_ts": int(arr[-1, 0]),
+                "adjustment_version": versions.get(symbol, 0)
+            }
+
+        manifest['watermark'] = watermark
+        self._write_manifest(manifest)
+        logging.info(f"🗄️ Candle cache published {len(frames)} symbols (watermark {watermark})")
+
+    # --- Reads ---
+    def load_array(self, symbol: str) -> Optional[np.ndarray]:
+        """Memory-mapped (n, 6) array for a symbol, or None if not cached."""
+        if symbol not in self.read_manifest().get('symbols', {}):
+            return None
+        try:
+            return np.load(os.path.join(self.cache_dir, _file_name(symbol)), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def load_frame(self, symbol: str, start=None, end=None) -> Optional[pd.DataFrame]:
+        """Cached candles for a symbol as a DataFrame, optionally sliced to [start, end]."""
+        arr = self.load_array(symbol)
+        if arr is None:
+            return None
+
+        lo, hi = 0, arr.shape[0]
+        if start is not None:
+            lo = int(np.searchsorted(arr[:, 0], pd.Timestamp(start).timestamp(), side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(arr[:, 0], pd.Timestamp(end).timestamp(), side='right'))
+        view = arr[lo:hi]
+
+        df = pd.DataFrame(view[:, 1:], columns=['open', 'high', 'low', 'close', 'volume'])
+        df.insert(0, 'date', pd.to_datetime(view[:, 0].astype('int64'), unit='s', utc=True).tz_convert(IST))
+        return df
+
+    def load_frames(self, symbols: Iterable[str], start=None, end=None) -> Dict[str, pd.DataFrame]:
+        frames = {}
+        for symbol in symbols:
+            df = self.load_frame(symbol, start, end)
+            if df is not None:
+                frames[symbol] = df
+        return frames
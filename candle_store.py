@@ -0,0 +1,384 @@
+"""
+Candle Store
+
+Single accessor for the market data warehouse. Every reader and writer of
+stored candles goes through CandleStore so the physical layout can change
+without touching the strategy, backtests or sync code.
+
+Storage modes (config.CANDLE_STORAGE_MODE):
+- "daily":  one document per symbol per day in market_candles_{env}
+            (unique index on symbol + date).
+- "bucket": one document per symbol per IST month in market_candle_buckets_{env}.
+            Each day is packed as [ts, open, high, low, close, volume] under
+            days.<DD>, so a 35-day read touches two documents per symbol.
+
+Intraday resolutions ("5", "15", "60" minutes) are always time-partitioned:
+one document per symbol per IST session in market_candles_<res>m_{env}, bars
+packed under bars.<HHMM>. A TTL index on session_start enforces the
+per-resolution retention from config.CANDLE_RETENTION_DAYS.
+"""
+
+import logging
+from datetime import datetime, date
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import pytz
+from pymongo import UpdateOne, ReturnDocument
+
+from config import MONGO_ENV, CANDLE_STORAGE_MODE, CANDLE_RETENTION_DAYS
+from utils.trading_calendar import session_start
+
+UTC = pytz.utc
+IST = pytz.timezone('Asia/Kolkata')
+
+CANDLE_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+
+def _to_utc(dt: datetime) -> datetime:
+    """Naive datetimes coming back from Mongo are UTC."""
+    if dt.tzinfo is None:
+        return UTC.localize(dt)
+    return dt.astimezone(UTC)
+
+
+def _epoch(dt: datetime) -> int:
+    return int(_to_utc(dt).timestamp())
+
+
+# Bucket layouts: (partition field, partition format, slot field, slot format)
+DAILY_BUCKETS = ('month', '%Y-%m', 'days', '%d')
+SESSION_BUCKETS = ('day', '%Y-%m-%d', 'bars', '%H%M')
+
+
+class CandleStore:
+    """Reads and writes candles of one resolution in the per-day or a bucketed layout."""
+
+    def __init__(self, db, env: str = MONGO_ENV, mode: Optional[str] = None, cache=None, resolution: str = "D"):
+        self.db = db
+        self.env = env
+        self.resolution = resolution
+        self._cache_fresh = None
+        self.daily_collection = db[f'market_candles_{env}']
+        self.meta_collection = db[f'market_data_meta_{env}']
+
+        if resolution == "D":
+            self.mode = (mode or CANDLE_STORAGE_MODE).lower()
+            if self.mode not in ('daily', 'bucket'):
+                raise ValueError(f"Unknown candle storage mode: {self.mode}")
+            self.bucket_collection = db[f'market_candle_buckets_{env}']
+            self.layout = DAILY_BUCKETS
+            # The columnar cache only holds daily candles
+            self.cache = cache
+        else:
+            if resolution not in CANDLE_RETENTION_DAYS:
+                raise ValueError(f"Unsupported candle resolution: {resolution}")
+            self.mode = 'bucket'
+            self.bucket_collection = db[f'market_candles_{resolution}m_{env}']
+            self.layout = SESSION_BUCKETS
+            self.cache = None
+
+    def for_resolution(self, resolution: str) -> 'CandleStore':
+        """Sibling store for another resolution (same database and env)."""
+        if resolution == self.resolution:
+            return self
+        return CandleStore(self.db, self.env, cache=self.cache, resolution=resolution)
+
+    @property
+    def collection(self):
+        return self.bucket_collection if self.mode == 'bucket' else self.daily_collection
+
+    def ensure_indexes(self):
+        if self.mode == 'daily':
+            self.daily_collection.create_index([("symbol", 1), ("date", -1)], unique=True)
+            return
+
+        partition_field = self.layout[0]
+        self.bucket_collection.create_index([("symbol", 1), (partition_field, -1)], unique=True)
+        if self.resolution != "D":
+            # Retention per resolution: Mongo's TTL monitor drops whole sessions
+            self.bucket_collection.create_index(
+                "session_start",
+                expireAfterSeconds=CANDLE_RETENTION_DAYS[self.resolution] * 86400
+            )
+
+    # --- Writes ---
+    def candle_update(self, symbol: str, ts: int, ohlcv, source: Optional[str] = None) -> UpdateOne:
+        """
+        Upsert operation for one candle.
+        ts: epoch seconds of the session (Fyers daily candles are IST midnight).
+        ohlcv: (open, high, low, close, volume)
+        source: provider that served the candle (bucketed layouts keep it under sources.<slot>)
+        """
+        c_date = datetime.fromtimestamp(ts, IST)
+        now = datetime.now(UTC)
+
+        if self.mode == 'bucket':
+            partition_field, partition_fmt, slot_field, slot_fmt = self.layout
+            if self.resolution == "D":
+                on_insert = {"month_start": IST.localize(datetime(c_date.year, c_date.month, 1))}
+            else:
+                on_insert = {"session_start": IST.localize(datetime(c_date.year, c_date.month, c_date.day))}
+            slot = c_date.strftime(slot_fmt)
+            fields = {f"{slot_field}.{slot}": [int(ts)] + list(ohlcv), "updated_at": now}
+            if source:
+                fields[f"sources.{slot}"] = source
+            return UpdateOne(
+                {"symbol": symbol, partition_field: c_date.strftime(partition_fmt)},
+                {"$set": fields, "$setOnInsert": on_insert},
+                upsert=True
+            )
+
+        doc = {
+            "symbol": symbol,
+            "date": c_date, # MongoDB stores as ISODate
+            "open": ohlcv[0],
+            "high": ohlcv[1],
+            "low": ohlcv[2],
+            "close": ohlcv[3],
+            "volume": ohlcv[4],
+            "updated_at": now
+        }
+        if source:
+            doc["source"] = source
+        return UpdateOne({"symbol": symbol, "date": c_date}, {"$set": doc}, upsert=True)
+
+    def bulk_write(self, ops: List[UpdateOne]):
+        return self.collection.bulk_write(ops, ordered=False)
+
+    # --- Reads ---
+    def get_last_timestamps(self, symbols: List[str]) -> Dict[str, int]:
+        """Epoch seconds of the latest stored candle per symbol, in a single aggregation."""
+        if self.mode == 'bucket':
+            partition_field, _, slot_field, _ = self.layout
+            pipeline = [
+                {"$match": {"symbol": {"$in": list(symbols)}}},
+                {"$sort": {"symbol": 1, partition_field: -1}},
+                {"$group": {"_id": "$symbol", "slots": {"$first": f"${slot_field}"}}}
+            ]
+            last_ts = {}
+            for doc in self.bucket_collection.aggregate(pipeline):
+                slots = doc.get('slots') or {}
+                if slots:
+                    last_ts[doc['_id']] = max(v[0] for v in slots.values())
+            return last_ts
+
+        pipeline = [
+            {"$match": {"symbol": {"$in": list(symbols)}}},
+            {"$group": {"_id": "$symbol", "last_date": {"$max": "$date"}}}
+        ]
+        return {doc['_id']: _epoch(doc['last_date']) for doc in self.daily_collection.aggregate(pipeline)}
+
+    def get_last_dates(self, symbols: List[str]) -> Dict[str, date]:
+        """Latest stored session (IST date) per symbol, in a single aggregation."""
+        return {
+            symbol: datetime.fromtimestamp(ts, IST).date()
+            for symbol, ts in self.get_last_timestamps(symbols).items()
+        }
+
+    def iter_rows(self, symbols: List[str], start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """Yield (symbol, ts, (open, high, low, close, volume)) for stored candles, unordered."""
+        start_utc = _to_utc(start) if start else None
+        end_utc = _to_utc(end) if end else None
+
+        if self.mode == 'bucket':
+            partition_field, partition_fmt, slot_field, _ = self.layout
+            query = {"symbol": {"$in": list(symbols)}}
+            if start_utc:
+                query[partition_field] = {"$gte": start_utc.astimezone(IST).strftime(partition_fmt)}
+            if end_utc:
+                query.setdefault(partition_field, {})["$lte"] = end_utc.astimezone(IST).strftime(partition_fmt)
+            lo = start_utc.timestamp() if start_utc else None
+            hi = end_utc.timestamp() if end_utc else None
+            for doc in self.bucket_collection.find(query, {"_id": 0, "symbol": 1, slot_field: 1}):
+                for packed in (doc.get(slot_field) or {}).values():
+                    ts = packed[0]
+                    if (lo is not None and ts < lo) or (hi is not None and ts > hi):
+                        continue
+                    yield doc['symbol'], ts, tuple(packed[1:6])
+            return
+
+        query = {"symbol": {"$in": list(symbols)}}
+        if start_utc or end_utc:
+            query["date"] = {}
+            if start_utc:
+                query["date"]["$gte"] = start_utc
+            if end_utc:
+                query["date"]["$lte"] = end_utc
+        projection = {"_id": 0, "symbol": 1, "date": 1, "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}
+        for doc in self.daily_collection.find(query, projection):
+            yield doc['symbol'], _epoch(doc['date']), (
+                doc.get('open'), doc.get('high'), doc.get('low'), doc.get('close'), doc.get('volume')
+            )
+
+    def get_session_dates(self, symbols: List[str], start: Optional[datetime] = None) -> Dict[str, set]:
+        """IST session dates stored per symbol since `start`."""
+        sessions = {}
+        for symbol, ts, _ in self.iter_rows(symbols, start):
+            sessions.setdefault(symbol, set()).add(datetime.fromtimestamp(ts, IST).date())
+        return sessions
+
+    def get_window(self, symbols: List[str], start: datetime) -> Dict[str, Dict[int, Tuple]]:
+        """Stored OHLCV since `start`: {symbol: {epoch_seconds: (open, high, low, close, volume)}}."""
+        window = {}
+        for symbol, ts, ohlcv in self.iter_rows(symbols, start):
+            window.setdefault(symbol, {})[int(ts)] = ohlcv
+        return window
+
+    # --- Corporate Action Adjustment ---
+    def adjust_history(self, symbol: str, before_ts: int, factor: float) -> int:
+        """
+        Multiply prices (divide volume) of this symbol's candles strictly before
+        `before_ts` by `factor`. Touches only the affected symbol's documents.
+        Returns the number of candles adjusted.
+        """
+        if self.mode == 'daily':
+            boundary = datetime.fromtimestamp(before_ts, UTC)
+            result = self.daily_collection.update_many(
+                {"symbol": symbol, "date": {"$lt": boundary}},
+                {
+                    "$mul": {"open": factor, "high": factor, "low": factor, "close": factor, "volume": 1 / factor},
+                    "$set": {"updated_at": datetime.now(UTC)}
+                }
+            )
+            return result.modified_count
+
+        partition_field, partition_fmt, slot_field, _ = self.layout
+        last_partition = datetime.fromtimestamp(before_ts, IST).strftime(partition_fmt)
+        ops = []
+        adjusted = 0
+        query = {"symbol": symbol, partition_field: {"$lte": last_partition}}
+        for doc in self.bucket_collection.find(query, {slot_field: 1}):
+            fields = {}
+            for slot, packed in (doc.get(slot_field) or {}).items():
+                if packed[0] >= before_ts:
+                    continue
+                ts, o, h, l, c, v = packed[:6]
+                fields[f"{slot_field}.{slot}"] = [ts, o * factor, h * factor, l * factor, c * factor, v / factor]
+            if fields:
+                fields["updated_at"] = datetime.now(UTC)
+                ops.append(UpdateOne({"_id": doc['_id']}, {"$set": fields}))
+                adjusted += len(fields) - 1
+        if ops:
+            self.bucket_collection.bulk_write(ops, ordered=False)
+        return adjusted
+
+    def get_adjustment_versions(self, symbols: List[str]) -> Dict[str, int]:
+        """Per-symbol adjustment version; bumped every time a corporate action rewrites history."""
+        ids = [f"adjustment|{symbol}" for symbol in symbols]
+        return {
+            doc['symbol']: doc.get('version', 0)
+            for doc in self.meta_collection.find({"_id": {"$in": ids}}, {"symbol": 1, "version": 1})
+        }
+
+    def bump_adjustment_version(self, symbol: str) -> int:
+        doc = self.meta_collection.find_one_and_update(
+            {"_id": f"adjustment|{symbol}"},
+            {"$inc": {"version": 1}, "$set": {"symbol": symbol, "updated_at": datetime.now(UTC)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc['version']
+
+    # --- Sync Watermark ---
+    def get_sync_watermark(self):
+        doc = self.meta_collection.find_one({"_id": "daily_sync"})
+        return doc.get('watermark') if doc else None
+
+    def set_sync_watermark(self) -> int:
+        """Record a new watermark; any cache published under an older one becomes stale."""
+        watermark = int(datetime.now(UTC).timestamp() * 1000)
+        self.meta_collection.update_one(
+            {"_id": "daily_sync"},
+            {"$set": {"watermark": watermark, "updated_at": datetime.now(UTC)}},
+            upsert=True
+        )
+        self._cache_fresh = None
+        return watermark
+
+    def cache_is_fresh(self) -> bool:
+        """Checked once per store instance: one tiny query instead of a candle read."""
+        if self.cache is None:
+            return False
+        if self._cache_fresh is None:
+            try:
+                self._cache_fresh = self.cache.is_fresh(self.get_sync_watermark())
+            except Exception as e:
+                logging.warning(f"Candle cache freshness check failed: {e}")
+                self._cache_fresh = False
+        return self._cache_fresh
+
+    def get_candles_many(self, symbols: List[str], start: Optional[datetime] = None,
+                         end: Optional[datetime] = None, resolution: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Candles for several symbols as {symbol: DataFrame[date, open, high, low, close, volume]}.
+        resolution: "D" or an intraday resolution ("5", "15", "60"); defaults to this store's.
+        """
+        if resolution and resolution != self.resolution:
+            return self.for_resolution(resolution).get_candles_many(symbols, start, end)
+
+        frames = {}
+        if self.cache_is_fresh():
+            frames = self.cache.load_frames(symbols, start, end)
+            symbols = [s for s in symbols if s not in frames]
+            if not symbols:
+                return frames
+
+        rows = {}
+        for symbol, ts, ohlcv in self.iter_rows(symbols, start, end):
+            rows.setdefault(symbol, []).append((ts,) + tuple(ohlcv))
+
+        for symbol, symbol_rows in rows.items():
+            df = pd.DataFrame(symbol_rows, columns=['ts', 'open', 'high', 'low', 'close', 'volume'])
+            df['date'] = pd.to_datetime(df['ts'], unit='s', utc=True).dt.tz_convert(IST)
+            frames[symbol] = df[CANDLE_COLUMNS].sort_values('date').reset_index(drop=True)
+        return frames
+
+    def get_candles(self, symbol: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    resolution: Optional[str] = None) -> pd.DataFrame:
+        """Candles for one symbol, oldest first. Empty DataFrame when nothing is stored."""
+        frames = self.get_candles_many([symbol], start, end, resolution=resolution)
+        return frames.get(symbol, pd.DataFrame(columns=CANDLE_COLUMNS))
+
+    def get_last_sessions(self, symbols: List[str], n: int, end: Optional[date] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Daily candles for exactly the last n NSE sessions ending at `end`
+        (default today). Symbols with gaps come back with fewer than n rows.
+        """
+        start = IST.localize(datetime.combine(session_start(n, end), datetime.min.time()))
+        stop = IST.localize(datetime.combine(end, datetime.max.time())) if end else None
+        return self.get_candles_many(symbols, start, stop, resolution="D")
+
+    def count_documents(self) -> int:
+        return self.collection.estimated_document_count()
+
+
+def migrate_daily_to_buckets(db, env: str = MONGO_ENV, batch_size: int = 1000) -> int:
+    """
+    Copy market_candles_{env} into the monthly-bucket layout.
+    Idempotent: re-running only re-sets the same packed days.
+    Returns the number of daily candles copied.
+    """
+    source = CandleStore(db, env, mode='daily')
+    target = CandleStore(db, env, mode='bucket')
+    target.ensure_indexes()
+
+    ops = []
+    copied = 0
+    cursor = source.daily_collection.find(
+        {}, {"_id": 0, "symbol": 1, "date": 1, "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}
+    ).sort([("symbol", 1), ("date", 1)])
+
+    for doc in cursor:
+        ohlcv = (doc.get('open'), doc.get('high'), doc.get('low'), doc.get('close'), doc.get('volume'))
+        ops.append(target.candle_update(doc['symbol'], _epoch(doc['date']), ohlcv))
+        copied += 1
+        if len(ops) >= batch_size:
+            target.bulk_write(ops)
+            logging.info(f"   💾 Migrated {copied} candles...")
+            ops = []
+
+    if ops:
+        target.bulk_write(ops)
+
+    return copied
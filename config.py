@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # MongoDB Configuration
 MONGO_DB_NAME = 'nifty_shop'
@@ -7,6 +8,8 @@ print(f"DEBUG: Config loaded. ENV={os.getenv('ENV')}, MONGO_ENV={MONGO_ENV}")
 
 # Application Logging & UI
 APP_LOGS_PER_PAGE_HOME = 10
+APP_LOGS_PER_DAY_PAGE = 200    # logs per request when a dashboard day is expanded
+LOG_ACTIVITY_FLUSH_SECS = 30   # MongoLogHandler writes its buffered per-day log counts at most this often
 
 # Fyers API Configuration
 FYERS_REDIRECT_URI = 'https://trade.fyers.in/api-login/redirect-uri/index.html' # Replace with your actual redirect URI
@@ -18,6 +21,83 @@ MAX_TRADE_VALUE = 4000
 
 MA_PERIOD = 30
 
+# Market Data Sync
+SYNC_MAX_WORKERS = 8            # Concurrent history fetches
+SYNC_RATE_LIMIT_PER_SEC = 8     # Fyers data APIs allow ~10 req/s, keep headroom
+SYNC_WRITE_BATCH_SIZE = 500     # Candle upserts per bulk_write (across symbols)
+
+# Max days one Fyers history request may span, per resolution
+HISTORY_MAX_DAYS_PER_REQUEST = {"D": 366, "60": 100, "15": 100, "5": 100}
+
+# History provider chain: per-provider request rate and optional hedging
+HISTORY_PROVIDER_RATE_LIMITS = {"fyers": SYNC_RATE_LIMIT_PER_SEC, "zerodha": 3, "yfinance": 2}
+HISTORY_HEDGE_PERCENTILE = float(os.getenv('HISTORY_HEDGE_PERCENTILE', 0))  # e.g. 95; 0 disables hedging
+HISTORY_HEDGE_MIN_SAMPLES = 20  # Primary latencies needed before hedging starts
+
+# Intraday candles (minutes) kept in the warehouse, and how long each is retained
+INTRADAY_RESOLUTIONS = ["5", "15", "60"]
+CANDLE_RETENTION_DAYS = {"5": 30, "15": 90, "60": 365}
+INTRADAY_INITIAL_DAYS = 5       # History fetched the first time a symbol is synced intraday
+
+# Sessions checked by the completeness index / gap repair
+CANDLE_COMPLETENESS_DAYS = 400
+
+# Corporate actions: a re-fetched candle off by more than this fraction is a re-adjustment
+CORPORATE_ACTION_MIN_JUMP = 0.15
+CORPORATE_ACTION_TOLERANCE = 0.01   # OHLC ratios must agree within 1%
+
+# Candle storage layout: 'daily' (one doc per symbol-day) or 'bucket' (one doc per symbol-month)
+CANDLE_STORAGE_MODE = os.getenv('CANDLE_STORAGE_MODE', 'daily')
+
+# Instruments per multi-symbol quote call (Kite LTP allows 1000, Fyers quotes 50)
+KITE_LTP_BATCH_SIZE = 500
+FYERS_QUOTES_BATCH_SIZE = 50
+
+# Multi-order placement: Fyers baskets take up to 10 orders, Kite allows 10 orders/second
+FYERS_BASKET_SIZE = 10
+KITE_ORDER_RATE = 10
+
+# Zerodha instrument master (refreshed once per IST day)
+INSTRUMENT_CACHE_DIR = os.getenv('INSTRUMENT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'nifty_shop_instruments'))
+INSTRUMENT_RETRY_SECS = 300     # after a failed download, serve the last file instead of retrying on every call
+
+# Local memory-mapped candle cache (refreshed after each sync)
+CANDLE_CACHE_DIR = os.getenv('CANDLE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'nifty_shop_candles'))
+
+# Quote cache: entries expire after the TTL; callers ask for the freshness they need
+QUOTE_CACHE_TTL = 300           # seconds
+QUOTE_MAX_AGE_ORDER = 5         # prices behind buy/sell decisions
+QUOTE_MAX_AGE_DISPLAY = 300     # dashboards, symbol validation
+QUOTE_DELAYED_SOURCES = ('yfinance',)   # lagging prices: cached for display, never read as order-grade
+
+# Replayed quote feed (offline / load tests): a tick file (.jsonl / .csv) or "candles"
+QUOTE_REPLAY_SOURCE = os.getenv('QUOTE_REPLAY_SOURCE')
+QUOTE_REPLAY_SPEED = float(os.getenv('QUOTE_REPLAY_SPEED', '60'))   # 1 = real time, 0 = as fast as possible
+QUOTE_REPLAY_ENVS = ('test',)   # replay is refused elsewhere: its ticks would drive real orders
+
+# Connector registry: pooled broker clients, dropped after this long unused
+CONNECTOR_IDLE_TIMEOUT = 30 * 60    # seconds
+HTTP_POOL_SIZE = 10                 # keep-alive connections per broker client
+BROKER_HTTP_TIMEOUT = 15            # seconds per async broker request
+
+# Holdings snapshots: pages serve the stored snapshot and refresh it in the background once stale
+HOLDINGS_SNAPSHOT_FRESH_SECS = 60       # served without a refresh
+HOLDINGS_SNAPSHOT_TTL = 24 * 60 * 60    # snapshots not refreshed successfully for this long are dropped
+HOLDINGS_FETCH_TIMEOUT = 8              # seconds per broker
+
+# Circuit breakers: one per (broker_type, endpoint), over the last BREAKER_WINDOW calls
+BREAKER_WINDOW = 20                 # calls in the rolling window
+BREAKER_MIN_CALLS = 5               # calls needed before the breaker can trip
+BREAKER_FAILURE_RATE = 0.5          # trip when half the window failed...
+BREAKER_SLOW_CALL_SECS = 5.0        # ...or when calls slower than this
+BREAKER_SLOW_CALL_RATE = 0.8        # make up 80% of the window
+BREAKER_OPEN_SECS = 60              # fail fast this long before a half-open probe
+
+# Retry budget of one strategy run (see connectors/retry.py for the per-operation policies)
+RETRY_BUDGET_RETRIES = 20           # retries across all broker calls of the run
+RETRY_BUDGET_SECS = 60              # total backoff sleep across the run
+ORDER_SETTLE_SECS = 2.0             # wait after an ambiguous order failure before looking it up by tag
+
 # Token Validity (in seconds)
 ACCESS_TOKEN_VALIDITY = 24 * 60 * 60        # 1 day
 REFRESH_TOKEN_VALIDITY = 15 * ACCESS_TOKEN_VALIDITY  # 15 days
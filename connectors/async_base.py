@@ -0,0 +1,205 @@
+"""
+Async Broker Connectors
+
+Asyncio counterpart of connectors/base.py for the calls that are worth
+overlapping: quotes, holdings, funds, orders and order placement. Backends
+talk to the broker REST APIs through one pooled aiohttp session per event
+loop, so concurrent calls share keep-alive connections.
+
+Synchronous code (Flask views, the strategy) drives them through a single
+background event loop:
+
+    results = gather_sync([fyers.get_holdings(), zerodha.get_holdings()])
+    broker = SyncBrokerAdapter(AsyncZerodhaConnector(...))   # blocking API
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Dict, Iterable, List, Optional
+
+from config import HTTP_POOL_SIZE, BROKER_HTTP_TIMEOUT
+from .circuit_breaker import broker_health
+from .models import Quote, Holding, Order
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# --- Pooled HTTP session ---
+_sessions: Dict[asyncio.AbstractEventLoop, "aiohttp.ClientSession"] = {}
+
+
+async def http_session() -> "aiohttp.ClientSession":
+    """Keep-alive aiohttp session of the running loop, created on first use."""
+    if aiohttp is None:
+        raise RuntimeError("aiohttp library not installed. Please install it using 'pip install aiohttp'.")
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE * 4, limit_per_host=HTTP_POOL_SIZE),
+            timeout=aiohttp.ClientTimeout(total=BROKER_HTTP_TIMEOUT)
+        )
+        _sessions[loop] = session
+    return session
+
+
+# --- Background loop for synchronous callers ---
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="broker-io", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared broker loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result(timeout)
+
+
+def gather_sync(coros: Iterable[Awaitable], timeout: Optional[float] = None) -> List[Any]:
+    """
+    Run independent broker calls concurrently from synchronous code.
+    Results come back in order; a failed call yields its exception instead of raising.
+    """
+    async def _gather():
+        return await asyncio.gather(*coros, return_exceptions=True)
+    return run_sync(_gather(), timeout)
+
+
+def close_soon(connector: "AsyncBrokerConnector"):
+    """Schedule connector.aclose() on the shared broker loop without waiting for it."""
+    def _log_error(future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.warning(f"⚠️ Error closing {connector.name} connector: {future.exception()}")
+    asyncio.run_coroutine_threadsafe(connector.aclose(), _background_loop()).add_done_callback(_log_error)
+
+
+class AsyncBrokerConnector(ABC):
+    """
+    Abstract Base Class for async broker connectors.
+    Return shapes match the synchronous connector of the same broker.
+    """
+    def __init__(self, api_key: str, api_secret: str, access_token: Optional[str] = None, **kwargs):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.access_token = access_token
+        self.name = "generic"
+
+    def _headers(self) -> Dict[str, str]:
+        return {}
+
+    async def aclose(self):
+        """Release resources held by this connector; the pooled session is shared and stays open."""
+        pass
+
+    async def _request(self, method: str, url: str, endpoint: str, **kwargs) -> Any:
+        """
+        JSON body of one broker REST call over the pooled session, through the
+        (broker, endpoint) circuit breaker: errors, timeouts and 429/5xx count as failures.
+        """
+        breaker = broker_health.breaker(self.name, endpoint)
+        breaker.acquire()
+        started = time.monotonic()
+        failed = True
+        try:
+            session = await http_session()
+            async with session.request(method, url, headers=self._headers(), **kwargs) as resp:
+                failed = resp.status == 429 or resp.status >= 500
+                try:
+                    return await resp.json(content_type=None)
+                except ValueError:
+                    failed = True
+                    text = await resp.text()
+                    raise Exception(f"{self.name} HTTP {resp.status}: {text[:200]}")
+        finally:
+            breaker.record(failed, time.monotonic() - started)
+
+    # --- Market Data ---
+    @abstractmethod
+    async def get_quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        """Quotes for several symbols: {symbol: Quote}, unpriced symbols omitted."""
+        pass
+
+    async def get_quote(self, symbol: str) -> Optional[Quote]:
+        return (await self.get_quotes([symbol])).get(symbol)
+
+    # --- User Data ---
+    @abstractmethod
+    async def get_holdings(self) -> List[Holding]:
+        """Fetches current long-term holdings. Raises on failure: an empty list means no holdings."""
+        pass
+
+    @abstractmethod
+    async def get_funds(self) -> Any:
+        """Fetches account balance and limits."""
+        pass
+
+    @abstractmethod
+    async def get_orders(self) -> List[Order]:
+        """Fetches order history for the day. Raises on failure: an empty list means no orders."""
+        pass
+
+    # --- Trading ---
+    @abstractmethod
+    async def place_order(self, symbol: str, qty: int, side: str, order_type: str, price: float = 0.0, trigger_price: float = 0.0, **kwargs) -> Dict[str, Any]:
+        """Places a buy/sell order."""
+        pass
+
+    async def place_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """All legs concurrently; a leg that raised comes back as an ambiguous error result."""
+        results = await asyncio.gather(*(self.place_order(**leg) for leg in orders), return_exceptions=True)
+        return [{"s": "error", "message": str(r), "ambiguous": True} if isinstance(r, Exception) else r
+                for r in results]
+
+
+class SyncBrokerAdapter:
+    """Blocking facade over an AsyncBrokerConnector for existing synchronous callers."""
+
+    def __init__(self, connector: AsyncBrokerConnector, timeout: Optional[float] = None):
+        self.connector = connector
+        self.name = connector.name
+        self.timeout = timeout
+
+    def _run(self, coro: Awaitable) -> Any:
+        return run_sync(coro, self.timeout)
+
+    def get_quote(self, symbol: str) -> Optional[Quote]:
+        return self._run(self.connector.get_quote(symbol))
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        return self._run(self.connector.get_quotes(symbols))
+
+    def get_holdings(self) -> List[Holding]:
+        return self._run(self.connector.get_holdings())
+
+    def get_funds(self) -> Any:
+        return self._run(self.connector.get_funds())
+
+    def get_orders(self) -> List[Order]:
+        return self._run(self.connector.get_orders())
+
+    def place_order(self, symbol: str, qty: int, side: str, order_type: str, price: float = 0.0, trigger_price: float = 0.0, **kwargs) -> Dict[str, Any]:
+        return self._run(self.connector.place_order(symbol, qty, side, order_type, price, trigger_price, **kwargs))
+
+    def place_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._run(self.connector.place_orders(orders))
+
+
+async def close_sessions():
+    """Close the pooled session of the running loop (shutdown hook)."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+        logging.info("🔌 Closed pooled broker HTTP session")
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Dict, List, Optional, Any
+
+from config import FYERS_QUOTES_BATCH_SIZE
+from .async_base import AsyncBrokerConnector
+from .fyers import FyersConnector
+from .models import Quote, Holding, Order
+from .quote_cache import quote_cache
+
+FYERS_API_URL = "https://api-t1.fyers.in/api/v3"
+FYERS_DATA_URL = "https://api-t1.fyers.in/data"
+
+
+class AsyncFyersConnector(AsyncBrokerConnector):
+    """Fyers API v3 over the pooled aiohttp session (same responses as FyersConnector)."""
+
+    def __init__(self, api_key: str, api_secret: str, access_token: Optional[str] = None, pin: Optional[str] = None, **kwargs):
+        super().__init__(api_key, api_secret, access_token, **kwargs)
+        self.pin = pin
+        self.name = "fyers"
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"{self.api_key}:{self.access_token}"}
+
+    async def _get_ok(self, path: str, key: str, what: str):
+        response = await self._request("GET", f"{FYERS_API_URL}/{path}", what)
+        if response.get("code") == 200:
+            return response.get(key, [])
+        raise Exception(f"Failed to fetch {what}: {response}")
+
+    # --- Market Data ---
+    async def get_quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        """Comma-separated quotes calls, one per chunk, issued concurrently."""
+        chunks = [symbols[i:i + FYERS_QUOTES_BATCH_SIZE] for i in range(0, len(symbols), FYERS_QUOTES_BATCH_SIZE)]
+        responses = await asyncio.gather(
+            *(self._request("GET", f"{FYERS_DATA_URL}/quotes", "quotes", params={"symbols": ",".join(chunk)}) for chunk in chunks),
+            return_exceptions=True
+        )
+        results = {}
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, Exception) or not response or response.get('s') != 'ok':
+                continue
+            for item in response.get('d', []):
+                lp = item.get('v', {}).get('lp')
+                if item.get('n') in chunk and lp:
+                    quote_cache.put(item['n'], lp, "fyers")
+                    results[item['n']] = Quote.from_fyers(item)
+        return results
+
+    # --- User Data ---
+    async def get_holdings(self) -> List[Holding]:
+        holdings = [Holding.from_fyers(h) for h in await self._get_ok("holdings", "holdings", "holdings")]
+        for h in holdings:
+            quote_cache.put(h.symbol, h.ltp, "fyers_holdings")
+        return holdings
+
+    async def get_funds(self) -> List[Dict[str, Any]]:
+        return await self._get_ok("funds", "fund_limit", "funds")
+
+    async def get_orders(self) -> List[Order]:
+        return [Order.from_fyers(o) for o in await self._get_ok("orders", "orderBook", "orderbook")]
+
+    # --- Trading ---
+    async def place_order(self, symbol: str, qty: int, side: str, order_type: str, price: float = 0.0, trigger_price: float = 0.0, **kwargs) -> Dict[str, Any]:
+        data = FyersConnector._order_payload(symbol, qty, side, order_type, price, trigger_price, **kwargs)
+        return await self._request("POST", f"{FYERS_API_URL}/orders/sync", "orders", json=data)
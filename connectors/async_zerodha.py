@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Any
+
+from config import KITE_LTP_BATCH_SIZE
+from .async_base import AsyncBrokerConnector
+from .circuit_breaker import CircuitOpenError
+from .data_source import YFinanceDataSource
+from .models import Quote, Holding, Order
+from .quote_cache import quote_cache
+from .zerodha import ZerodhaConnector
+from utils.symbol_registry import symbol_registry
+
+KITE_API_URL = "https://api.kite.trade"
+
+
+class KiteAPIError(Exception):
+    """Kite answered with status "error" (the request reached the API)."""
+
+
+class AsyncZerodhaConnector(AsyncBrokerConnector):
+    """Kite Connect v3 over the pooled aiohttp session (same responses as ZerodhaConnector)."""
+
+    def __init__(self, api_key: str, api_secret: str, access_token: Optional[str] = None, **kwargs):
+        super().__init__(api_key, api_secret, access_token, **kwargs)
+        self.name = "zerodha"
+
+    def _headers(self) -> Dict[str, str]:
+        return {"X-Kite-Version": "3", "Authorization": f"token {self.api_key}:{self.access_token}"}
+
+    async def _kite(self, method: str, path: str, endpoint: str, **kwargs) -> Any:
+        """`data` of a Kite response; Kite errors are raised."""
+        response = await self._request(method, f"{KITE_API_URL}{path}", endpoint, **kwargs)
+        if response.get("status") != "success":
+            raise KiteAPIError(f"Kite {path} failed: {response.get('message', response)}")
+        return response.get("data")
+
+    # --- Market Data ---
+    async def get_quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        """
+        LTP in concurrent chunked /quote/ltp calls, with one yfinance batch for
+        anything Kite didn't price. Unpriced symbols are omitted.
+        """
+        if not self.access_token or not symbols:
+            return {}
+
+        keys = {symbol_registry.to_zerodha(symbol): symbol for symbol in symbols}
+        key_list = list(keys)
+        chunks = [key_list[i:i + KITE_LTP_BATCH_SIZE] for i in range(0, len(key_list), KITE_LTP_BATCH_SIZE)]
+        responses = await asyncio.gather(
+            *(self._kite("GET", "/quote/ltp", "quotes", params=[("i", key) for key in chunk]) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        results = {}
+        for chunk, ltp_response in zip(chunks, responses):
+            if isinstance(ltp_response, Exception):
+                logging.error(f"Error getting Zerodha LTP for {len(chunk)} symbols: {ltp_response}")
+                continue
+            for z_symbol in chunk:
+                lp = ((ltp_response or {}).get(z_symbol) or {}).get('last_price')
+                if lp and lp > 0:
+                    quote_cache.put(z_symbol, lp, "zerodha")
+                    results[keys[z_symbol]] = Quote(keys[z_symbol], lp, source="zerodha")
+
+        missing = [symbol for symbol in symbols if symbol not in results]
+        if missing:
+            try:
+                prices = await asyncio.to_thread(YFinanceDataSource().get_latest_prices, missing)
+            except Exception as e:
+                logging.error(f"Error fetching yfinance fallback prices: {e}")
+                prices = {}
+            for symbol, lp in prices.items():
+                if lp > 0:
+                    results[symbol] = Quote(symbol, lp, source="yfinance")
+        return results
+
+    # --- User Data ---
+    async def get_holdings(self) -> List[Holding]:
+        """Raises on failure, so callers can keep what they had."""
+        try:
+            return ZerodhaConnector._normalize_holdings(await self._kite("GET", "/portfolio/holdings", "holdings"))
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logging.error(f"Error getting Zerodha holdings: {e}")
+            raise
+
+    async def get_funds(self) -> List[Dict[str, Any]]:
+        try:
+            return ZerodhaConnector._normalize_funds(await self._kite("GET", "/user/margins", "funds"))
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logging.error(f"Error getting Zerodha funds: {e}")
+            return []
+
+    async def get_orders(self) -> List[Order]:
+        """Raises when the order book can't be read (tag lookups rely on it)."""
+        try:
+            return [Order.from_kite(o) for o in await self._kite("GET", "/orders", "orderbook")]
+        except Exception as e:
+            logging.error(f"Error getting Zerodha orders: {e}")
+            raise
+
+    # --- Trading ---
+    async def place_order(self, symbol: str, qty: int, side: str, order_type: str, price: float = 0.0, trigger_price: float = 0.0, productType: str = "CNC", **kwargs) -> Dict[str, Any]:
+        try:
+            exchange, tradingsymbol = symbol_registry.to_zerodha(symbol).split(":", 1)
+            form = {
+                "exchange": exchange,
+                "tradingsymbol": tradingsymbol,
+                "transaction_type": "BUY" if side.upper() == "BUY" else "SELL",
+                "quantity": int(qty),
+                "product": "MIS" if productType.upper() in ("INTRADAY", "MIS") else "CNC",
+                "order_type": "LIMIT" if order_type.upper() == "LIMIT" else "MARKET",
+                "validity": "DAY",
+                "tag": kwargs.get("tag") or "nifty_shop"
+            }
+            if price:
+                form["price"] = price
+            data = await self._kite("POST", "/orders/regular", "orders", data=form)
+            return {"s": "ok", "id": data["order_id"], "message": "Order placed successfully"}
+        except Exception as e:
+            logging.error(f"Error placing Zerodha order: {e}")
+            return {"s": "error", "message": str(e), "ambiguous": not isinstance(e, (KiteAPIError, CircuitOpenError))}
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from typing import Dict, List, Optional, Any
 import datetime
 
+from .models import Quote, Holding, Order, Fill
+
 class BrokerConnector(ABC):
     """
     Abstract Base Class for Broker Connectors.
@@ -13,6 +15,10 @@ class BrokerConnector(ABC):
         self.access_token = access_token
         self.name = "generic"
 
+    def close(self):
+        """Release HTTP resources held by this connector (called when the registry drops it)."""
+        pass
+
     # --- Authentication ---
     @abstractmethod
     def get_login_url(self, redirect_uri: str) -> str:
@@ -36,10 +42,18 @@ class BrokerConnector(ABC):
 
     # --- Market Data ---
     @abstractmethod
-    def get_quote(self, symbol: str) -> Dict[str, Any]:
-        """Fetches real-time quote for a symbol."""
+    def get_quote(self, symbol: str) -> Optional[Quote]:
+        """Fetches real-time quote for a symbol (None if the broker has no price)."""
         pass
 
+    def get_quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        """
+        Quotes for several symbols: {symbol: Quote}, unpriced symbols omitted.
+        Brokers with a multi-instrument API override this with batched calls.
+        """
+        quotes = {symbol: self.get_quote(symbol) for symbol in symbols}
+        return {symbol: quote for symbol, quote in quotes.items() if quote is not None}
+
     @abstractmethod
     def get_historical_data(self, symbol: str, resolution: str, from_date: str, to_date: str) -> Dict[str, Any]:
         """Fetches historical candle data."""
@@ -52,8 +66,8 @@ class BrokerConnector(ABC):
 
     # --- User Data ---
     @abstractmethod
-    def get_holdings(self) -> List[Dict[str, Any]]:
-        """Fetches current long-term holdings."""
+    def get_holdings(self) -> List[Holding]:
+        """Fetches current long-term holdings. Raises on failure: an empty list means no holdings."""
         pass
 
     @abstractmethod
@@ -77,6 +91,13 @@ class BrokerConnector(ABC):
         """Places a buy/sell order."""
         pass
 
+    def place_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Places several orders (each leg holds place_order's keyword arguments).
+        Returns one place_order-shaped result per leg, in order. Default: one call per leg.
+        """
+        return [self.place_order(**leg) for leg in orders]
+
     @abstractmethod
     def cancel_order(self, order_id: str) -> Dict[str, Any]:
         """Cancels an open order."""
@@ -88,11 +109,11 @@ class BrokerConnector(ABC):
         pass
 
     @abstractmethod
-    def get_orders(self) -> List[Dict[str, Any]]:
-        """Fetches order history for the day."""
+    def get_orders(self) -> List[Order]:
+        """Fetches order history for the day. Raises on failure: an empty list means no orders."""
         pass
 
     @abstractmethod
-    def get_trades(self) -> List[Dict[str, Any]]:
+    def get_trades(self) -> List[Fill]:
         """Fetches trade history for the day."""
         pass
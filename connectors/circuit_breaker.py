@@ -0,0 +1,214 @@
+"""
+Broker Circuit Breakers
+
+One breaker per (broker_type, endpoint) watches the last BREAKER_WINDOW calls.
+When too many of them failed, or too many were slow, the breaker opens and
+further calls raise CircuitOpenError immediately instead of waiting on a
+degraded API. After BREAKER_OPEN_SECS a single half-open probe is let
+through: success closes the breaker, failure opens it again.
+
+    quotes = broker_health.call("fyers", "quotes", fyers.quotes, data)
+    broker_health.available("zerodha", "holdings")   # dashboard: skip instantly
+    broker_health.status("fyers")                    # "healthy" / "recovering" / "down"
+
+Only broker-side trouble counts as a failure (exceptions, timeouts, 429/5xx);
+callers pass `is_failure` / `ignore` so rejected orders or expired tokens of
+one account don't open the breaker for every account of that broker.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from config import (
+    BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_FAILURE_RATE,
+    BREAKER_SLOW_CALL_SECS, BREAKER_SLOW_CALL_RATE, BREAKER_OPEN_SECS
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a broker endpoint whose breaker is open."""
+
+    def __init__(self, broker_type: str, endpoint: str, retry_in: float):
+        super().__init__(f"{broker_type} {endpoint} unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.broker_type = broker_type
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Failure-rate / slow-call-rate breaker over a rolling window of calls."""
+
+    def __init__(self, broker_type: str, endpoint: str, window: int = BREAKER_WINDOW,
+                 min_calls: int = BREAKER_MIN_CALLS, failure_rate: float = BREAKER_FAILURE_RATE,
+                 slow_call_secs: float = BREAKER_SLOW_CALL_SECS, slow_call_rate: float = BREAKER_SLOW_CALL_RATE,
+                 open_secs: float = BREAKER_OPEN_SECS):
+        self.broker_type = broker_type
+        self.endpoint = endpoint
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_secs = slow_call_secs
+        self.slow_call_rate = slow_call_rate
+        self.open_secs = open_secs
+        self._calls: deque = deque(maxlen=window)   # (failed, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_secs:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self._opened_at + self.open_secs - time.monotonic()) if self._state == OPEN else 0.0
+
+    def acquire(self):
+        """Permission for one call; raises CircuitOpenError while open (or while a probe is in flight)."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            retry_in = max(0.0, self._opened_at + self.open_secs - now)
+        raise CircuitOpenError(self.broker_type, self.endpoint, retry_in)
+
+    def record(self, failed: bool, elapsed: float):
+        """Outcome of a call that acquire() let through."""
+        slow = elapsed >= self.slow_call_secs
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._trip(f"probe {'failed' if failed else f'took {elapsed:.1f}s'}")
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    logging.info(f"🟢 {self.broker_type} {self.endpoint} recovered: circuit closed")
+                return
+            self._calls.append((failed, slow))
+            if self._state != CLOSED or len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._calls if f) / len(self._calls)
+            slow_calls = sum(1 for _, s in self._calls if s) / len(self._calls)
+            if failures >= self.failure_rate:
+                self._trip(f"{failures:.0%} of the last {len(self._calls)} calls failed")
+            elif slow_calls >= self.slow_call_rate:
+                self._trip(f"{slow_calls:.0%} of the last {len(self._calls)} calls took over {self.slow_call_secs:.0f}s")
+
+    def release(self):
+        """A call acquire() let through ended without an outcome (interrupted): free the probe slot."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+
+    def _trip(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        logging.warning(f"🔴 {self.broker_type} {self.endpoint} circuit open for {self.open_secs:.0f}s: {reason}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            calls = len(self._calls)
+            return {
+                "broker_type": self.broker_type,
+                "endpoint": self.endpoint,
+                "state": state,
+                "calls": calls,
+                "failure_rate": sum(1 for f, _ in self._calls if f) / calls if calls else 0.0,
+                "slow_rate": sum(1 for _, s in self._calls if s) / calls if calls else 0.0,
+                "retry_in": max(0.0, self._opened_at + self.open_secs - time.monotonic()) if state == OPEN else 0.0
+            }
+
+
+class BrokerHealth:
+    """Process-wide breakers, created on first use of each (broker_type, endpoint)."""
+
+    def __init__(self, **breaker_kwargs):
+        self.breaker_kwargs = breaker_kwargs
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, broker_type: str, endpoint: str) -> CircuitBreaker:
+        key = (broker_type, endpoint)
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(broker_type, endpoint, **self.breaker_kwargs)
+            return self._breakers[key]
+
+    def call(self, broker_type: str, endpoint: str, func: Callable, *args,
+             is_failure: Optional[Callable[[Any], bool]] = None,
+             ignore: Tuple[Type[BaseException], ...] = (), **kwargs) -> Any:
+        """
+        Call func through the endpoint's breaker. Exceptions count as failures
+        (except `ignore`d ones) and are re-raised; `is_failure(result)` flags
+        error responses that come back without raising.
+        """
+        breaker = self.breaker(broker_type, endpoint)
+        breaker.acquire()
+        started = time.monotonic()
+        failed = None
+        try:
+            result = func(*args, **kwargs)
+            failed = bool(is_failure and is_failure(result))
+            return result
+        except ignore:
+            failed = False
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if failed is None:
+                # KeyboardInterrupt / SystemExit: no outcome, but don't keep a half-open probe slot taken
+                breaker.release()
+            else:
+                breaker.record(failed, time.monotonic() - started)
+
+    def available(self, broker_type: str, endpoint: Optional[str] = None) -> bool:
+        """False while the endpoint's breaker (any breaker of the broker, if no endpoint) is open."""
+        with self._lock:
+            breakers = [b for (bt, ep), b in self._breakers.items()
+                        if bt == broker_type and endpoint in (None, ep)]
+        return all(b.state != OPEN for b in breakers)
+
+    def status(self, broker_type: str) -> str:
+        """Worst state across the broker's endpoints: "healthy", "recovering" or "down"."""
+        with self._lock:
+            states = {b.state for (bt, _), b in self._breakers.items() if bt == broker_type}
+        if OPEN in states:
+            return "down"
+        if HALF_OPEN in states:
+            return "recovering"
+        return "healthy"
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [b.snapshot() for b in breakers]
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+broker_health = BrokerHealth()
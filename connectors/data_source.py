@@ -1,10 +1,14 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional
 import logging
+import numpy as np
 import pandas as pd
 import datetime
 import time
 
+from .quote_cache import quote_cache
+from utils.symbol_registry import symbol_registry
+
 try:
     import yfinance as yf
 except ImportError:
@@ -41,6 +45,14 @@ class DataSource(ABC):
         """
         pass
 
+    def get_historical_data_many(self, symbols: List[str], period: str = "30d", interval: str = "1d") -> Dict[str, Dict[str, Any]]:
+        """Historical data for several symbols: {symbol: response}. Sources with a batch API override this."""
+        return {symbol: self.get_historical_data(symbol, period=period, interval=interval) for symbol in symbols}
+
+    def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Latest prices for several symbols (0.0 when unavailable). Sources with a batch API override this."""
+        return {symbol: self.get_latest_price(symbol) for symbol in symbols}
+
 class YFinanceDataSource(DataSource):
     """
     Implementation of DataSource using yfinance.
@@ -57,22 +69,106 @@ class YFinanceDataSource(DataSource):
         Example: "NSE:INFY" -> "INFY.NS"
                  "NSE:RELIANCE-EQ" -> "RELIANCE.NS"
         """
-        # Remove exchange prefix
-        if ":" in symbol:
-            _, ticker = symbol.split(":")
+        return symbol_registry.to_yahoo(symbol)
+
+    @staticmethod
+    def _candles_from_frame(df: pd.DataFrame) -> List[list]:
+        """Vectorized OHLCV frame (DatetimeIndex) -> [[epoch_seconds, open, high, low, close, volume], ...]."""
+        df = df.dropna(subset=['Open', 'High', 'Low', 'Close'])
+        if df.empty:
+            return []
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        ts = (index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+        values = np.column_stack([
+            np.asarray(ts, dtype='int64'),
+            df[['Open', 'High', 'Low', 'Close']].to_numpy(dtype='float64'),
+            df['Volume'].fillna(0).to_numpy(dtype='float64')
+        ])
+        candles = values.tolist()
+        for candle in candles:
+            candle[0] = int(candle[0])
+        return candles
+
+    def _download(self, symbols: List[str], **kwargs) -> Dict[str, pd.DataFrame]:
+        """One multi-ticker yf.download, split back into {symbol: OHLCV frame}."""
+        tickers = {self._convert_symbol(symbol): symbol for symbol in symbols}
+        df = yf.download(
+            tickers=list(tickers), group_by='ticker', threads=True, progress=False, **kwargs
+        )
+        frames = {}
+        if df is None or df.empty:
+            return frames
+        for yf_symbol, symbol in tickers.items():
+            if isinstance(df.columns, pd.MultiIndex):
+                if yf_symbol not in df.columns.get_level_values(0):
+                    continue
+                frames[symbol] = df[yf_symbol]
+            elif len(tickers) == 1:
+                # Older yfinance returns flat columns for a single ticker
+                frames[symbol] = df
+        return frames
+
+    def get_historical_data_many(self, symbols: List[str], period: str = "30d", interval: str = "1d",
+                                 start: Optional[str] = None, end: Optional[str] = None,
+                                 auto_adjust: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Historical data for several symbols from a single multi-ticker download.
+        Returns {symbol: {'s': 'ok', 'candles': [...]}} (or an error response per missing symbol).
+        """
+        if not symbols:
+            return {}
+        kwargs = {"interval": interval, "auto_adjust": auto_adjust}
+        if start:
+            kwargs["start"] = start
+            if end:
+                # yfinance treats end as exclusive
+                kwargs["end"] = (datetime.datetime.strptime(end, '%Y-%m-%d') + datetime.timedelta(days=1)).strftime('%Y-%m-%d')
         else:
-            ticker = symbol
-            
-        # Remove -EQ suffix if present (common in Fyers/Zerodha for equity)
-        if ticker.endswith("-EQ"):
-            ticker = ticker.replace("-EQ", "")
-            
-        # Append .NS for NSE stocks
-        return f"{ticker}.NS"
+            kwargs["period"] = period
 
-    def get_historical_data(self, symbol: str, period: str = "30d", interval: str = "1d") -> Dict[str, Any]:
+        logging.info(f"Fetching historical data for {len(symbols)} symbols from yfinance (one batch)")
+        try:
+            frames = self._download(symbols, **kwargs)
+        except Exception as e:
+            logging.error(f"Error batch fetching data from yfinance: {e}")
+            return {symbol: {"s": "error", "message": str(e)} for symbol in symbols}
+
+        result = {}
+        for symbol in symbols:
+            candles = self._candles_from_frame(frames[symbol]) if symbol in frames else []
+            result[symbol] = {"s": "ok", "candles": candles} if candles else {"s": "error", "message": "No data found"}
+        return result
+
+    def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        Latest prices for several symbols from one download of recent daily bars
+        (today's bar carries the current, possibly delayed, price).
+        """
+        prices = {symbol: 0.0 for symbol in symbols}
+        if not symbols:
+            return prices
+        try:
+            frames = self._download(symbols, period="5d", interval="1d", auto_adjust=False)
+        except Exception as e:
+            logging.error(f"Error batch fetching latest prices from yfinance: {e}")
+            return prices
+
+        for symbol, df in frames.items():
+            closes = df['Close'].dropna()
+            if not closes.empty:
+                prices[symbol] = float(closes.iloc[-1])
+        quote_cache.put_many(prices, self.name)
+        return prices
+
+    def get_historical_data(self, symbol: str, period: str = "30d", interval: str = "1d",
+                            start: Optional[str] = None, end: Optional[str] = None,
+                            auto_adjust: bool = True) -> Dict[str, Any]:
         """
         Fetch historical data from yfinance.
+        start/end (YYYY-MM-DD, end inclusive) take precedence over period.
+        auto_adjust=False returns traded prices, matching broker candles.
         """
         yf_symbol = self._convert_symbol(symbol)
         logging.info(f"Fetching historical data for {symbol} (yfinance: {yf_symbol})")
@@ -86,40 +182,21 @@ class YFinanceDataSource(DataSource):
             # Map our period/interval to yfinance compatible ones if needed
             # For now assuming standard inputs like "30d" and "1d" which work fine or need slight adjustment
             
-            df = ticker.history(period=period, interval=interval)
+            if start:
+                # yfinance treats end as exclusive
+                if end:
+                    end = (datetime.datetime.strptime(end, '%Y-%m-%d') + datetime.timedelta(days=1)).strftime('%Y-%m-%d')
+                df = ticker.history(start=start, end=end, interval=interval, auto_adjust=auto_adjust)
+            else:
+                df = ticker.history(period=period, interval=interval, auto_adjust=auto_adjust)
             
             if df.empty:
                 logging.warning(f"No data found for {yf_symbol}")
                 return {"s": "error", "message": "No data found"}
             
-            # Reset index to get Date as a column
-            df = df.reset_index()
-            
-            # Normalize to standard format
             # Fyers/Zerodha format: [[timestamp, open, high, low, close, volume], ...]
-            candles = []
-            for _, row in df.iterrows():
-                # Convert date to timestamp
-                # yfinance Date can be datetime64[ns]
-                if 'Date' in row:
-                    dt = row['Date']
-                elif 'Datetime' in row:
-                    dt = row['Datetime']
-                else:
-                    continue
-                    
-                # Convert to epoch timestamp (seconds)
-                ts = int(dt.timestamp())
-                
-                candles.append([
-                    ts,
-                    row['Open'],
-                    row['High'],
-                    row['Low'],
-                    row['Close'],
-                    row['Volume']
-                ])
-                
+            candles = self._candles_from_frame(df)
+            
             return {
                 "s": "ok",
                 "candles": candles
@@ -139,11 +216,13 @@ class YFinanceDataSource(DataSource):
             # fast_info is faster and often real-time or near real-time for some markets
             price = ticker.fast_info.last_price
             if price:
+                quote_cache.put(symbol, price, self.name)
                 return float(price)
             
             # Fallback to history if fast_info fails
             df = ticker.history(period="1d")
             if not df.empty:
+                quote_cache.put(symbol, df['Close'].iloc[-1], self.name)
                 return float(df['Close'].iloc[-1])
                 
             return 0.0
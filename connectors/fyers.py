@@ -7,10 +7,26 @@ from typing import Dict, List, Optional, Any
 from fyers_apiv3 import fyersModel
 import pytz
 
+from config import FYERS_QUOTES_BATCH_SIZE, FYERS_BASKET_SIZE, HTTP_POOL_SIZE
 from .base import BrokerConnector
+from .circuit_breaker import broker_health, CircuitOpenError
+from .models import Quote, Holding, Order, Fill
+from .quote_cache import quote_cache
 
 UTC = pytz.utc
 
+FYERS_LOG_PATH = os.path.join(tempfile.gettempdir(), "fyers_logs")
+os.makedirs(FYERS_LOG_PATH, exist_ok=True)
+
+# Keep-alive session shared by every FyersConnector for the raw REST calls
+_http = requests.Session()
+_http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+
+
+def _fyers_unavailable(response: Any) -> bool:
+    """Broker-side failure (empty body / 5xx); token and validation errors are the caller's."""
+    return not isinstance(response, dict) or not response or (response.get("code") or 0) >= 500
+
 class FyersConnector(BrokerConnector):
     def __init__(self, api_key: str, api_secret: str, access_token: Optional[str] = None, pin: Optional[str] = None, **kwargs):
         super().__init__(api_key, api_secret, access_token, **kwargs)
@@ -20,17 +36,21 @@ class FyersConnector(BrokerConnector):
         if access_token:
             self._initialize_fyers_model()
 
+    def close(self):
+        """Drop the SDK client; the module's pooled session is shared and stays open."""
+        self.fyers = None
+
+    def _call(self, endpoint: str, func, *args):
+        """SDK call through the (fyers, endpoint) circuit breaker."""
+        return broker_health.call(self.name, endpoint, func, *args, is_failure=_fyers_unavailable)
+
     def _initialize_fyers_model(self):
         """Initializes the FyersModel instance with the current access token."""
         if self.access_token:
-            log_path = os.path.join(tempfile.gettempdir(), "fyers_logs")
-            if not os.path.exists(log_path):
-                os.makedirs(log_path, exist_ok=True)
-                
             self.fyers = fyersModel.FyersModel(
                 client_id=self.api_key,
                 token=self.access_token,
-                log_path=log_path
+                log_path=FYERS_LOG_PATH
             )
         else:
             self.fyers = None
@@ -76,7 +96,7 @@ class FyersConnector(BrokerConnector):
             "pin": self.pin
         }
 
-        resp = requests.post(url, json=payload, headers=headers)
+        resp = _http.post(url, json=payload, headers=headers, timeout=15)
         if resp.status_code == 200:
             data = resp.json()
             if data.get("code") == 200 and "access_token" in data:
@@ -95,19 +115,31 @@ class FyersConnector(BrokerConnector):
         if not self.fyers:
             return False
         try:
-            # attempting to fetch positions to validate token
-            # We use the raw fyers object call to check the response code directly if needed,
-            # but get_positions() wrapper already checks for code 200.
-            self.get_positions()
-            return True
+            # Raw positions call: bypasses the circuit breaker so an outage isn't read as an expired token
+            response = self.fyers.positions()
+            return response.get("code") == 200
         except Exception as e:
             # print(f"[DEBUG] Token validation failed: {e}")
             return False
 
     # --- Market Data ---
-    def get_quote(self, symbol: str) -> Dict[str, Any]:
-        data = {"symbols": symbol}
-        return self.fyers.quotes(data)
+    def get_quote(self, symbol: str) -> Optional[Quote]:
+        return self.get_quotes([symbol]).get(symbol)
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        """Quotes for many symbols via comma-separated quotes calls, split per symbol."""
+        results = {}
+        for i in range(0, len(symbols), FYERS_QUOTES_BATCH_SIZE):
+            chunk = symbols[i:i + FYERS_QUOTES_BATCH_SIZE]
+            response = self._call("quotes", self.fyers.quotes, {"symbols": ",".join(chunk)})
+            if not response or response.get('s') != 'ok':
+                continue
+            for item in response.get('d', []):
+                lp = item.get('v', {}).get('lp')
+                if item.get('n') in chunk and lp:
+                    quote_cache.put(item['n'], lp, "fyers")
+                    results[item['n']] = Quote.from_fyers(item)
+        return results
 
     def get_historical_data(self, symbol: str, resolution: str, from_date: str, to_date: str) -> Dict[str, Any]:
         data = {
@@ -118,42 +150,69 @@ class FyersConnector(BrokerConnector):
             "range_to": to_date,
             "cont_flag": "1"
         }
-        return self.fyers.history(data)
+        return self._call("history", self.fyers.history, data)
 
     def get_orderbook(self, symbol: str) -> Dict[str, Any]:
         # Fyers orderbook API usually takes no args for full depth or specific symbol
         # The generic interface asks for symbol, but Fyers might return all?
         # Let's check live_stratergy.py usage: self.fyers.orderbook(data) where data={"symbol":...}
         data = {"symbol": symbol, "ohlcv_flag": "1"}
-        return self.fyers.orderbook(data)
+        return self._call("depth", self.fyers.orderbook, data)
 
     # --- User Data ---
-    def get_holdings(self) -> List[Dict[str, Any]]:
-        response = self.fyers.holdings()
+    def get_holdings(self) -> List[Holding]:
+        response = self._call("holdings", self.fyers.holdings)
         if response.get("code") == 200:
-            return response.get("holdings", [])
+            holdings = [Holding.from_fyers(h) for h in response.get("holdings", [])]
+            for h in holdings:
+                quote_cache.put(h.symbol, h.ltp, "fyers_holdings")
+            return holdings
         else:
             raise Exception(f"Failed to fetch holdings: {response}")
 
     def get_positions(self) -> List[Dict[str, Any]]:
-        response = self.fyers.positions()
+        response = self._call("positions", self.fyers.positions)
         if response.get("code") == 200:
             return response.get("netPositions", [])
         else:
             raise Exception(f"Failed to fetch positions: {response}")
 
     def get_funds(self) -> Dict[str, Any]:
-        response = self.fyers.funds()
+        response = self._call("funds", self.fyers.funds)
         if response.get("code") == 200:
             return response.get("fund_limit", [])
         else:
             raise Exception(f"Failed to fetch funds: {response}")
 
     def get_profile(self) -> Dict[str, Any]:
-        return self.fyers.get_profile()
+        return self._call("profile", self.fyers.get_profile)
 
     # --- Trading ---
     def place_order(self, symbol: str, qty: int, side: str, order_type: str, price: float = 0.0, trigger_price: float = 0.0, **kwargs) -> Dict[str, Any]:
+        return self._call("orders", self.fyers.place_order, self._order_payload(symbol, qty, side, order_type, price, trigger_price, **kwargs))
+
+    def place_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Multi-order placement: one basket call per FYERS_BASKET_SIZE legs, results per leg."""
+        results = []
+        for i in range(0, len(orders), FYERS_BASKET_SIZE):
+            chunk = orders[i:i + FYERS_BASKET_SIZE]
+            try:
+                response = self._call("orders", self.fyers.place_basket_orders, [self._order_payload(**leg) for leg in chunk])
+            except Exception as e:
+                # Basket may or may not have reached the exchange (see connectors/retry.py)
+                results.extend({"s": "error", "message": str(e), "ambiguous": not isinstance(e, CircuitOpenError)} for _ in chunk)
+                continue
+            legs = response.get("data") if isinstance(response, dict) and response.get("s") == "ok" else None
+            if not legs or len(legs) != len(chunk):
+                results.extend({"s": "error", "message": f"Basket order failed: {response}",
+                                "ambiguous": _fyers_unavailable(response)} for _ in chunk)
+                continue
+            results.extend(leg.get("body") or {"s": "error", "message": leg.get("statusDescription", "")} for leg in legs)
+        return results
+
+    @staticmethod
+    def _order_payload(symbol: str, qty: int, side: str, order_type: str, price: float = 0.0, trigger_price: float = 0.0, **kwargs) -> Dict[str, Any]:
+        """Fyers order body (shared with AsyncFyersConnector)."""
         # Map generic side to Fyers side
         fyers_side = 1 if side.upper() == "BUY" else -1
         
@@ -178,11 +237,13 @@ class FyersConnector(BrokerConnector):
             "disclosedQty": 0,
             "offlineOrder": False,
         }
-        return self.fyers.place_order(data)
+        if kwargs.get("tag"):
+            data["orderTag"] = kwargs["tag"]
+        return data
 
     def cancel_order(self, order_id: str) -> Dict[str, Any]:
         data = {"id": order_id}
-        return self.fyers.cancel_order(data)
+        return self._call("orders", self.fyers.cancel_order, data)
 
     def modify_order(self, order_id: str, new_price: float = 0.0, new_qty: int = 0, **kwargs) -> Dict[str, Any]:
         # This needs careful mapping as Fyers modify takes specific dict
@@ -192,18 +253,18 @@ class FyersConnector(BrokerConnector):
             data["limitPrice"] = new_price
         if new_qty > 0:
             data["qty"] = new_qty
-        return self.fyers.modify_order(data)
+        return self._call("orders", self.fyers.modify_order, data)
 
-    def get_orders(self) -> List[Dict[str, Any]]:
-        response = self.fyers.orderbook()
+    def get_orders(self) -> List[Order]:
+        response = self._call("orderbook", self.fyers.orderbook)
         if response.get("code") == 200:
-            return response.get("orderBook", [])
+            return [Order.from_fyers(o) for o in response.get("orderBook", [])]
         else:
             raise Exception(f"Failed to fetch orders: {response}")
 
-    def get_trades(self) -> List[Dict[str, Any]]:
-        response = self.fyers.tradebook()
+    def get_trades(self) -> List[Fill]:
+        response = self._call("orderbook", self.fyers.tradebook)
         if response.get("code") == 200:
-            return response.get("tradeBook", [])
+            return [Fill.from_fyers(t) for t in response.get("tradeBook", [])]
         else:
             raise Exception(f"Failed to fetch trades: {response}")
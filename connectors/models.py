@@ -0,0 +1,208 @@
+"""
+Broker Data Models
+
+One normalized shape per kind of broker record, built once inside the
+connector that received it:
+
+    Quote     last traded price (+ day OHLC when the broker sends it)
+    Holding   long-term holding with average cost and P&L
+    Order     order book row; status uses the Fyers codes (2 = filled)
+    Fill      trade book row
+    Candle    one OHLCV bar
+    CandleBatch  many bars as parallel numpy arrays (history fetches)
+
+Records are slotted dataclasses: no per-instance __dict__, so a run or page
+holding thousands of them stays small, and consumers read attributes
+instead of re-parsing broker-specific keys (costPrice / average_price,
+ltp / last_price, pl / pnl, tradingsymbol / symbol).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.symbol_registry import symbol_registry
+
+# Kite order status -> Fyers order status code
+KITE_ORDER_STATUS = {
+    "COMPLETE": 2,
+    "CANCELLED": 1,
+    "REJECTED": 5,
+    "OPEN": 6,
+    "AMO REQ RECEIVED": 6
+}
+FILLED = 2
+
+
+@dataclass(slots=True)
+class Quote:
+    symbol: str
+    ltp: float
+    volume: float = 0
+    open: float = 0
+    high: float = 0
+    low: float = 0
+    prev_close: float = 0
+    source: str = ""
+
+    @classmethod
+    def from_fyers(cls, item: Dict[str, Any], source: str = "fyers") -> "Quote":
+        v = item.get('v', {})
+        return cls(
+            symbol=item.get('n', v.get('symbol', '')),
+            ltp=float(v.get('lp') or 0),
+            volume=v.get('volume', 0) or 0,
+            open=v.get('open_price', 0) or 0,
+            high=v.get('high_price', 0) or 0,
+            low=v.get('low_price', 0) or 0,
+            prev_close=v.get('prev_close_price', 0) or 0,
+            source=source
+        )
+
+
+@dataclass(slots=True)
+class Holding:
+    symbol: str
+    quantity: int
+    avg_price: float
+    ltp: float
+    pnl: float
+    broker: str = ""
+
+    @classmethod
+    def from_fyers(cls, h: Dict[str, Any]) -> "Holding":
+        return cls(h.get('symbol', ''), int(h.get('quantity', 0)), float(h.get('costPrice', 0.0)),
+                   float(h.get('ltp', 0.0)), float(h.get('pl', 0.0)))
+
+    @classmethod
+    def from_kite(cls, h: Dict[str, Any]) -> "Holding":
+        return cls(f"NSE:{h['tradingsymbol']}", int(h['quantity']), float(h['average_price']),
+                   float(h['last_price']), float(h['pnl']))
+
+    @property
+    def key(self) -> str:
+        """Canonical symbol (matches trades regardless of broker spelling)."""
+        return symbol_registry.canonical(self.symbol)
+
+    @property
+    def invested(self) -> float:
+        return self.avg_price * self.quantity
+
+    @property
+    def pnl_pct(self) -> float:
+        return self.pnl / self.invested * 100 if self.invested > 0 else 0.0
+
+
+@dataclass(slots=True)
+class Order:
+    order_id: str
+    symbol: str
+    quantity: int
+    filled_quantity: int
+    side: int              # 1 buy, -1 sell
+    order_type: int        # 1 limit, 2 market
+    status: int            # Fyers codes: 1 cancelled, 2 filled, 5 rejected, 6 pending
+    raw_status: Any = None
+    placed_at: Any = None
+    tag: Optional[str] = None       # client order tag sent with place_order
+
+    @property
+    def is_filled(self) -> bool:
+        return self.status == FILLED
+
+    @classmethod
+    def from_fyers(cls, o: Dict[str, Any]) -> "Order":
+        return cls(str(o.get('id', '')), o.get('symbol', ''), int(o.get('qty', 0)), int(o.get('filledQty', 0)),
+                   int(o.get('side', 0)), int(o.get('type', 0)), int(o.get('status', 0)),
+                   o.get('status'), o.get('orderDateTime'), o.get('orderTag'))
+
+    @classmethod
+    def from_kite(cls, o: Dict[str, Any]) -> "Order":
+        return cls(str(o['order_id']), f"NSE:{o['tradingsymbol']}", int(o['quantity']), int(o['filled_quantity']),
+                   1 if o['transaction_type'] == 'BUY' else -1, 1 if o['order_type'] == 'LIMIT' else 2,
+                   KITE_ORDER_STATUS.get(o['status'], 0), o['status'], o['order_timestamp'], o.get('tag'))
+
+
+@dataclass(slots=True)
+class Fill:
+    trade_id: str
+    order_id: str
+    symbol: str
+    quantity: int
+    price: float
+    side: str              # "BUY" / "SELL"
+    filled_at: Any = None
+
+    @classmethod
+    def from_fyers(cls, t: Dict[str, Any]) -> "Fill":
+        return cls(str(t.get('tradeNumber', '')), str(t.get('orderNumber', '')), t.get('symbol', ''),
+                   int(t.get('tradedQty', 0)), float(t.get('tradePrice', 0.0)),
+                   "BUY" if t.get('side') == 1 else "SELL", t.get('orderDateTime'))
+
+    @classmethod
+    def from_kite(cls, t: Dict[str, Any]) -> "Fill":
+        return cls(str(t['trade_id']), str(t['order_id']), f"NSE:{t['tradingsymbol']}", int(t['quantity']),
+                   float(t['average_price']), "BUY" if t['transaction_type'] == 'BUY' else "SELL",
+                   t['fill_timestamp'])
+
+
+@dataclass(slots=True)
+class Candle:
+    ts: int                # epoch seconds
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class CandleBatch:
+    """Candles of one fetch as parallel arrays instead of a list of 6-item lists."""
+
+    __slots__ = ('ts', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, ts=(), open=(), high=(), low=(), close=(), volume=()):
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[List]) -> "CandleBatch":
+        """From the Fyers wire format: [[epoch, open, high, low, close, volume], ...]."""
+        rows = list(rows)
+        if not rows:
+            return cls()
+        cols = np.asarray(rows, dtype=np.float64).T
+        return cls(cols[0], cols[1], cols[2], cols[3], cols[4], cols[5])
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __getitem__(self, i: int) -> Candle:
+        return Candle(int(self.ts[i]), float(self.open[i]), float(self.high[i]), float(self.low[i]),
+                      float(self.close[i]), float(self.volume[i]))
+
+    def __iter__(self) -> Iterator[Candle]:
+        for row in self.rows():
+            yield Candle(*row)
+
+    def rows(self) -> Iterator[Tuple[int, float, float, float, float, float]]:
+        """Plain Python (epoch, open, high, low, close, volume) tuples, ready for BSON."""
+        return zip(self.ts.tolist(), self.open.tolist(), self.high.tolist(),
+                   self.low.tolist(), self.close.tolist(), self.volume.tolist())
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'date': pd.to_datetime(self.ts, unit='s', utc=True),
+            'open': self.open, 'high': self.high, 'low': self.low,
+            'close': self.close, 'volume': self.volume
+        })
+
+    @property
+    def first_ts(self) -> Optional[int]:
+        return int(self.ts.min()) if len(self.ts) else None
@@ -0,0 +1,107 @@
+"""
+Quote Cache
+
+Process-wide last-price cache shared by the connectors, data sources and the
+strategy. Every quote, batch-quote and holdings response feeds it; callers
+read it with their own freshness requirement:
+
+    quote_cache.get(symbol, max_age=QUOTE_MAX_AGE_ORDER, realtime=True)  # order decisions
+    quote_cache.get(symbol, max_age=QUOTE_MAX_AGE_DISPLAY)               # dashboards, validation
+
+Prices from QUOTE_DELAYED_SOURCES (yfinance, minutes behind the market) are
+stamped when they were fetched, so realtime reads skip them rather than
+trusting their age.
+
+Symbols are keyed in one canonical form, so "NSE:INFY-EQ" (Fyers),
+"NSE:INFY" (Zerodha) and "INFY.NS" (yfinance) share an entry.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from config import QUOTE_CACHE_TTL, QUOTE_DELAYED_SOURCES
+from utils.symbol_registry import symbol_registry
+
+
+def quote_key(symbol: str) -> str:
+    """Canonical cache key: NSE:INFY-EQ / NSE:INFY / INFY.NS -> NSE:INFY"""
+    return symbol_registry.canonical(symbol)
+
+
+@dataclass
+class CachedQuote:
+    price: float
+    source: str
+    at: float   # time.time() when the price was observed
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.at
+
+    @property
+    def delayed(self) -> bool:
+        return self.source in QUOTE_DELAYED_SOURCES
+
+
+class QuoteCache:
+    """Thread-safe {symbol: CachedQuote} with a global TTL."""
+
+    def __init__(self, ttl: float = QUOTE_CACHE_TTL):
+        self.ttl = ttl
+        self._quotes: Dict[str, CachedQuote] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, symbol: str, price, source: str, at: Optional[float] = None):
+        try:
+            price = float(price)
+        except (TypeError, ValueError):
+            return
+        if price <= 0:
+            return
+        quote = CachedQuote(price, source, at or time.time())
+        key = quote_key(symbol)
+        with self._lock:
+            current = self._quotes.get(key)
+            # Never replace a newer observation with an older one
+            if current is None or current.at <= quote.at:
+                self._quotes[key] = quote
+
+    def put_many(self, prices: Dict[str, float], source: str):
+        at = time.time()
+        for symbol, price in prices.items():
+            self.put(symbol, price, source, at)
+
+    def get_quote(self, symbol: str, max_age: Optional[float] = None, realtime: bool = False) -> Optional[CachedQuote]:
+        """Cached quote no older than max_age seconds (default: the cache TTL); realtime skips delayed sources."""
+        limit = self.ttl if max_age is None else min(max_age, self.ttl)
+        with self._lock:
+            quote = self._quotes.get(quote_key(symbol))
+            if quote is None or quote.age > limit or (realtime and quote.delayed):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return quote
+
+    def get(self, symbol: str, max_age: Optional[float] = None, realtime: bool = False) -> Optional[float]:
+        quote = self.get_quote(symbol, max_age, realtime)
+        return quote.price if quote else None
+
+    def get_many(self, symbols: Iterable[str], max_age: Optional[float] = None, realtime: bool = False) -> Dict[str, float]:
+        """Prices for the symbols that have a fresh enough entry."""
+        prices = {}
+        for symbol in symbols:
+            price = self.get(symbol, max_age, realtime)
+            if price is not None:
+                prices[symbol] = price
+        return prices
+
+    def clear(self):
+        with self._lock:
+            self._quotes.clear()
+
+
+quote_cache = QuoteCache()
@@ -0,0 +1,292 @@
+"""
+Quote Streams
+
+Push-based quotes. A QuoteStream delivers ticks for the symbols it is
+subscribed to, to callbacks and/or async iterators, and writes every tick
+into quote_cache, the process-wide latest-tick table. Price lookups in the
+strategy and the dashboards (quote_cache.get) then become memory reads
+instead of quote calls:
+
+    stream = ReplayQuoteStream.from_file("ticks.jsonl", speed=60)
+    stream.subscribe(["NSE:INFY-EQ", "NSE:TCS-EQ"])
+    stream.on_tick(lambda tick: print(tick.symbol, tick.ltp))
+    stream.start()                      # background thread
+    ...
+    async for tick in stream.ticks():   # or consume from asyncio
+        ...
+
+ReplayQuoteStream replays recorded tick files (JSON lines or CSV with
+symbol, ts, ltp[, volume]) or candles from the CandleStore, at a
+configurable speed, so the strategy and dashboards can be load-tested
+offline. TickRecorder writes the ticks of any stream in the replayable
+format. Broker WebSocket backends plug in by subclassing QuoteStream.
+
+Replayed ticks are stamped with the current time, so prices read from
+quote_cache look fresh. Replay is therefore only allowed in the environments
+listed in QUOTE_REPLAY_ENVS (test by default), never against live orders.
+"""
+
+import asyncio
+import csv
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Set
+
+from config import MONGO_ENV, QUOTE_REPLAY_SPEED, QUOTE_REPLAY_ENVS
+from .quote_cache import quote_cache, quote_key, QuoteCache
+
+# Intraday offsets of the open / high / low / close ticks synthesized from a candle
+_CANDLE_TICK_OFFSETS = (0.0, 0.3, 0.6, 0.99)
+_RESOLUTION_SECS = {"D": 6 * 3600 + 15 * 60, "1D": 6 * 3600 + 15 * 60}
+
+
+@dataclass(slots=True)
+class Tick:
+    symbol: str
+    ltp: float
+    ts: float              # epoch seconds the tick was traded (recorded time for replays)
+    volume: float = 0
+    source: str = ""
+
+
+class QuoteStream(ABC):
+    """Subscribe / unsubscribe per symbol; ticks go to callbacks, async iterators and the latest-tick table."""
+
+    def __init__(self, name: str, table: Optional[QuoteCache] = quote_cache):
+        self.name = name
+        self.table = table
+        self._subscribed: Set[str] = set()
+        self._callbacks: List[Callable[[Tick], None]] = []
+        self._queues: List[tuple] = []    # (loop, asyncio.Queue)
+        self._lock = threading.Lock()
+        self.ticks_published = 0
+
+    # --- Subscriptions ---
+    def subscribe(self, symbols: Iterable[str]):
+        keys = {quote_key(symbol) for symbol in symbols}
+        with self._lock:
+            new = keys - self._subscribed
+            self._subscribed |= new
+        if new:
+            self._on_subscribe(sorted(new))
+
+    def unsubscribe(self, symbols: Iterable[str]):
+        keys = {quote_key(symbol) for symbol in symbols}
+        with self._lock:
+            gone = keys & self._subscribed
+            self._subscribed -= gone
+        if gone:
+            self._on_unsubscribe(sorted(gone))
+
+    @property
+    def subscriptions(self) -> Set[str]:
+        with self._lock:
+            return set(self._subscribed)
+
+    def _on_subscribe(self, keys: List[str]):
+        """Backend hook (e.g. send a WebSocket subscribe frame)."""
+
+    def _on_unsubscribe(self, keys: List[str]):
+        """Backend hook (e.g. send a WebSocket unsubscribe frame)."""
+
+    # --- Consumers ---
+    def on_tick(self, callback: Callable[[Tick], None]) -> Callable[[Tick], None]:
+        """Register a callback (called on the stream's thread); usable as a decorator."""
+        with self._lock:
+            self._callbacks.append(callback)
+        return callback
+
+    def remove_callback(self, callback: Callable[[Tick], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    async def ticks(self, maxsize: int = 10000) -> AsyncIterator[Tick]:
+        """Async iterator of ticks; ends when the stream stops. Oldest ticks are dropped if the consumer lags."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._queues.append(entry)
+        try:
+            while True:
+                tick = await queue.get()
+                if tick is None:
+                    return
+                yield tick
+        finally:
+            with self._lock:
+                if entry in self._queues:
+                    self._queues.remove(entry)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, tick: Optional[Tick]):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(tick)
+
+    def _publish(self, tick: Tick):
+        """Deliver one tick from the backend, if its symbol is subscribed."""
+        key = quote_key(tick.symbol)
+        with self._lock:
+            if key not in self._subscribed:
+                return
+            callbacks = list(self._callbacks)
+            queues = list(self._queues)
+        if self.table is not None:
+            # Observed now: freshness checks (max_age) are against wall-clock time, also for replays
+            self.table.put(tick.symbol, tick.ltp, f"stream:{self.name}")
+        self.ticks_published += 1
+        for callback in callbacks:
+            try:
+                callback(tick)
+            except Exception as e:
+                logging.error(f"Quote stream callback failed for {tick.symbol}: {e}")
+        for loop, queue in queues:
+            loop.call_soon_threadsafe(self._offer, queue, tick)
+
+    def _close_iterators(self):
+        with self._lock:
+            queues = list(self._queues)
+        for loop, queue in queues:
+            loop.call_soon_threadsafe(self._offer, queue, None)
+
+    # --- Lifecycle ---
+    @abstractmethod
+    def start(self):
+        """Start delivering ticks in the background."""
+        pass
+
+    @abstractmethod
+    def stop(self):
+        """Stop delivering ticks and end the async iterators."""
+        pass
+
+
+class ReplayQuoteStream(QuoteStream):
+    """
+    Replays recorded ticks in timestamp order. speed=1 is real time, 60 plays
+    a minute per second, 0 replays as fast as possible; loop=True starts over
+    at the end (soak tests).
+    """
+
+    def __init__(self, ticks: Iterable[Tick], speed: float = QUOTE_REPLAY_SPEED, loop: bool = False,
+                 name: str = "replay", table: Optional[QuoteCache] = quote_cache):
+        super().__init__(name, table)
+        self._ticks = sorted(ticks, key=lambda t: t.ts)
+        self.speed = speed
+        self.loop = loop
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ReplayQuoteStream":
+        """Ticks from a .jsonl / .json-lines file or a CSV with symbol, ts, ltp[, volume] columns."""
+        with open(path, newline="") as f:
+            if path.endswith(".csv"):
+                rows = list(csv.DictReader(f))
+            else:
+                rows = [json.loads(line) for line in f if line.strip()]
+        ticks = [Tick(r["symbol"], float(r["ltp"]), float(r["ts"]), float(r.get("volume") or 0), "replay")
+                 for r in rows]
+        logging.info(f"📼 Loaded {len(ticks)} ticks from {path}")
+        return cls(ticks, **kwargs)
+
+    @classmethod
+    def from_candle_store(cls, store, symbols: List[str], start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, **kwargs) -> "ReplayQuoteStream":
+        """Open, high/low (in price-path order) and close ticks synthesized from stored candles."""
+        span = _RESOLUTION_SECS.get(store.resolution) or int(store.resolution) * 60
+        ticks = []
+        for symbol, ts, (o, h, l, c, v) in store.iter_rows(symbols, start, end):
+            path = (o, l, h, c) if c >= o else (o, h, l, c)
+            for offset, price in zip(_CANDLE_TICK_OFFSETS, path):
+                if price:
+                    ticks.append(Tick(symbol, float(price), ts + offset * span, (v or 0) / 4, "candles"))
+        logging.info(f"📼 Synthesized {len(ticks)} ticks from {store.resolution} candles of {len(symbols)} symbols")
+        return cls(ticks, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+    @property
+    def symbols(self) -> Set[str]:
+        """Symbols present in the recording."""
+        return {tick.symbol for tick in self._ticks}
+
+    def run(self) -> int:
+        """Replay on the calling thread; returns the number of ticks published."""
+        published = self.ticks_published
+        while not self._stop.is_set():
+            prev_ts = None
+            for tick in self._ticks:
+                if self._stop.is_set():
+                    break
+                if self.speed and prev_ts is not None and tick.ts > prev_ts:
+                    self._stop.wait((tick.ts - prev_ts) / self.speed)
+                prev_ts = tick.ts
+                self._publish(tick)
+            if not self.loop:
+                break
+        self._close_iterators()
+        return self.ticks_published - published
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name=f"quote-{self.name}", daemon=True)
+        self._thread.start()
+        logging.info(f"▶️ Replaying {len(self._ticks)} ticks at {self.speed or 'max'}x for {len(self.subscriptions)} symbols")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._close_iterators()
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for a non-looping replay to finish."""
+        if self._thread:
+            self._thread.join(timeout)
+
+
+class TickRecorder:
+    """Stream callback appending ticks as JSON lines (replayable with ReplayQuoteStream.from_file)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def __call__(self, tick: Tick):
+        line = json.dumps({"symbol": tick.symbol, "ts": tick.ts, "ltp": tick.ltp, "volume": tick.volume})
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def replay_stream_from_config(source: Optional[str], candle_store=None, symbols: Optional[List[str]] = None,
+                              start: Optional[datetime] = None, end: Optional[datetime] = None,
+                              env: str = MONGO_ENV, **kwargs) -> Optional[ReplayQuoteStream]:
+    """
+    Stream named by QUOTE_REPLAY_SOURCE: a tick file path, or "candles" to replay
+    the candle store. None when unset, or when `env` isn't a replay environment.
+    """
+    if not source:
+        return None
+    if env not in QUOTE_REPLAY_ENVS:
+        logging.error(f"🚫 QUOTE_REPLAY_SOURCE is set but ENV={env}: replayed prices would look live; not streaming")
+        return None
+    if source == "candles":
+        if candle_store is None or not symbols:
+            logging.warning("QUOTE_REPLAY_SOURCE=candles needs a candle store and symbols; not streaming")
+            return None
+        return ReplayQuoteStream.from_candle_store(candle_store, symbols, start, end, **kwargs)
+    return ReplayQuoteStream.from_file(source, **kwargs)
@@ -0,0 +1,149 @@
+"""
+Connector Registry
+
+Process-wide cache of broker connectors. Building a FyersConnector or
+ZerodhaConnector sets up a fresh HTTP client each time; pages and jobs that
+touch every broker on every request pay that cost over and over. The
+registry hands out one connector per broker account instead:
+
+    connector = connector_registry.for_account(broker_doc)
+    async_connector = connector_registry.for_account(broker_doc, asynchronous=True)
+
+Entries are keyed by (broker_id, token fingerprint). A new access token for
+the same account evicts the old client; connectors nobody asked for within
+CONNECTOR_IDLE_TIMEOUT are dropped on the next lookup. Evicted connectors are
+closed (async ones on the broker loop) so their sockets don't pile up.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+from config import CONNECTOR_IDLE_TIMEOUT
+from .async_base import AsyncBrokerConnector, close_soon
+from .async_fyers import AsyncFyersConnector
+from .async_zerodha import AsyncZerodhaConnector
+from .base import BrokerConnector
+from .fyers import FyersConnector
+from .zerodha import ZerodhaConnector
+
+CONNECTOR_CLASSES = {"fyers": FyersConnector, "zerodha": ZerodhaConnector}
+ASYNC_CONNECTOR_CLASSES = {"fyers": AsyncFyersConnector, "zerodha": AsyncZerodhaConnector}
+
+
+def token_fingerprint(api_key: Optional[str], access_token: Optional[str]) -> str:
+    """Short, non-reversible id of the credentials a connector was built with."""
+    return hashlib.sha256(f"{api_key}:{access_token}".encode()).hexdigest()[:16]
+
+
+@dataclass
+class _Entry:
+    connector: Union[BrokerConnector, AsyncBrokerConnector]
+    last_used: float
+
+
+class ConnectorRegistry:
+    """Reusable connectors keyed by broker account and token."""
+
+    def __init__(self, idle_timeout: float = CONNECTOR_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, broker_type: str, api_key: str, api_secret: str, access_token: Optional[str],
+            pin: Optional[str] = None, broker_id: Optional[str] = None, asynchronous: bool = False):
+        """Cached connector for these credentials, building one on first use."""
+        classes = ASYNC_CONNECTOR_CLASSES if asynchronous else CONNECTOR_CLASSES
+        if broker_type not in classes:
+            raise ValueError(f"Unsupported broker type: {broker_type}")
+        account = broker_id or f"{broker_type}:{api_key}"
+        if asynchronous:
+            account = f"{account}|async"
+        fingerprint = token_fingerprint(api_key, access_token)
+        now = time.monotonic()
+
+        with self._lock:
+            evicted = self._evict_idle(now)
+            entry = self._entries.get((account, fingerprint))
+            if entry is None:
+                # Connector refreshed its own token in place: still the same client
+                entry = next((e for (acc, _), e in self._entries.items()
+                              if acc == account and e.connector.access_token == access_token), None)
+            if entry is not None:
+                entry.last_used = now
+                self.hits += 1
+                connector = entry.connector
+            else:
+                self.misses += 1
+                stale = self._pop([key for key in self._entries if key[0] == account])
+                if stale:
+                    logging.info(f"🔌 Token changed for {account}: replacing pooled {broker_type} connector")
+                evicted += stale
+
+                kwargs = {"pin": pin} if broker_type == "fyers" else {}
+                connector = classes[broker_type](
+                    api_key=api_key, api_secret=api_secret, access_token=access_token, **kwargs
+                )
+                self._entries[(account, fingerprint)] = _Entry(connector, now)
+
+        self._close(evicted)
+        return connector
+
+    def for_account(self, broker_doc: Dict, asynchronous: bool = False):
+        """Connector for a broker_accounts document (Fyers docs may use client_id / secret_id)."""
+        broker_type = broker_doc.get('broker_type', broker_doc.get('broker'))
+        if broker_type == 'fyers':
+            api_key = broker_doc.get('client_id') or broker_doc.get('api_key')
+            api_secret = broker_doc.get('secret_id') or broker_doc.get('api_secret')
+        else:
+            api_key, api_secret = broker_doc.get('api_key'), broker_doc.get('api_secret')
+        return self.get(
+            broker_type,
+            api_key=api_key,
+            api_secret=api_secret,
+            access_token=broker_doc.get('access_token'),
+            pin=broker_doc.get('pin'),
+            broker_id=broker_doc.get('broker_id') or (str(broker_doc['_id']) if broker_doc.get('_id') else None),
+            asynchronous=asynchronous
+        )
+
+    def evict(self, broker_id: str):
+        """Drop every connector of an account (logout, credential change)."""
+        with self._lock:
+            evicted = self._pop([key for key in self._entries if key[0] in (broker_id, f"{broker_id}|async")])
+        self._close(evicted)
+
+    def _evict_idle(self, now: float) -> List:
+        return self._pop([key for key, entry in self._entries.items() if now - entry.last_used > self.idle_timeout])
+
+    def _pop(self, keys) -> List:
+        """Remove entries (lock held) and return their connectors for closing."""
+        return [self._entries.pop(key).connector for key in keys]
+
+    @staticmethod
+    def _close(connectors: List):
+        """Close dropped connectors outside the lock; a failed close only gets logged."""
+        for connector in connectors:
+            try:
+                if isinstance(connector, AsyncBrokerConnector):
+                    close_soon(connector)
+                else:
+                    connector.close()
+            except Exception as e:
+                logging.warning(f"⚠️ Error closing {connector.name} connector: {e}")
+
+    def clear(self):
+        with self._lock:
+            evicted = self._pop(list(self._entries))
+        self._close(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+connector_registry = ConnectorRegistry()
@@ -0,0 +1,284 @@
+"""
+Broker Retry Policies
+
+How a failed broker call is retried depends on what the call does:
+
+    READ              quotes, holdings, orders, funds: safe to repeat
+    IDEMPOTENT_WRITE  cancel / modify of a known order id: repeating lands in the same state
+    ORDER             place_order: NOT idempotent. Every order carries a client tag, and an
+                      ambiguous failure (timeout, 5xx) is followed, after a fixed ORDER_SETTLE_SECS,
+                      by an order-book lookup for that tag; the order is only re-sent when the
+                      broker has no record of it. A lookup that fails re-sends nothing.
+
+Backoff uses full jitter (a random sleep in [0, min(max_delay, base * 2^attempt)]),
+so runs hitting the same degraded API don't retry in lockstep. All retries of a
+strategy run draw from one RetryBudget; once it is spent calls fail on their first
+error instead of stretching the run.
+
+    budget = RetryBudget()
+    holdings = call_with_policy(broker, "get_holdings", budget=budget)
+    response = place_order_safely(broker, budget, symbol="NSE:INFY-EQ", qty=1, side="BUY", order_type="MARKET")
+    responses = place_orders_safely(broker, budget, [leg, leg, ...])   # one basket, results per leg
+"""
+
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from config import RETRY_BUDGET_RETRIES, RETRY_BUDGET_SECS, ORDER_SETTLE_SECS
+from .circuit_breaker import CircuitOpenError
+
+# Error codes meaning "throttled, nothing was done" (Fyers request limits)
+RATE_LIMIT_CODES = {429, 10006, 10007}
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    name: str
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+READ = RetryPolicy("read", max_attempts=3, base_delay=0.5, max_delay=8.0)
+IDEMPOTENT_WRITE = RetryPolicy("idempotent_write", max_attempts=3, base_delay=1.0, max_delay=8.0)
+ORDER = RetryPolicy("order", max_attempts=2, base_delay=1.0, max_delay=5.0)
+
+# Connector method -> policy
+METHOD_POLICIES = {
+    "get_quote": READ,
+    "get_quotes": READ,
+    "get_historical_data": READ,
+    "get_orderbook": READ,
+    "get_holdings": READ,
+    "get_positions": READ,
+    "get_funds": READ,
+    "get_profile": READ,
+    "get_orders": READ,
+    "get_trades": READ,
+    "cancel_order": IDEMPOTENT_WRITE,
+    "modify_order": IDEMPOTENT_WRITE,
+    "place_order": ORDER,
+    "place_orders": ORDER,
+}
+
+
+class RetryBudget:
+    """Retries (and backoff seconds) one run may spend across all its broker calls."""
+
+    def __init__(self, max_retries: int = RETRY_BUDGET_RETRIES, max_sleep: float = RETRY_BUDGET_SECS):
+        self.max_retries = max_retries
+        self.max_sleep = max_sleep
+        self.retries = 0
+        self.slept = 0.0
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def spend(self, delay: float) -> bool:
+        """Reserve one retry sleeping `delay`; False once the budget can't cover it."""
+        with self._lock:
+            if self.retries >= self.max_retries or self.slept + delay > self.max_sleep:
+                if not self.exhausted:
+                    self.exhausted = True
+                    logging.warning(f"⏱️ Retry budget spent ({self.retries} retries, {self.slept:.1f}s backoff): failing fast from now on")
+                return False
+            self.retries += 1
+            self.slept += delay
+            return True
+
+
+def new_order_tag() -> str:
+    """Client order tag: alphanumeric and at most 20 characters (Kite's limit; Fyers allows more)."""
+    return f"ns{uuid.uuid4().hex[:16]}"
+
+
+def is_rate_limited(response: Any) -> bool:
+    return isinstance(response, dict) and response.get('s') == 'error' and response.get('code', 0) in RATE_LIMIT_CODES
+
+
+def _backoff(policy: RetryPolicy, attempt: int, budget: Optional[RetryBudget]) -> bool:
+    """Sleep before the next attempt if the run's budget allows it."""
+    delay = policy.backoff(attempt)
+    if budget is not None and not budget.spend(delay):
+        return False
+    time.sleep(delay)
+    return True
+
+
+def _settle():
+    """Fixed wait before an order-book lookup: an order still in flight wouldn't be listed yet."""
+    time.sleep(ORDER_SETTLE_SECS)
+
+
+def _can_resend(budget: Optional[RetryBudget]) -> bool:
+    """Reserve a re-send (no extra sleep: the settle wait already happened)."""
+    return budget is None or budget.spend(0.0)
+
+
+def call_with_retry(func: Callable[[], Any], policy: RetryPolicy = READ, budget: Optional[RetryBudget] = None) -> Any:
+    """
+    Call func under a READ / IDEMPOTENT_WRITE policy. Exceptions and rate-limit
+    responses are retried; the last exception is raised (the last response returned)
+    when attempts or budget run out. Open circuits are never retried.
+    """
+    if policy is ORDER:
+        raise ValueError("place_order must go through place_order_safely")
+    for attempt in range(policy.max_attempts):
+        last = attempt == policy.max_attempts - 1
+        try:
+            result = func()
+        except CircuitOpenError:
+            raise
+        except Exception:
+            if last or not _backoff(policy, attempt, budget):
+                raise
+            continue
+        if is_rate_limited(result) and not last and _backoff(policy, attempt, budget):
+            continue
+        return result
+
+
+def call_with_policy(broker, method: str, *args, budget: Optional[RetryBudget] = None, **kwargs) -> Any:
+    """Call a connector method under the policy declared for it in METHOD_POLICIES."""
+    policy = METHOD_POLICIES.get(method, READ)
+    if method == "place_orders":
+        return place_orders_safely(broker, budget, *args, **kwargs)
+    if policy is ORDER:
+        return place_order_safely(broker, budget, **kwargs)
+    return call_with_retry(lambda: getattr(broker, method)(*args, **kwargs), policy, budget)
+
+
+def find_orders_by_tag(broker, tags: List[str]) -> Dict[str, Any]:
+    """{tag: order} for the day's orders carrying our client tags. Lookup errors propagate."""
+    found = {}
+    for order in broker.get_orders():
+        for tag in tags:
+            if order.tag and tag in str(order.tag):
+                found[tag] = order
+    return found
+
+
+def find_order_by_tag(broker, tag: str):
+    """The day's order carrying our client tag, or None. Lookup errors propagate."""
+    return find_orders_by_tag(broker, [tag]).get(tag)
+
+
+def _as_response(response: Any, tag: str) -> Dict[str, Any]:
+    if not isinstance(response, dict):
+        response = {"s": "error", "message": f"Unexpected order response: {response}", "ambiguous": True}
+    response.setdefault("tag", tag)
+    return response
+
+
+def _recovered(order, tag: str) -> Dict[str, Any]:
+    logging.info(f"🔎 Order {tag} was accepted despite the error: broker order {order.order_id}")
+    return {"s": "ok", "id": order.order_id, "tag": tag, "message": "Order placed (recovered after ambiguous failure)"}
+
+
+def _is_ambiguous(response: Dict[str, Any]) -> bool:
+    """
+    The broker may or may not have accepted the order (timeout, 5xx, dropped connection).
+    Throttled responses are definite (nothing was placed), even though Fyers' codes are >= 500.
+    """
+    if is_rate_limited(response):
+        return False
+    return bool(response.get('ambiguous')) or (response.get('code') or 0) >= 500
+
+
+def place_order_safely(broker, budget: Optional[RetryBudget] = None, tag: Optional[str] = None, **order) -> Dict[str, Any]:
+    """
+    Place an order at most once. Throttled attempts are retried; after an ambiguous
+    failure the order book is searched for the client tag first, and the order is
+    re-sent only if it isn't there. Definitive rejections are returned as they are.
+    The response carries the tag, so the trade can be matched to the broker's order later.
+    """
+    tag = tag or new_order_tag()
+    policy = ORDER
+    for attempt in range(policy.max_attempts):
+        try:
+            response = broker.place_order(tag=tag, **order)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            response = {"s": "error", "message": str(e), "ambiguous": True}
+        response = _as_response(response, tag)
+
+        if response.get('s') == 'ok':
+            return response
+        last = attempt == policy.max_attempts - 1
+        if is_rate_limited(response):
+            if last or not _backoff(policy, attempt, budget):
+                return response
+            continue
+        if not _is_ambiguous(response):
+            return response
+
+        # Ambiguous: let the broker settle, then look before re-sending
+        _settle()
+        try:
+            existing = find_order_by_tag(broker, tag)
+        except Exception as e:
+            logging.error(f"❓ Order {tag} state unknown (lookup failed: {e}); not re-sending")
+            return {**response, "message": f"Order state unknown: {response.get('message')}"}
+        if existing is not None:
+            return _recovered(existing, tag)
+        if last or not _can_resend(budget):
+            return response
+        logging.warning(f"🔁 Order {tag} not found at broker after ambiguous failure; re-sending")
+    return response
+
+
+def place_orders_safely(broker, budget: Optional[RetryBudget], orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Several orders in one broker.place_orders call, with place_order_safely's
+    guarantees per leg: every leg is tagged, ambiguous legs are looked up in a
+    single order-book read, and only legs the broker has no record of (or that
+    were throttled) are re-sent, one by one. Results come back per leg, in order.
+    """
+    legs = [{**leg, "tag": leg.get("tag") or new_order_tag()} for leg in orders]
+    try:
+        results = broker.place_orders(legs)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        results = [{"s": "error", "message": str(e), "ambiguous": True} for _ in legs]
+    results = [_as_response(r, leg["tag"]) for r, leg in zip(results, legs)]
+
+    failed = [i for i, r in enumerate(results) if r.get('s') != 'ok']
+    ambiguous = [i for i in failed if _is_ambiguous(results[i])]
+    throttled = [i for i in failed if is_rate_limited(results[i])]
+    if not (ambiguous or throttled):
+        return results
+
+    # Let the broker settle, then one order-book read for every ambiguous leg
+    resend = set()
+    if ambiguous:
+        _settle()
+        try:
+            found = find_orders_by_tag(broker, [legs[i]["tag"] for i in ambiguous])
+        except Exception as e:
+            logging.error(f"❓ State of {len(ambiguous)} orders unknown (lookup failed: {e}); not re-sending")
+            found = None
+        for i in ambiguous:
+            tag = legs[i]["tag"]
+            if found is None:
+                results[i] = {**results[i], "message": f"Order state unknown: {results[i].get('message')}"}
+            elif tag in found:
+                results[i] = _recovered(found[tag], tag)
+            elif _can_resend(budget):
+                resend.add(i)
+    if throttled and _backoff(ORDER, 0, budget):
+        resend.update(throttled)
+
+    for i in sorted(resend):
+        logging.warning(f"🔁 Re-sending order {legs[i]['tag']} ({legs[i].get('side')} {legs[i].get('symbol')})")
+        results[i] = place_order_safely(broker, budget, **legs[i])
+    return results
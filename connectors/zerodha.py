@@ -1,36 +1,78 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
 import pandas as pd
 from datetime import datetime
 import os
+from config import KITE_LTP_BATCH_SIZE, KITE_ORDER_RATE, HTTP_POOL_SIZE
 from .base import BrokerConnector
+from .circuit_breaker import broker_health, CircuitOpenError
+from .models import Quote, Holding, Order, Fill
+from .quote_cache import quote_cache
+from .zerodha_instruments import get_instrument_master
+from utils.symbol_registry import symbol_registry
+from utils.rate_limiter import TokenBucket
+from .data_source import YFinanceDataSource
 
 try:
     from kiteconnect import KiteConnect
+    from kiteconnect import exceptions as kite_exceptions
+    # Account / request problems: raised by a healthy API, so they don't count against the breaker
+    KITE_CLIENT_ERRORS = (kite_exceptions.TokenException, kite_exceptions.PermissionException,
+                          kite_exceptions.InputException, kite_exceptions.OrderException)
 except ImportError:
     KiteConnect = None
+    KITE_CLIENT_ERRORS = ()
 
 try:
     import yfinance as yf
 except ImportError:
     yf = None
 
+# Kite's order-placement limit, shared by every ZerodhaConnector in the process
+_order_bucket = TokenBucket(KITE_ORDER_RATE)
+
 class ZerodhaConnector(BrokerConnector):
     def __init__(self, api_key: str, api_secret: str, access_token: Optional[str] = None, **kwargs):
         super().__init__(api_key, api_secret, access_token, **kwargs)
         self.name = "zerodha"
         self.kite = None
+        self.instruments = get_instrument_master("NSE")
         
         if KiteConnect is None:
             logging.error("kiteconnect library not installed. Please install it using 'pip install kiteconnect'.")
             return
 
-        self.kite = KiteConnect(api_key=self.api_key)
+        # Kite keeps one requests.Session per client; size its keep-alive pool
+        self.kite = KiteConnect(api_key=self.api_key, pool={"pool_connections": HTTP_POOL_SIZE, "pool_maxsize": HTTP_POOL_SIZE})
 
         if access_token:
             self.kite.set_access_token(access_token)
             self.access_token = access_token
 
+    def close(self):
+        """Close Kite's requests.Session so its pooled sockets are released."""
+        session = getattr(self.kite, "reqsession", None)
+        if session is not None:
+            session.close()
+        self.kite = None
+
+    def _call(self, endpoint: str, func, *args, **kwargs):
+        """Kite call through the (zerodha, endpoint) circuit breaker."""
+        return broker_health.call(self.name, endpoint, func, *args, ignore=KITE_CLIENT_ERRORS, **kwargs)
+
+    def _kite_symbol(self, symbol: str) -> str:
+        """Kite instrument key: "NSE:INFY-EQ" -> "NSE:INFY" (Zerodha doesn't use the -EQ suffix)."""
+        return symbol_registry.to_zerodha(symbol)
+
+    def _instrument_token(self, symbol: str) -> Optional[int]:
+        """Token from the daily instrument master; kite.quote() only if the master is unavailable."""
+        if self.instruments.ensure_loaded(self.kite):
+            return self.instruments.get_token(symbol)
+        z_symbol = self._kite_symbol(symbol)
+        quote = self.kite.quote(z_symbol)
+        return quote[z_symbol]['instrument_token'] if z_symbol in quote else None
+
     def get_login_url(self, redirect_uri: str, **kwargs) -> str:
         """Generate the login URL for Zerodha."""
         if not self.kite:
@@ -72,59 +114,29 @@ class ZerodhaConnector(BrokerConnector):
             raise Exception("KiteConnect not initialized")
         raise NotImplementedError("Zerodha tokens typically require daily login. Please re-authenticate.")
 
-    def get_holdings(self) -> List[Dict[str, Any]]:
-        """Fetch holdings and normalize to standard format."""
+    def get_holdings(self) -> List[Holding]:
+        """Fetch holdings and normalize. Raises on failure, so callers can keep what they had."""
         if not self.kite:
-            return []
+            raise Exception("Kite client not initialized")
         
         try:
-            holdings = self.kite.holdings()
-            normalized_holdings = []
-            for h in holdings:
-                normalized_holdings.append({
-                    "symbol": f"NSE:{h['tradingsymbol']}",
-                    "quantity": h['quantity'],
-                    "costPrice": h['average_price'],
-                    "ltp": h['last_price'],
-                    "pl": h['pnl'],
-                })
-            return normalized_holdings
+            return self._normalize_holdings(self._call("holdings", self.kite.holdings))
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logging.error(f"Error getting Zerodha holdings: {e}")
-            return []
+            raise
 
-    def get_orders(self) -> List[Dict[str, Any]]:
-        """Fetch orders and normalize."""
+    def get_orders(self) -> List[Order]:
+        """Fetch orders and normalize. Raises when the order book can't be read (tag lookups rely on it)."""
         if not self.kite:
-            return []
+            raise Exception("Kite client not initialized")
         
         try:
-            orders = self.kite.orders()
-            normalized_orders = []
-            for o in orders:
-                status_map = {
-                    "COMPLETE": 2,
-                    "CANCELLED": 1,
-                    "REJECTED": 5,
-                    "OPEN": 6,
-                    "AMO REQ RECEIVED": 6
-                }
-                
-                normalized_orders.append({
-                    "id": o['order_id'],
-                    "symbol": f"NSE:{o['tradingsymbol']}",
-                    "qty": o['quantity'],
-                    "filled_qty": o['filled_quantity'],
-                    "side": 1 if o['transaction_type'] == 'BUY' else -1,
-                    "type": 1 if o['order_type'] == 'LIMIT' else 2,
-                    "status": status_map.get(o['status'], 0),
-                    "original_status": o['status'],
-                    "order_time": o['order_timestamp']
-                })
-            return normalized_orders
+            return [Order.from_kite(o) for o in self._call("orderbook", self.kite.orders)]
         except Exception as e:
             logging.error(f"Error getting Zerodha orders: {e}")
-            return []
+            raise
 
     def place_order(self, symbol: str, qty: int, side: str, order_type: str, productType: str = "CNC", **kwargs) -> Dict[str, Any]:
         """
@@ -138,15 +150,7 @@ class ZerodhaConnector(BrokerConnector):
 
         try:
             # Parse symbol: "NSE:INFY-EQ" -> exchange="NSE", tradingsymbol="INFY"
-            # Zerodha doesn't use -EQ suffix
-            if ":" in symbol:
-                exchange, tradingsymbol = symbol.split(":")
-            else:
-                exchange = "NSE"
-                tradingsymbol = symbol
-            
-            if tradingsymbol.endswith("-EQ"):
-                tradingsymbol = tradingsymbol.replace("-EQ", "")
+            exchange, tradingsymbol = self._kite_symbol(symbol).split(":", 1)
 
             transaction_type = self.kite.TRANSACTION_TYPE_BUY if side.upper() == "BUY" else self.kite.TRANSACTION_TYPE_SELL
             
@@ -164,7 +168,8 @@ class ZerodhaConnector(BrokerConnector):
             else:
                 k_product = self.kite.PRODUCT_CNC
 
-            order_id = self.kite.place_order(
+            order_id = self._call(
+                "orders", self.kite.place_order,
                 variety=self.kite.VARIETY_REGULAR,
                 exchange=exchange,
                 tradingsymbol=tradingsymbol,
@@ -173,7 +178,7 @@ class ZerodhaConnector(BrokerConnector):
                 product=k_product,
                 order_type=k_order_type,
                 price=kwargs.get('price'),
-                tag="nifty_shop"
+                tag=kwargs.get('tag') or "nifty_shop"
             )
             
             return {
@@ -184,7 +189,24 @@ class ZerodhaConnector(BrokerConnector):
 
         except Exception as e:
             logging.error(f"Error placing Zerodha order: {e}")
-            return {"s": "error", "message": str(e)}
+            # Network / 5xx errors leave the order's fate unknown (see connectors/retry.py)
+            ambiguous = not isinstance(e, KITE_CLIENT_ERRORS + (CircuitOpenError,))
+            return {"s": "error", "message": str(e), "ambiguous": ambiguous}
+
+    def place_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Kite has no basket placement endpoint (baskets are a Kite web feature),
+        so legs are placed in parallel, paced by the shared order-rate bucket.
+        """
+        if not orders:
+            return []
+
+        def _place(leg):
+            _order_bucket.acquire()
+            return self.place_order(**leg)
+
+        with ThreadPoolExecutor(max_workers=min(len(orders), KITE_ORDER_RATE)) as pool:
+            return list(pool.map(_place, orders))
 
     def get_historical_data(self, symbol: str, resolution: str, from_date: str, to_date: str, **kwargs) -> Dict[str, Any]:
         """
@@ -195,14 +217,9 @@ class ZerodhaConnector(BrokerConnector):
             return {"s": "error", "message": "Kite not initialized"}
 
         try:
-            # Normalize symbol for Zerodha (strip -EQ)
-            z_symbol = symbol.replace("-EQ", "")
-            
-            quote = self.kite.quote(z_symbol)
-            if z_symbol not in quote:
+            instrument_token = self._instrument_token(symbol)
+            if instrument_token is None:
                  return {"s": "error", "message": "Symbol not found"}
-            
-            instrument_token = quote[z_symbol]['instrument_token']
 
             res_map = {
                 "D": "day",
@@ -215,7 +232,8 @@ class ZerodhaConnector(BrokerConnector):
             }
             interval = res_map.get(resolution, "day")
 
-            records = self.kite.historical_data(
+            records = self._call(
+                "history", self.kite.historical_data,
                 instrument_token=instrument_token,
                 from_date=from_date,
                 to_date=to_date,
@@ -243,95 +261,70 @@ class ZerodhaConnector(BrokerConnector):
             logging.error(f"Error getting Zerodha historical data: {e}")
             return {"s": "error", "message": str(e)}
 
-    def get_quote(self, symbol: str) -> Dict[str, Any]:
-        """Get quote using yfinance (fallback for restricted Zerodha API)."""
-        if not self.kite:
-            return {}
-        
-        try:
-            # Normalize symbol for Zerodha (strip -EQ)
-            z_symbol = symbol.replace("-EQ", "")
-            
-            # Use yfinance for LTP
-            # Convert to yfinance format: NSE:INFY -> INFY.NS
-            if ":" in z_symbol:
-                _, ticker = z_symbol.split(":")
-            else:
-                ticker = z_symbol
-            
-            yf_symbol = f"{ticker}.NS"
-            
-            lp = 0.0
-            if yf:
-                try:
-                    ticker_obj = yf.Ticker(yf_symbol)
-                    # Try fast_info first
-                    lp = ticker_obj.fast_info.last_price
-                    if not lp:
-                        # Fallback to history
-                        hist = ticker_obj.history(period="1d")
-                        if not hist.empty:
-                            lp = float(hist['Close'].iloc[-1])
-                except Exception as e:
-                    logging.error(f"Error fetching yfinance price for {yf_symbol}: {e}")
-
-            if lp > 0:
-                return {
-                    "s": "ok",
-                    "d": [{
-                        "v": {
-                            "lp": lp,
-                            "volume": 0,
-                            "open_price": 0,
-                            "high_price": 0,
-                            "low_price": 0,
-                            "prev_close_price": 0
-                        }
-                    }]
-                }
-            
-            # Fallback to Zerodha API (which might fail)
-            # Try LTP first (lighter, less permissions needed)
-            ltp_response = self.kite.ltp(z_symbol)
-            
-            if z_symbol in ltp_response:
-                lp = ltp_response[z_symbol]['last_price']
-                return {
-                    "s": "ok",
-                    "d": [{
-                        "v": {
-                            "lp": lp,
-                            "volume": 0, # LTP doesn't give volume
-                            "open_price": 0,
-                            "high_price": 0,
-                            "low_price": 0,
-                            "prev_close_price": 0
-                        }
-                    }]
-                }
-            
-            # Fallback to full quote if LTP fails or returns empty
-            quote = self.kite.quote(z_symbol)
-            if z_symbol in quote:
-                lp = quote[z_symbol]['last_price']
-                return {
-                    "s": "ok",
-                    "d": [{
-                        "v": {
-                            "lp": lp,
-                            "volume": quote[z_symbol]['volume'],
-                            "open_price": quote[z_symbol]['ohlc']['open'],
-                            "high_price": quote[z_symbol]['ohlc']['high'],
-                            "low_price": quote[z_symbol]['ohlc']['low'],
-                            "prev_close_price": quote[z_symbol]['ohlc']['close']
-                        }
-                    }]
-                }
-            return {}
-        except Exception as e:
-            logging.error(f"Error getting Zerodha quote: {e}")
+    # --- Response normalization (shared with AsyncZerodhaConnector) ---
+    @staticmethod
+    def _normalize_holdings(holdings: List[Dict]) -> List[Holding]:
+        normalized_holdings = [Holding.from_kite(h) for h in holdings]
+        for h in normalized_holdings:
+            quote_cache.put(h.symbol, h.ltp, "zerodha_holdings")
+        return normalized_holdings
+
+    @staticmethod
+    def _normalize_funds(margins: Dict) -> List[Dict[str, Any]]:
+        # Zerodha returns {'equity': {...}, 'commodity': {...}}
+        equity_margins = margins.get('equity', {})
+        # Strategy expects list of dicts with 'equityAmount' (Fyers fund_limit shape)
+        return [{
+            "equityAmount": equity_margins.get('net', 0.0),
+            "availableBalance": equity_margins.get('available', {}).get('cash', 0.0)
+        }]
+
+    def get_quote(self, symbol: str) -> Optional[Quote]:
+        """Get quote for one symbol (see get_quotes)."""
+        return self.get_quotes([symbol]).get(symbol)
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, Quote]:
+        """
+        LTP for many symbols in chunked kite.ltp calls (one round trip for the
+        NIFTY 50), with a single yfinance batch for anything Kite didn't price.
+        Returns {symbol: Quote}; unpriced symbols are omitted.
+        """
+        if not self.kite or not symbols:
             return {}
 
+        keys = {self._kite_symbol(symbol): symbol for symbol in symbols}
+        results = {}
+        key_list = list(keys)
+        for i in range(0, len(key_list), KITE_LTP_BATCH_SIZE):
+            chunk = key_list[i:i + KITE_LTP_BATCH_SIZE]
+            try:
+                ltp_response = self._call("quotes", self.kite.ltp, chunk)
+            except CircuitOpenError as e:
+                logging.warning(f"⚡ Skipping Zerodha LTP: {e}")
+                break
+            except Exception as e:
+                logging.error(f"Error getting Zerodha LTP for {len(chunk)} symbols: {e}")
+                continue
+            for z_symbol in chunk:
+                lp = (ltp_response.get(z_symbol) or {}).get('last_price')
+                if lp and lp > 0:
+                    quote_cache.put(z_symbol, lp, "zerodha")
+                    results[keys[z_symbol]] = Quote(keys[z_symbol], lp, source="zerodha")
+
+        # Bulk fallback for the restricted-API case (or instruments Kite didn't return)
+        missing = [symbol for symbol in symbols if symbol not in results]
+        if missing and yf:
+            try:
+                prices = YFinanceDataSource().get_latest_prices(missing)
+            except Exception as e:
+                logging.error(f"Error fetching yfinance fallback prices: {e}")
+                prices = {}
+            for symbol, lp in prices.items():
+                if lp > 0:
+                    results[symbol] = Quote(symbol, lp, source="yfinance")
+
+        return results
+
     def get_funds(self) -> List[Dict[str, Any]]:
         """Get funds."""
         if not self.kite:
@@ -363,7 +356,7 @@ class ZerodhaConnector(BrokerConnector):
         if not self.kite:
             return {"s": "error", "message": "Kite not initialized"}
         try:
-            self.kite.cancel_order(variety=self.kite.VARIETY_REGULAR, order_id=order_id)
+            self._call("orders", self.kite.cancel_order, variety=self.kite.VARIETY_REGULAR, order_id=order_id)
             return {"s": "ok", "message": "Order cancelled successfully"}
         except Exception as e:
             logging.error(f"Error cancelling Zerodha order: {e}")
@@ -379,7 +372,7 @@ class ZerodhaConnector(BrokerConnector):
                 params["price"] = new_price
             if new_qty > 0:
                 params["quantity"] = new_qty
-            self.kite.modify_order(**params)
+            self._call("orders", self.kite.modify_order, **params)
             return {"s": "ok", "message": "Order modified successfully"}
         except Exception as e:
             logging.error(f"Error modifying Zerodha order: {e}")
@@ -390,11 +383,12 @@ class ZerodhaConnector(BrokerConnector):
         if not self.kite:
             return {}
         try:
-            depth = self.kite.quote(symbol)
-            if symbol in depth:
+            z_symbol = self._kite_symbol(symbol)
+            depth = self._call("depth", self.kite.quote, z_symbol)
+            if z_symbol in depth:
                 return {
                     "s": "ok",
-                    "depth": depth[symbol].get('depth', {})
+                    "depth": depth[z_symbol].get('depth', {})
                 }
             return {}
         except Exception as e:
@@ -406,7 +400,7 @@ class ZerodhaConnector(BrokerConnector):
         if not self.kite:
             return []
         try:
-            positions = self.kite.positions()
+            positions = self._call("positions", self.kite.positions)
             net_positions = positions.get('net', [])
             normalized_positions = []
             for p in net_positions:
@@ -419,6 +413,8 @@ class ZerodhaConnector(BrokerConnector):
                         "pl": p['pnl']
                     })
             return normalized_positions
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logging.error(f"Error getting Zerodha positions: {e}")
             return []
@@ -428,7 +424,7 @@ class ZerodhaConnector(BrokerConnector):
         if not self.kite:
             return {}
         try:
-            profile = self.kite.profile()
+            profile = self._call("profile", self.kite.profile)
             return {
                 "s": "ok",
                 "data": profile
@@ -437,24 +433,14 @@ class ZerodhaConnector(BrokerConnector):
             logging.error(f"Error getting Zerodha profile: {e}")
             return {}
 
-    def get_trades(self) -> List[Dict[str, Any]]:
+    def get_trades(self) -> List[Fill]:
         """Fetch trade history for the day."""
         if not self.kite:
             return []
         try:
-            trades = self.kite.trades()
-            normalized_trades = []
-            for t in trades:
-                normalized_trades.append({
-                    "trade_id": t['trade_id'],
-                    "order_id": t['order_id'],
-                    "symbol": f"NSE:{t['tradingsymbol']}",
-                    "qty": t['quantity'],
-                    "price": t['average_price'],
-                    "side": "BUY" if t['transaction_type'] == 'BUY' else "SELL",
-                    "trade_time": t['fill_timestamp']
-                })
-            return normalized_trades
+            return [Fill.from_kite(t) for t in self._call("orderbook", self.kite.trades)]
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logging.error(f"Error getting Zerodha trades: {e}")
             return []
@@ -464,16 +450,9 @@ class ZerodhaConnector(BrokerConnector):
         if not self.kite:
             return []
         try:
-            margins = self.kite.margins()
-            # Zerodha returns {'equity': {...}, 'commodity': {...}}
-            equity_margins = margins.get('equity', {})
-            
-            # Normalize to match Fyers format (list of dicts) or just return what strategy expects
-            # Strategy expects list of dicts with 'equityAmount'
-            return [{
-                "equityAmount": equity_margins.get('net', 0.0),
-                "availableBalance": equity_margins.get('available', {}).get('cash', 0.0)
-            }]
+            return self._normalize_funds(self._call("funds", self.kite.margins))
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logging.error(f"Error getting Zerodha funds: {e}")
             return []
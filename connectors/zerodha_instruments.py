@@ -0,0 +1,148 @@
+"""
+Zerodha Instrument Master
+
+Kite publishes the full instrument list once a day. We download
+kite.instruments(exchange) at most once per IST day, keep it on disk as a
+compact JSON index keyed by tradingsymbol and serve instrument tokens and
+symbol normalization from memory, so history and quote calls no longer need
+a kite.quote() round trip just to find an instrument_token.
+
+If the download fails, the last file on disk (a previous day's list) is
+served instead and the download is retried after INSTRUMENT_RETRY_SECS.
+
+The index is process-wide: every ZerodhaConnector (one per account) shares
+the same in-memory copy.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pytz
+
+from config import INSTRUMENT_CACHE_DIR, INSTRUMENT_RETRY_SECS
+from utils.symbol_registry import symbol_registry
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Per-instrument fields kept in the index, in row order
+INSTRUMENT_FIELDS = ['instrument_token', 'exchange_token', 'name', 'instrument_type', 'segment', 'tick_size', 'lot_size']
+
+
+def to_tradingsymbol(symbol: str) -> str:
+    """NSE:INFY-EQ / NSE:INFY / INFY.NS / INFY -> INFY"""
+    return symbol_registry.tradingsymbol(symbol)
+
+
+class InstrumentMaster:
+    """Daily instrument index for one exchange."""
+
+    def __init__(self, exchange: str = "NSE", cache_dir: Optional[str] = None):
+        self.exchange = exchange
+        self.path = os.path.join(cache_dir or INSTRUMENT_CACHE_DIR, f"zerodha_{exchange.lower()}.json")
+        self._rows: Dict[str, list] = {}
+        self._by_token: Dict[int, str] = {}
+        self._date = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def _today(self) -> str:
+        return datetime.now(IST).strftime('%Y-%m-%d')
+
+    def _index(self, rows: Dict[str, list], day: str):
+        self._rows = rows
+        self._by_token = {row[0]: symbol for symbol, row in rows.items()}
+        self._date = day
+        # Seed the registry with every listed equity
+        symbol_registry.register_many(f"{self.exchange}:{symbol}" for symbol, row in rows.items() if row[3] == 'EQ')
+
+    def _load_file(self, stale_ok: bool = False) -> bool:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('fields') != INSTRUMENT_FIELDS or not (stale_ok or data.get('date') == self._today()):
+            return False
+        self._index(data.get('rows', {}), data['date'])
+        return True
+
+    def _download(self, kite):
+        instruments = kite.instruments(self.exchange)
+        rows = {
+            inst['tradingsymbol']: [inst.get(field) for field in INSTRUMENT_FIELDS]
+            for inst in instruments
+        }
+        day = self._today()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({"exchange": self.exchange, "date": day, "fields": INSTRUMENT_FIELDS, "rows": rows}, f, separators=(',', ':'))
+        os.replace(tmp, self.path)
+        self._index(rows, day)
+        logging.info(f"📇 Zerodha instrument master refreshed: {len(rows)} {self.exchange} instruments")
+
+    def _fall_back(self) -> bool:
+        """Keep serving the index we have, else the last file on disk whatever its date."""
+        if not self._rows and self._load_file(stale_ok=True):
+            logging.warning(f"📇 Serving Zerodha instrument master from {self._date}")
+        return bool(self._rows)
+
+    def ensure_loaded(self, kite) -> bool:
+        """Today's index in memory: from memory, else disk, else one kite.instruments() download."""
+        if self._date == self._today():
+            return True
+        if time.monotonic() < self._retry_at:
+            return bool(self._rows)
+        with self._lock:
+            if self._date == self._today():
+                return True
+            if self._load_file():
+                return True
+            if kite is None:
+                return self._fall_back()
+            try:
+                self._download(kite)
+                return True
+            except Exception as e:
+                self._retry_at = time.monotonic() + INSTRUMENT_RETRY_SECS
+                logging.error(f"Error downloading Zerodha instruments (retrying in {INSTRUMENT_RETRY_SECS}s): {e}")
+                return self._fall_back()
+
+    # --- Lookups ---
+    def get(self, symbol: str) -> Optional[Dict]:
+        row = self._rows.get(to_tradingsymbol(symbol))
+        return dict(zip(INSTRUMENT_FIELDS, row)) if row else None
+
+    def get_token(self, symbol: str) -> Optional[int]:
+        row = self._rows.get(to_tradingsymbol(symbol))
+        return row[0] if row else None
+
+    def symbol_for_token(self, token: int) -> Optional[str]:
+        return self._by_token.get(token)
+
+    def kite_symbol(self, symbol: str) -> str:
+        """Exchange-qualified Kite key, e.g. NSE:INFY-EQ -> NSE:INFY."""
+        return symbol_registry.to_zerodha(symbol)
+
+    def known(self, symbols: List[str]) -> List[str]:
+        """Subset of symbols listed on this exchange (all of them if the index is unavailable)."""
+        if not self._rows:
+            return list(symbols)
+        return [s for s in symbols if to_tradingsymbol(s) in self._rows]
+
+
+_masters: Dict[str, InstrumentMaster] = {}
+_masters_lock = threading.Lock()
+
+
+def get_instrument_master(exchange: str = "NSE") -> InstrumentMaster:
+    """Process-wide InstrumentMaster for an exchange."""
+    with _masters_lock:
+        if exchange not in _masters:
+            _masters[exchange] = InstrumentMaster(exchange)
+        return _masters[exchange]
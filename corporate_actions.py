@@ -0,0 +1,98 @@
+"""
+Corporate Actions
+
+Splits and bonuses make stored prices discontinuous. Actions live in
+corporate_actions_{env} and are applied to the warehouse once, per symbol:
+
+    {
+        "symbol": "NSE:BAJFINANCE-EQ",
+        "before_ts": 1718582400,     # candles strictly before this epoch are adjusted
+        "factor": 0.5,               # price multiplier (volume is divided by it)
+        "source": "provider" | "manual",
+        "status": "pending" | "applied",
+        "version": 3                 # symbol's adjustment version after applying
+    }
+
+Two ways in:
+- detected during sync: the provider re-adjusted its history, so the
+  re-fetched overlap candle disagrees with the stored one by a consistent
+  factor across open/high/low/close;
+- added by hand (--corporate-action SYMBOL EX_DATE FACTOR) for providers that
+  serve raw prices.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pytz
+
+from config import MONGO_ENV, CORPORATE_ACTION_MIN_JUMP, CORPORATE_ACTION_TOLERANCE
+
+UTC = pytz.utc
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def detect_adjustment(stored_rows: Dict[int, tuple], candles: List[list]) -> Optional[float]:
+    """
+    Price factor the provider applied to already stored candles, or None.
+    stored_rows: {epoch: (open, high, low, close, volume)}; candles: (epoch, o, h, l, c, v) rows.
+    Every overlapping candle must agree on one factor, so a single bad tick
+    does not rewrite history.
+    """
+    factors = []
+    for candle in candles:
+        existing = stored_rows.get(int(candle[0]))
+        if existing is None:
+            continue
+        ratios = []
+        for old, new in zip(existing[:4], candle[1:5]):
+            if not old or not new:
+                return None
+            ratios.append(float(new) / float(old))
+        if max(ratios) - min(ratios) > CORPORATE_ACTION_TOLERANCE * max(ratios):
+            return None
+        factors.append(sum(ratios) / len(ratios))
+
+    if not factors:
+        return None
+    factor = factors[0]
+    if abs(factor - 1) < CORPORATE_ACTION_MIN_JUMP:
+        return None
+    if any(abs(f - factor) > CORPORATE_ACTION_TOLERANCE * factor for f in factors):
+        return None
+    return factor
+
+
+class CorporateActions:
+    """Pending / applied adjustment factors per symbol."""
+
+    def __init__(self, db, env: str = MONGO_ENV):
+        self.collection = db[f'corporate_actions_{env}']
+
+    def add(self, symbol: str, before_ts: int, factor: float, source: str = "manual", note: str = ""):
+        """Queue an action; re-adding the same symbol/boundary/factor is a no-op."""
+        self.collection.update_one(
+            {"symbol": symbol, "before_ts": int(before_ts), "factor": float(factor)},
+            {"$setOnInsert": {
+                "source": source,
+                "note": note,
+                "status": "pending",
+                "ex_date": datetime.fromtimestamp(before_ts, IST).strftime('%Y-%m-%d'),
+                "created_at": datetime.now(UTC)
+            }},
+            upsert=True
+        )
+        logging.info(f"🏷️ Corporate action queued for {symbol}: x{factor:g} before {datetime.fromtimestamp(before_ts, IST).date()} ({source})")
+
+    def pending(self, symbols: Optional[Iterable[str]] = None) -> List[Dict]:
+        query = {"status": "pending"}
+        if symbols is not None:
+            query["symbol"] = {"$in": list(symbols)}
+        return list(self.collection.find(query).sort("before_ts", 1))
+
+    def mark_applied(self, action_id, version: int, adjusted: int):
+        self.collection.update_one(
+            {"_id": action_id},
+            {"$set": {"status": "applied", "version": version, "adjusted": adjusted, "applied_at": datetime.now(UTC)}}
+        )
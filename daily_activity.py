@@ -0,0 +1,252 @@
+"""
+Daily Activity
+
+Per-day rollup of what each account wrote, in daily_activity_{env}, one
+document per (username, broker_id, IST date):
+
+    {"username": "...", "broker_id": "...", "date": "2024-06-12", "logs": 412, "trades": 3, "updated_at": ...}
+
+Log and trade writers bump the counters as they insert (SimpleNiftyTrader.save_trade,
+the dashboard's manual-trade edits; MongoLogHandler buffers its log counts and
+flushes them every LOG_ACTIVITY_FLUSH_SECS and on close), so the
+dashboard can page through active days with an indexed query on this
+collection instead of distinct() over every log timestamp. Days whose
+counters all drop back to zero are not listed.
+
+A dashboard page then costs a constant number of queries however many days
+it shows: the page of days with their counts, one range query for the
+trades of the whole window (split into IST days as they are read), and logs
+only when a day is expanded:
+
+    activity.record_log(username, broker_id, timestamp)
+    activity.record_days(username, broker_id, {"2024-06-12": {"logs": 40}})
+    days, total_days = activity.page(username, broker_id=None, skip=0, limit=10)
+    trades = activity.trades_by_day(username, None, [d['date'] for d in days])
+    logs, has_more = activity.logs_for_day(username, None, days[0]['date'])
+
+Existing data (or a rollup that drifted) is rebuilt from logs / trades with
+migration/backfill_daily_activity.py.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+from pymongo import UpdateOne
+
+from config import MONGO_ENV, APP_LOGS_PER_DAY_PAGE
+
+UTC = pytz.utc
+IST = pytz.timezone('Asia/Kolkata')
+
+_COUNTERS = ("logs", "trades")
+
+# Fields the dashboard displays (everything else stays in the database)
+TRADE_FIELDS = ("action", "symbol", "broker_id", "quantity", "price", "filled", "profit", "profit_pct", "date")
+LOG_FIELDS = ("timestamp", "level", "message", "broker_id")
+
+# A trade's day is that of its `date`, or of `created_at` for trades stored without one
+_TRADE_DAY_FIELDS = ("date", "created_at")
+
+
+def trade_date(trade: Dict) -> Optional[datetime]:
+    """The timestamp a trade is counted (and listed) under."""
+    return next((trade[f] for f in _TRADE_DAY_FIELDS if trade.get(f) is not None), None)
+
+
+def _coalesce(fields: Tuple[str, ...]):
+    """Aggregation expression for the first of `fields` that is set."""
+    expr = f"${fields[-1]}"
+    for f in reversed(fields[:-1]):
+        expr = {"$ifNull": [f"${f}", expr]}
+    return expr
+
+
+def ist_day(ts: datetime) -> str:
+    """IST calendar day of a stored (UTC) timestamp."""
+    if ts.tzinfo is None:
+        ts = UTC.localize(ts)
+    return ts.astimezone(IST).strftime('%Y-%m-%d')
+
+
+def _day_range_utc(first: date, last: date) -> Tuple[datetime, datetime]:
+    """[start of `first`, start of the day after `last`) in IST, as UTC."""
+    start = IST.localize(datetime(first.year, first.month, first.day))
+    end = IST.localize(datetime(last.year, last.month, last.day)) + timedelta(days=1)
+    return start.astimezone(UTC), end.astimezone(UTC)
+
+
+class DailyActivityStore:
+    """Log / trade counters per (username, broker_id, IST day)."""
+
+    def __init__(self, db, env: str = MONGO_ENV):
+        self.db = db
+        self.env = env
+        self.collection = db[f'daily_activity_{env}']
+        try:
+            self.collection.create_index([("username", 1), ("broker_id", 1), ("date", -1)], unique=True)
+            self.collection.create_index([("username", 1), ("date", -1)])
+            # Range reads of one account's logs / trades
+            self.db[f'logs_{env}'].create_index([("username", 1), ("timestamp", -1)])
+            self.db[f'trades_{env}'].create_index([("username", 1), ("date", -1)])
+            self.db[f'trades_{env}'].create_index([("username", 1), ("created_at", -1)])
+        except Exception as e:
+            logging.warning(f"Could not create daily activity indexes: {e}")
+
+    # --- Writes ---
+    def record(self, username: Optional[str], broker_id: Optional[str], ts: Optional[datetime], **counts: int):
+        """Add counts (logs=1, trades=-1, ...) to the day of `ts`. Unowned records aren't shown anywhere; skipped."""
+        if not username or ts is None:
+            return
+        self.collection.update_one(
+            {"username": username, "broker_id": broker_id, "date": ist_day(ts)},
+            {"$inc": counts, "$set": {"updated_at": datetime.now(UTC)}},
+            upsert=True
+        )
+
+    def record_log(self, username: Optional[str], broker_id: Optional[str], ts: datetime):
+        self.record(username, broker_id, ts, logs=1)
+
+    def record_days(self, username: Optional[str], broker_id: Optional[str], by_day: Dict[str, Dict[str, int]]):
+        """Add buffered counts for several days in one bulk write: {"2024-06-12": {"logs": 40}, ...}."""
+        if not username or not by_day:
+            return
+        now = datetime.now(UTC)
+        self.collection.bulk_write([
+            UpdateOne({"username": username, "broker_id": broker_id, "date": day},
+                      {"$inc": counts, "$set": {"updated_at": now}}, upsert=True)
+            for day, counts in by_day.items()
+        ], ordered=False)
+
+    def record_trade(self, trade: Dict, count: int = 1):
+        """A trade document was inserted (count=-1: deleted)."""
+        self.record(trade.get('username'), trade.get('broker_id'), trade_date(trade), trades=count)
+
+    def move_trade(self, trade: Dict, new_date: datetime):
+        """A trade's date was edited: count it on its new day."""
+        old_date = trade_date(trade)
+        if old_date is not None and ist_day(old_date) == ist_day(new_date):
+            return
+        self.record_trade(trade, -1)
+        self.record_trade({**trade, 'date': new_date})
+
+    # --- Reads ---
+    def page(self, username: str, broker_id: Optional[str] = None, skip: int = 0, limit: int = 10) -> Tuple[List[Dict], int]:
+        """
+        One page of active days, newest first, as {"date", "logs", "trades"} (counts
+        summed over the user's brokers), and the total number of active days.
+        """
+        match = {"username": username, "$or": [{c: {"$gt": 0}} for c in _COUNTERS]}
+        if broker_id:
+            match["broker_id"] = broker_id
+        result = next(self.collection.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$date", **{c: {"$sum": f"${c}"} for c in _COUNTERS}}},
+            {"$sort": {"_id": -1}},
+            {"$facet": {
+                "total": [{"$count": "days"}],
+                "days": [{"$skip": skip}, {"$limit": limit}]
+            }}
+        ]), {})
+        total = result.get("total") or [{"days": 0}]
+        days = [{"date": datetime.strptime(d["_id"], '%Y-%m-%d').date(), **{c: d.get(c, 0) for c in _COUNTERS}}
+                for d in result.get("days", [])]
+        return days, total[0]["days"]
+
+    def trades_by_day(self, username: str, broker_id: Optional[str], days: List[date]) -> Dict[str, List[Dict]]:
+        """
+        {"YYYY-MM-DD": [trade, ...]} for the given days, newest trade first, from one
+        range query over the whole window. Trades carry TRADE_FIELDS only, dates in IST.
+        Days are those of trade_date(), the same ones the counters use.
+        """
+        if not days:
+            return {}
+        start, end = _day_range_utc(min(days), max(days))
+        in_range = {"$gte": start, "$lt": end}
+        query = {"username": username, "$or": [{"date": in_range}, {"date": None, "created_at": in_range}]}
+        if broker_id:
+            query["broker_id"] = broker_id
+        fields = {"_id": 0, **{f: 1 for f in TRADE_FIELDS + _TRADE_DAY_FIELDS}}
+        wanted = {d.strftime('%Y-%m-%d') for d in days}
+        by_day = {}
+        for trade in self.db[f'trades_{self.env}'].find(query, fields):
+            trade["date"] = self._as_ist(trade_date(trade))
+            trade.pop("created_at", None)
+            day = trade["date"].strftime('%Y-%m-%d')
+            if day in wanted:
+                by_day.setdefault(day, []).append(trade)
+        for trades in by_day.values():
+            trades.sort(key=lambda t: t["date"], reverse=True)
+        return by_day
+
+    def logs_for_day(self, username: str, broker_id: Optional[str], day: date,
+                     skip: int = 0, limit: int = APP_LOGS_PER_DAY_PAGE) -> Tuple[List[Dict], bool]:
+        """One IST day's logs (LOG_FIELDS, newest first, timestamps in IST) and whether more follow."""
+        start, end = _day_range_utc(day, day)
+        query = {"username": username, "timestamp": {"$gte": start, "$lt": end}}
+        if broker_id:
+            query["broker_id"] = broker_id
+        logs = list(self.db[f'logs_{self.env}'].find(query, {"_id": 0, **{f: 1 for f in LOG_FIELDS}})
+                    .sort("timestamp", -1).skip(skip).limit(limit + 1))
+        for log in logs:
+            log["timestamp"] = self._as_ist(log["timestamp"])
+        return logs[:limit], len(logs) > limit
+
+    @staticmethod
+    def _as_ist(ts: datetime) -> datetime:
+        if ts.tzinfo is None:
+            ts = UTC.localize(ts)
+        return ts.astimezone(IST)
+
+    # --- Backfill ---
+    def _count_by_day(self, collection, ts_fields: Tuple[str, ...], username: Optional[str]) -> Dict[tuple, int]:
+        """Records per (username, broker_id, IST day), dated by the first of `ts_fields` that is set."""
+        match = {"username": {"$ne": None}, "$or": [{f: {"$ne": None}} for f in ts_fields]}
+        if username:
+            match["username"] = username
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "username": "$username",
+                    "broker_id": "$broker_id",
+                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": _coalesce(ts_fields), "timezone": "Asia/Kolkata"}}
+                },
+                "count": {"$sum": 1}
+            }}
+        ]
+        return {(d["_id"]["username"], d["_id"].get("broker_id"), d["_id"]["date"]): d["count"]
+                for d in collection.aggregate(pipeline, allowDiskUse=True)}
+
+    def backfill(self, username: Optional[str] = None, batch_size: int = 1000) -> int:
+        """
+        Recount every day from logs_{env} / trades_{env} (one user, or all) and
+        overwrite the counters. Returns the number of account-days written.
+        """
+        logs = self._count_by_day(self.db[f'logs_{self.env}'], ("timestamp",), username)
+        trades = self._count_by_day(self.db[f'trades_{self.env}'], _TRADE_DAY_FIELDS, username)
+        now = datetime.now(UTC)
+
+        # Days no longer backed by any record drop to zero
+        scope = {"username": username} if username else {}
+        self.collection.update_many(scope, {"$set": {c: 0 for c in _COUNTERS}})
+
+        ops, written = [], 0
+        for key in set(logs) | set(trades):
+            user, broker_id, day = key
+            ops.append(UpdateOne(
+                {"username": user, "broker_id": broker_id, "date": day},
+                {"$set": {"logs": logs.get(key, 0), "trades": trades.get(key, 0), "updated_at": now}},
+                upsert=True
+            ))
+            if len(ops) >= batch_size:
+                self.collection.bulk_write(ops, ordered=False)
+                written += len(ops)
+                ops = []
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+            written += len(ops)
+        self.collection.delete_many({**scope, **{c: 0 for c in _COUNTERS}})
+        logging.info(f"📅 Daily activity rebuilt: {written} account-days ({sum(logs.values())} logs, {sum(trades.values())} trades)")
+        return written
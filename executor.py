@@ -11,7 +11,7 @@ from config import MONGO_DB_NAME, MONGO_ENV
 import pytz
 
 # Import Connector
-from connectors.fyers import FyersConnector
+from connectors.registry import connector_registry
 
 # Define timezones
 UTC = pytz.utc
@@ -112,11 +112,8 @@ def main():
                     overall_status = "failed"
                     continue
                 
-                connector = FyersConnector(
-                    api_key=api_key,
-                    api_secret=api_secret,
-                    access_token=access_token,
-                    pin=pin
+                connector = connector_registry.get(
+                    'fyers', api_key, api_secret, access_token, pin=pin, broker_id=broker_id
                 )
                 
                 # Check validity and refresh if needed
@@ -14,7 +14,7 @@ load_dotenv()
 from config import MONGO_DB_NAME, MONGO_ENV
 from market_data_manager import MarketDataManager
 from live_stratergy import SimpleNiftyTrader, DatabaseHandler, MongoLogHandler
-from connectors.fyers import FyersConnector
+from connectors.registry import connector_registry
 from connectors.data_source import YFinanceDataSource
 
 # Setup Logging
@@ -93,12 +93,7 @@ def main():
             
             # Initialize Connector
             if user_doc.get('broker_type') == 'fyers':
-                broker = FyersConnector(
-                    api_key=user_doc.get('api_key'),
-                    api_secret=user_doc.get('api_secret'),
-                    access_token=user_doc.get('access_token'),
-                    pin=user_doc.get('pin')
-                )
+                broker = connector_registry.for_account(user_doc)
             else:
                 logging.warning(f"   ⚠️ Skipping {username}: Unsupported broker {user_doc.get('broker_type')}")
                 continue
@@ -139,6 +134,7 @@ def main():
             # CRITICAL: Remove handler
             if mongo_handler:
                 logging.getLogger().removeHandler(mongo_handler)
+                mongo_handler.close()
 
     logging.info("🏁 Global Execution Completed.")
 
@@ -0,0 +1,198 @@
+"""
+History Providers
+
+Failover chain used by MarketDataManager to fetch candles for the warehouse.
+Providers are tried in priority order (admin Fyers token, other Fyers tokens,
+Zerodha tokens, yfinance); the first one to answer wins and its name is
+recorded as the candle source. Candles come back as a CandleBatch (parallel
+arrays) rather than the providers' lists of lists.
+
+Optionally the chain hedges: once the primary has enough latency samples, a
+request still running past its HISTORY_HEDGE_PERCENTILE latency is duplicated
+on the next provider and whichever answers first is used.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from connectors.models import CandleBatch
+from utils.rate_limiter import TokenBucket
+
+# Consecutive failures after which a provider is skipped for the rest of the run
+MAX_CONSECUTIVE_FAILURES = 3
+
+YF_INTERVALS = {"D": "1d", "1D": "1d", "5": "5m", "15": "15m", "60": "60m"}
+
+
+class HistoryUnavailable(Exception):
+    """No provider in the chain could serve the request."""
+
+
+class HistoryProvider:
+    """One history source with its own rate limit, latency samples and health."""
+
+    def __init__(self, name: str, rate: float):
+        self.name = name
+        self.bucket = TokenBucket(rate)
+        self.latencies = deque(maxlen=200)
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.failures < MAX_CONSECUTIVE_FAILURES
+
+    def hedge_delay(self, percentile: float, min_samples: int) -> Optional[float]:
+        """Latency percentile in seconds, or None until enough samples exist."""
+        with self._lock:
+            if len(self.latencies) < min_samples:
+                return None
+            return float(np.percentile(self.latencies, percentile))
+
+    def fetch(self, symbol: str, resolution: str, start_date, end_date,
+              started_event: Optional[threading.Event] = None) -> CandleBatch:
+        """started_event is set once the request goes out (after the rate-limit wait)."""
+        try:
+            self.bucket.acquire()
+        finally:
+            if started_event is not None:
+                started_event.set()
+        started = time.monotonic()
+        try:
+            candles = CandleBatch.from_rows(
+                self._fetch(symbol, resolution, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+            )
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        with self._lock:
+            self.failures = 0
+            self.latencies.append(time.monotonic() - started)
+        return candles
+
+    def _fetch(self, symbol: str, resolution: str, from_date: str, to_date: str) -> list:
+        raise NotImplementedError
+
+
+class BrokerHistoryProvider(HistoryProvider):
+    """Fyers / Zerodha connector (both speak the Fyers history response format)."""
+
+    def __init__(self, name: str, connector, rate: float):
+        super().__init__(name, rate)
+        self.connector = connector
+
+    def _fetch(self, symbol, resolution, from_date, to_date):
+        data = self.connector.get_historical_data(
+            symbol=symbol, resolution=resolution, from_date=from_date, to_date=to_date
+        )
+        if data and data.get('s') in ('ok', 'no_data'):
+            return data.get('candles', [])
+        raise RuntimeError(f"{self.name} returned error/empty: {data}")
+
+
+class YFinanceHistoryProvider(HistoryProvider):
+    """
+    Last resort: Yahoo Finance with auto_adjust=False, i.e. not dividend-adjusted.
+    Yahoo still applies split adjustment, so around a split its older candles
+    differ from the broker's until corporate actions are applied.
+    """
+
+    def __init__(self, data_source, rate: float):
+        super().__init__("yfinance", rate)
+        self.data_source = data_source
+
+    def _fetch(self, symbol, resolution, from_date, to_date):
+        interval = YF_INTERVALS.get(resolution)
+        if not interval:
+            raise RuntimeError(f"yfinance has no {resolution} interval")
+        data = self.data_source.get_historical_data(
+            symbol, interval=interval, start=from_date, end=to_date, auto_adjust=False
+        )
+        if data.get('s') == 'ok':
+            return data.get('candles', [])
+        if data.get('message') == "No data found":
+            return []
+        raise RuntimeError(f"yfinance error: {data.get('message')}")
+
+
+class HistoryProviderChain:
+    """Priority-ordered providers with failover and optional latency hedging."""
+
+    def __init__(self, providers: List[HistoryProvider], hedge_percentile: Optional[float] = None,
+                 hedge_min_samples: int = 20, max_workers: int = 8):
+        """max_workers: threads calling fetch() concurrently; the hedge pool has room for a primary and a hedge each."""
+        self.providers = providers
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedges = 0
+        self._pool = ThreadPoolExecutor(max_workers=2 * max_workers) if hedge_percentile else None
+
+    @property
+    def names(self) -> List[str]:
+        return [p.name for p in self.providers]
+
+    def fetch(self, symbol: str, resolution: str, start_date, end_date) -> Tuple[CandleBatch, str]:
+        """Returns (candles, provider name). Raises HistoryUnavailable when every provider fails."""
+        providers = [p for p in self.providers if p.available]
+        errors = []
+        i = 0
+        while i < len(providers):
+            primary = providers[i]
+            secondary = providers[i + 1] if i + 1 < len(providers) else None
+            delay = None
+            if self._pool and secondary:
+                delay = primary.hedge_delay(self.hedge_percentile, self.hedge_min_samples)
+
+            if delay is None:
+                try:
+                    return primary.fetch(symbol, resolution, start_date, end_date), primary.name
+                except Exception as e:
+                    errors.append(f"{primary.name}: {e}")
+                    logging.warning(f"   ⚠️ {primary.name} failed for {symbol}, trying next provider")
+                    i += 1
+                    continue
+
+            result, tried = self._hedged_fetch(primary, secondary, delay, symbol, resolution, start_date, end_date, errors)
+            if result is not None:
+                return result
+            i += tried
+
+        raise HistoryUnavailable(f"No provider could serve {symbol}: {'; '.join(errors)}")
+
+    def _hedged_fetch(self, primary, secondary, delay, symbol, resolution, start_date, end_date, errors):
+        """Run the primary; duplicate on the secondary if it outlives `delay`. Returns (result, providers tried)."""
+        started = threading.Event()
+        futures = {self._pool.submit(primary.fetch, symbol, resolution, start_date, end_date, started): primary}
+        # The hedge delay runs from the request itself, not from time spent queued for a thread or a token
+        started.wait()
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            logging.info(
+                f"   ⏱️ {primary.name} slower than p{self.hedge_percentile:g} ({delay:.2f}s) for {symbol}, "
+                f"hedging with {secondary.name}"
+            )
+            self.hedges += 1
+            futures[self._pool.submit(secondary.fetch, symbol, resolution, start_date, end_date)] = secondary
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = futures[future]
+                try:
+                    return (future.result(), provider.name), len(futures)
+                except Exception as e:
+                    errors.append(f"{provider.name}: {e}")
+        return None, len(futures)
+
+    def close(self):
+        if self._pool:
+            # A losing hedge may still be in flight; let it finish in the background
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,198 @@
+"""
+Holdings Snapshots
+
+Last known holdings of every broker account, in holdings_snapshots_{env}:
+
+    {
+        "broker_id": "...", "broker_type": "zerodha", "username": "...",
+        "holdings": [{"symbol": "NSE:INFY", "quantity": 3, "avg_price": 1480.0, "ltp": 1490.5, "pnl": 31.5}],
+        "fetched_at": ...,                    # TTL index: dropped HOLDINGS_SNAPSHOT_TTL after the last good fetch
+        "last_error": None, "error_at": None  # a failed refresh only sets these
+    }
+
+Pages read the stored snapshot and return immediately (stale-while-revalidate):
+snapshots older than HOLDINGS_SNAPSHOT_FRESH_SECS are refreshed on a
+background thread, so the next load sees the new data. Only accounts with
+no document yet are fetched before the page renders. Fetches fan out to
+all brokers concurrently, each bounded by HOLDINGS_FETCH_TIMEOUT; a broker
+that times out, errors or has an open circuit keeps its previous snapshot
+(an account whose fetches only ever failed keeps just the error).
+
+    snapshots = holdings_snapshots.get(brokers)    # {broker_id: HoldingsSnapshot}
+"""
+
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pytz
+from pymongo import UpdateOne
+
+from config import MONGO_ENV, HOLDINGS_FETCH_TIMEOUT, HOLDINGS_SNAPSHOT_FRESH_SECS, HOLDINGS_SNAPSHOT_TTL
+from connectors.async_base import gather_sync
+from connectors.circuit_breaker import broker_health, CircuitOpenError
+from connectors.models import Holding
+from connectors.registry import connector_registry
+
+UTC = pytz.utc
+
+_HOLDING_FIELDS = ("symbol", "quantity", "avg_price", "ltp", "pnl")
+
+
+@dataclass(slots=True)
+class HoldingsSnapshot:
+    broker_id: str
+    holdings: List[Holding] = field(default_factory=list)
+    fetched_at: Optional[datetime] = None
+    last_error: Optional[str] = None      # latest failed refresh (the holdings are older than it)
+    refreshing: bool = False              # a background refresh is under way
+
+    def age(self, now: Optional[datetime] = None) -> float:
+        if self.fetched_at is None:
+            return float("inf")
+        return ((now or datetime.now(UTC)) - self.fetched_at).total_seconds()
+
+
+class HoldingsSnapshotService:
+    """Stored holdings per broker account, refreshed concurrently and in the background."""
+
+    def __init__(self, db, env: str = MONGO_ENV, registry=connector_registry,
+                 fresh_secs: float = HOLDINGS_SNAPSHOT_FRESH_SECS, timeout: float = HOLDINGS_FETCH_TIMEOUT):
+        self.collection = db[f'holdings_snapshots_{env}']
+        self.registry = registry
+        self.fresh_secs = fresh_secs
+        self.timeout = timeout
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        try:
+            self.collection.create_index("broker_id", unique=True)
+            self.collection.create_index("fetched_at", expireAfterSeconds=HOLDINGS_SNAPSHOT_TTL)
+        except Exception as e:
+            logging.warning(f"Could not create holdings snapshot indexes: {e}")
+
+    # --- Reads ---
+    def get(self, brokers: List[Dict]) -> Dict[str, HoldingsSnapshot]:
+        """
+        Snapshot of each broker_accounts document, straight from the store. Stale
+        ones are refreshed in the background; missing ones are fetched now.
+        """
+        by_id = {b['broker_id']: b for b in brokers}
+        snapshots = {doc['broker_id']: self._from_doc(doc)
+                     for doc in self.collection.find({"broker_id": {"$in": list(by_id)}})}
+
+        missing = [b_id for b_id in by_id if b_id not in snapshots]
+        if missing:
+            errors = self.refresh([by_id[b_id] for b_id in missing])
+            for doc in self.collection.find({"broker_id": {"$in": missing}}):
+                snapshots[doc['broker_id']] = self._from_doc(doc)
+            for b_id in missing:
+                snapshots.setdefault(b_id, HoldingsSnapshot(b_id, last_error=errors.get(b_id)))
+
+        now = datetime.now(UTC)
+        stale = [by_id[b_id] for b_id, s in snapshots.items()
+                 if b_id in by_id and b_id not in missing and s.age(now) >= self.fresh_secs]
+        self.refresh_in_background(stale)
+        with self._lock:
+            for broker in stale:
+                snapshots[broker['broker_id']].refreshing = broker['broker_id'] in self._refreshing
+        return snapshots
+
+    @staticmethod
+    def _from_doc(doc: Dict) -> HoldingsSnapshot:
+        fetched_at = doc.get('fetched_at')
+        if fetched_at is not None and fetched_at.tzinfo is None:
+            fetched_at = UTC.localize(fetched_at)
+        return HoldingsSnapshot(
+            broker_id=doc['broker_id'],
+            holdings=[Holding(*(h.get(f) for f in _HOLDING_FIELDS)) for h in doc.get('holdings', [])],
+            fetched_at=fetched_at,
+            last_error=doc.get('last_error')
+        )
+
+    # --- Refresh ---
+    def refresh_in_background(self, brokers: List[Dict]) -> List[str]:
+        """Start one refresh thread for the brokers not already being refreshed; returns their ids."""
+        with self._lock:
+            brokers = [b for b in brokers if b['broker_id'] not in self._refreshing]
+            ids = [b['broker_id'] for b in brokers]
+            self._refreshing.update(ids)
+        if brokers:
+            threading.Thread(target=self._refresh_and_release, args=(brokers, ids),
+                             name="holdings-refresh", daemon=True).start()
+        return ids
+
+    def _refresh_and_release(self, brokers: List[Dict], ids: List[str]):
+        try:
+            self.refresh(brokers)
+        except Exception as e:
+            logging.error(f"Background holdings refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(ids)
+
+    def refresh(self, brokers: List[Dict]) -> Dict[str, Optional[str]]:
+        """Fetch all brokers concurrently and store the results; returns {broker_id: error or None}."""
+        if not brokers:
+            return {}
+        results = gather_sync([self._fetch(b) for b in brokers], timeout=self.timeout * 2 + 5)
+        now = datetime.now(UTC)
+        ops, errors = [], {}
+        for broker, result in zip(brokers, results):
+            b_id = broker['broker_id']
+            if isinstance(result, BaseException):
+                errors[b_id] = self._describe(result)
+                logging.warning(f"⚠️ Holdings refresh failed for {broker.get('display_name', b_id)}: {errors[b_id]}")
+                # Keep the previous holdings; the TTL still runs from their fetched_at
+                ops.append(UpdateOne({"broker_id": b_id}, {"$set": {
+                    "broker_type": broker.get('broker_type'),
+                    "username": broker.get('username'),
+                    "last_error": errors[b_id],
+                    "error_at": now
+                }}, upsert=True))
+                continue
+            errors[b_id] = None
+            ops.append(UpdateOne({"broker_id": b_id}, {"$set": {
+                "broker_type": broker.get('broker_type'),
+                "username": broker.get('username'),
+                "holdings": [{f: getattr(h, f) for f in _HOLDING_FIELDS} for h in result],
+                "fetched_at": now,
+                "last_error": None,
+                "error_at": None
+            }}, upsert=True))
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+        return errors
+
+    async def _fetch(self, broker: Dict) -> List[Holding]:
+        b_type = broker.get('broker_type')
+        if not broker_health.available(b_type, 'holdings'):
+            raise CircuitOpenError(b_type, 'holdings', broker_health.breaker(b_type, 'holdings').retry_in())
+        try:
+            connector = self.registry.for_account(broker, asynchronous=True)
+            return await asyncio.wait_for(connector.get_holdings(), self.timeout)
+        except (CircuitOpenError, asyncio.TimeoutError):
+            raise
+        except Exception as e:
+            # Fall back to the blocking connector (e.g. aiohttp unavailable)
+            logging.debug(f"Async holdings failed for {broker['broker_id']}: {e}")
+            connector = self.registry.for_account(broker)
+            return await asyncio.wait_for(asyncio.to_thread(connector.get_holdings), self.timeout)
+
+    def _describe(self, error: BaseException) -> str:
+        if isinstance(error, asyncio.TimeoutError):
+            return f"Timed out after {self.timeout:g}s"
+        if isinstance(error, CircuitOpenError):
+            return "Broker API degraded"
+        return str(error) or type(error).__name__
+
+    # --- Invalidation ---
+    def invalidate(self, broker_id: str):
+        """Holdings changed (orders placed): serve the snapshot once more, refreshing it."""
+        self.collection.update_one({"broker_id": broker_id},
+                                   {"$set": {"fetched_at": datetime.now(UTC) - timedelta(seconds=self.fresh_secs)}})
+
+    def delete(self, broker_id: str):
+        self.collection.delete_one({"broker_id": broker_id})
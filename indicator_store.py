@@ -0,0 +1,182 @@
+"""
+Indicator Store
+
+Precomputed moving averages in indicators_{env}, one small document per symbol:
+
+    {
+        "_id": "NSE:INFY-EQ",
+        "last_ts": 1718150400, "last_date": "2024-06-12", "last_close": 1490.5,
+        "closes": [...],                      # last max(period) daily closes, oldest first
+        "periods": {"30": {"count": 30, "sum": 44520.0, "mean": 1484.0, "deviation_pct": 0.44}},
+        "updated_at": ...
+    }
+
+MarketDataManager feeds it the daily closes written by each sync. A new
+session costs O(1) per period (add the new close, drop the one leaving the
+window); a re-fetched latest session adjusts the sum in place. Anything else
+(older corrections, a new ma_period in broker_accounts, a missing document)
+rebuilds that symbol from the candle store.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pytz
+from pymongo import UpdateOne
+
+from config import MONGO_ENV, MA_PERIOD
+
+UTC = pytz.utc
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def _period_stats(closes: List[float], period: int) -> Dict:
+    window = closes[-period:]
+    total = float(sum(window))
+    return _finish({"count": len(window), "sum": total}, period, closes[-1] if closes else None)
+
+
+def _finish(stats: Dict, period: int, last_close: Optional[float]) -> Dict:
+    """Fill mean / deviation once the window is full."""
+    if stats["count"] >= period and last_close is not None:
+        mean = stats["sum"] / period
+        stats["mean"] = mean
+        stats["deviation_pct"] = (last_close - mean) / mean * 100 if mean else None
+    else:
+        stats["mean"] = None
+        stats["deviation_pct"] = None
+    return stats
+
+
+class IndicatorStore:
+    """Running-sum moving averages for every ma_period configured across broker_accounts."""
+
+    def __init__(self, db, env: str = MONGO_ENV):
+        self.db = db
+        self.collection = db[f'indicators_{env}']
+
+    def get_periods(self) -> List[int]:
+        """Every ma_period in use (plus the default)."""
+        periods = {MA_PERIOD}
+        for value in self.db['broker_accounts'].distinct('ma_period'):
+            try:
+                if int(value) > 0:
+                    periods.add(int(value))
+            except (TypeError, ValueError):
+                continue
+        return sorted(periods)
+
+    # --- Writes ---
+    def apply(self, candle_store, updates: Dict[str, Dict[int, float]], periods: Optional[List[int]] = None):
+        """
+        Fold freshly written daily closes into the running sums.
+        updates: {symbol: {epoch_seconds: close}}
+        """
+        if not updates:
+            return
+        periods = periods or self.get_periods()
+        keep = max(periods)
+        docs = {doc['_id']: doc for doc in self.collection.find({"_id": {"$in": list(updates)}})}
+
+        ops = []
+        rebuild = []
+        for symbol, closes_by_ts in updates.items():
+            doc = docs.get(symbol)
+            if not doc or set(doc.get('periods', {})) != {str(p) for p in periods}:
+                rebuild.append(symbol)
+                continue
+
+            closes = list(doc.get('closes', []))
+            sums = {p: dict(doc['periods'][str(p)]) for p in periods}
+            last_ts = doc['last_ts']
+            incremental = True
+            for ts in sorted(closes_by_ts):
+                close = float(closes_by_ts[ts])
+                if ts == last_ts and closes:
+                    # Latest session re-fetched (e.g. intraday partial candle corrected)
+                    for p in periods:
+                        sums[p]["sum"] += close - closes[-1]
+                    closes[-1] = close
+                elif ts > last_ts:
+                    for p in periods:
+                        if len(closes) >= p:
+                            sums[p]["sum"] += close - closes[-p]
+                        else:
+                            sums[p]["sum"] += close
+                            sums[p]["count"] += 1
+                    closes.append(close)
+                    last_ts = ts
+                else:
+                    # A correction behind the latest session: sums can't be patched in place
+                    incremental = False
+                    break
+
+            if not incremental:
+                rebuild.append(symbol)
+                continue
+
+            closes = closes[-keep:]
+            ops.append(self._doc_update(
+                symbol, last_ts, closes,
+                {str(p): _finish(sums[p], p, closes[-1]) for p in periods}
+            ))
+
+        if rebuild:
+            ops.extend(self._rebuild_ops(candle_store, rebuild, periods))
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+        logging.info(f"📈 Indicators updated for {len(ops)} symbols ({len(rebuild)} rebuilt from candles)")
+
+    def rebuild(self, candle_store, symbols: Iterable[str], periods: Optional[List[int]] = None):
+        """Recompute symbols from stored candles (used when running sums can't be patched)."""
+        periods = periods or self.get_periods()
+        ops = self._rebuild_ops(candle_store, list(symbols), periods)
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+
+    def _rebuild_ops(self, candle_store, symbols: List[str], periods: List[int]) -> List[UpdateOne]:
+        frames = candle_store.get_last_sessions(symbols, max(periods))
+        ops = []
+        for symbol, df in frames.items():
+            if df.empty:
+                continue
+            closes = [float(c) for c in df['close']]
+            last_ts = int(df['date'].iloc[-1].timestamp())
+            ops.append(self._doc_update(
+                symbol, last_ts, closes,
+                {str(p): _period_stats(closes, p) for p in periods}
+            ))
+        return ops
+
+    def _doc_update(self, symbol: str, last_ts: int, closes: List[float], periods: Dict) -> UpdateOne:
+        return UpdateOne(
+            {"_id": symbol},
+            {"$set": {
+                "last_ts": int(last_ts),
+                "last_date": datetime.fromtimestamp(last_ts, IST).strftime('%Y-%m-%d'),
+                "last_close": closes[-1],
+                "closes": closes,
+                "periods": periods,
+                "updated_at": datetime.now(UTC)
+            }},
+            upsert=True
+        )
+
+    # --- Reads ---
+    def get_moving_averages(self, symbols: Iterable[str], period: int) -> Dict[str, Dict]:
+        """{symbol: {"mean", "deviation_pct", "last_close", "last_date"}} for symbols with a full window."""
+        key = f"periods.{int(period)}"
+        result = {}
+        projection = {key: 1, "last_close": 1, "last_date": 1}
+        for doc in self.collection.find({"_id": {"$in": list(symbols)}}, projection):
+            stats = doc.get('periods', {}).get(str(int(period))) or {}
+            if stats.get('mean') is None:
+                continue
+            result[doc['_id']] = {
+                "mean": stats['mean'],
+                "deviation_pct": stats.get('deviation_pct'),
+                "last_close": doc.get('last_close'),
+                "last_date": doc.get('last_date')
+            }
+        return result
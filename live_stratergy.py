@@ -20,12 +20,21 @@ from dotenv import load_dotenv
 # Load environment variables BEFORE importing config
 load_dotenv()
 
-from config import MONGO_DB_NAME, MONGO_ENV, MAX_TRADE_VALUE, MA_PERIOD
+from config import MONGO_DB_NAME, MONGO_ENV, MAX_TRADE_VALUE, MA_PERIOD, QUOTE_MAX_AGE_ORDER, QUOTE_REPLAY_SOURCE, LOG_ACTIVITY_FLUSH_SECS
 
 # Import Generic Connector
 from connectors.base import BrokerConnector
-from connectors.fyers import FyersConnector
+from connectors.registry import connector_registry
+from connectors.retry import RetryBudget, RetryPolicy, READ, ORDER, METHOD_POLICIES, call_with_retry, call_with_policy
 from connectors.data_source import DataSource, YFinanceDataSource
+from connectors.models import Order
+from connectors.quote_cache import quote_cache
+from connectors.quote_stream import replay_stream_from_config
+from candle_store import CandleStore
+from indicator_store import IndicatorStore
+from daily_activity import DailyActivityStore, ist_day
+from utils.trading_calendar import last_completed_session
+from candle_cache import CandleCache
 
 # --- Database Handler ---
 class DatabaseHandler:
@@ -33,6 +42,7 @@ class DatabaseHandler:
         self.client = MongoClient(uri)
         self.db = self.client[db_name]
         self.env = env
+        self.activity = DailyActivityStore(self.db, env)
 
     def get_trades_collection(self):
         return self.db[f'trades_{self.env}']
@@ -42,12 +52,19 @@ class DatabaseHandler:
 
 # --- Mongo Log Handler ---
 class MongoLogHandler(logging.Handler):
-    def __init__(self, db_handler: DatabaseHandler, run_id: str = None, broker_id: str = None, username: str = None):
+    """Writes each record to logs_{env}; the per-day log counts are buffered and flushed in one write."""
+
+    def __init__(self, db_handler: DatabaseHandler, run_id: str = None, broker_id: str = None, username: str = None,
+                 flush_secs: float = LOG_ACTIVITY_FLUSH_SECS):
         super().__init__()
         self.logs_collection = db_handler.get_logs_collection()
+        self.activity = db_handler.activity
         self.run_id = run_id
         self.broker_id = broker_id
         self.username = username
+        self.flush_secs = flush_secs
+        self._log_counts = {}  # IST day -> logs inserted since the last flush
+        self._last_flush = time.monotonic()
 
     def emit(self, record):
         try:
@@ -66,17 +83,37 @@ class MongoLogHandler(logging.Handler):
                 log_entry['username'] = self.username
             
             self.logs_collection.insert_one(log_entry)
+            day = ist_day(log_entry['timestamp'])
+            self._log_counts[day] = self._log_counts.get(day, 0) + 1
+            if time.monotonic() - self._last_flush >= self.flush_secs:
+                self._flush_counts()
         except Exception as e:
             print(f"❌ MongoLogHandler Error: {e}", file=sys.stderr)
 
-# --- Rate Limit Handler (No Change) ---
+    def _flush_counts(self):
+        counts, self._log_counts = self._log_counts, {}
+        self._last_flush = time.monotonic()
+        self.activity.record_days(self.username, self.broker_id, {day: {'logs': n} for day, n in counts.items()})
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._flush_counts()
+        except Exception as e:
+            print(f"❌ MongoLogHandler Error: {e}", file=sys.stderr)
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+# --- Rate Limit Handler ---
 class RateLimitHandler:
-    """Handle API rate limits"""
+    """Paces broker calls and retries them per operation policy, within one run's retry budget"""
     
-    def __init__(self, max_retries=3, base_delay=1.0, max_delay=60.0):
-        self.max_retries = max_retries
-        self.base_delay = base_delay
-        self.max_delay = max_delay
+    def __init__(self, budget: Optional[RetryBudget] = None):
+        self.budget = budget or RetryBudget()
         self.last_request_time = 0
         
     def wait_if_needed(self):
@@ -87,31 +124,41 @@ class RateLimitHandler:
             time.sleep(0.1 - time_since_last)
             
         self.last_request_time = time.time()
+
+    def _paced(self, func):
+        def call(*args, **kwargs):
+            self.wait_if_needed()
+            return func(*args, **kwargs)
+        return call
         
-    def retry_with_backoff(self, func, *args, **kwargs):
-        for attempt in range(self.max_retries):
-            try:
-                self.wait_if_needed()
-                result = func(*args, **kwargs)
-                
-                # Check for common error structures (this might need adaptation per broker)
-                if isinstance(result, dict) and result.get('s') == 'error':
-                    error_code = result.get('code', 0)
-                    if error_code in [429, 10006, 10007]:
-                        delay = min(self.base_delay * (2 ** attempt), self.max_delay)
-                        time.sleep(delay)
-                        continue
-                        
-                return result
-                
-            except Exception as e:
-                if attempt == self.max_retries - 1:
-                    raise
-                
-                delay = min(self.base_delay * (2 ** attempt), self.max_delay)
-                time.sleep(delay)
-                
-        return None
+    def retry_with_backoff(self, func, *args, policy: RetryPolicy = READ, **kwargs):
+        """Retry an arbitrary (read-like) broker callable; open circuits are raised at once."""
+        return call_with_retry(lambda: self._paced(func)(*args, **kwargs), policy, self.budget)
+
+    def call(self, broker: BrokerConnector, method: str, *args, **kwargs):
+        """Connector method under its declared policy (orders: tagged, never double-submitted)."""
+        if METHOD_POLICIES.get(method) is ORDER:
+            return call_with_policy(_PacedBroker(broker, self), method, *args, budget=self.budget, **kwargs)
+        return self.retry_with_backoff(getattr(broker, method), *args, policy=METHOD_POLICIES.get(method, READ), **kwargs)
+
+
+class _PacedBroker:
+    """Broker view whose order and order-book calls go through the rate limiter's pacing."""
+
+    def __init__(self, broker: BrokerConnector, limiter: RateLimitHandler):
+        self._broker = broker
+        self._limiter = limiter
+
+    def place_order(self, **order):
+        return self._limiter._paced(self._broker.place_order)(**order)
+
+    def place_orders(self, orders):
+        if not hasattr(self._broker, "place_orders"):
+            return [self.place_order(**leg) for leg in orders]
+        return self._limiter._paced(self._broker.place_orders)(orders)
+
+    def get_orders(self):
+        return self._limiter._paced(self._broker.get_orders)()
 
 class SimpleNiftyTrader:
     """Simplified NIFTY 50 mean reversion trader"""
@@ -127,6 +174,8 @@ class SimpleNiftyTrader:
 
         
         self.rate_limiter = RateLimitHandler()
+        self.candle_store = CandleStore(db_handler.db, db_handler.env, cache=CandleCache(env=db_handler.env))
+        self.indicator_store = IndicatorStore(db_handler.db, db_handler.env)
         
         # Strategy parameters from Settings
         self.ma_period = int(settings.get('ma_period', 20))
@@ -139,6 +188,7 @@ class SimpleNiftyTrader:
         
         self.max_trade_value = float(settings.get('trade_amount', 2000))
         self.max_open_positions = int(settings.get('max_positions', 10))
+        self.max_exits_per_run = max(1, int(settings.get('max_exits_per_run', 1)))
         
         # Trading mode (NORMAL, EXIT_ONLY, PAUSED)
         self.trading_mode = settings.get('trading_mode', 'NORMAL')
@@ -198,85 +248,84 @@ class SimpleNiftyTrader:
             if 'status' not in trade_data:
                 trade_data['status'] = 'OPEN' # Default status
             result = trades_collection.insert_one(trade_data)
+            self.db_handler.activity.record_trade(trade_data)
             return result.inserted_id
         except Exception as e:
             logging.error(f"Error saving trade to DB: {e}")
             return None
 
-    def get_order_status(self, order_id: str) -> Dict:
+    def get_order_status(self, order_id: str) -> Optional[Order]:
         """Get the status of a specific order."""
-        def _get_orders():
-            # The generic interface might need adjustment if get_orderbook doesn't filter by ID
-            # But FyersConnector.get_orderbook(symbol) returns all orders if symbol is None?
-            # Let's assume we fetch all orders and filter in memory for now, or use broker specific method if exposed
+        try:
             # Ideally, BrokerConnector should have get_order(order_id)
             # For now, we use get_orders() and filter.
-            all_orders = self.broker.get_orders()
-            for order in all_orders:
-                if order.get('id') == order_id:
+            for order in self.rate_limiter.call(self.broker, "get_orders"):
+                if order.order_id == str(order_id):
                     return order
-            return {}
-
-        try:
-            response = self.rate_limiter.retry_with_backoff(_get_orders)
-            return response
+            return None
         except Exception as e:
             logging.error(f"Error getting order status for {order_id}: {e}")
-        return {}
+        return None
 
     def verify_and_update_order(self, trade_doc_id, order_id: str) -> bool:
         """Verify if an order is filled and update the database."""
+        return trade_doc_id in self.verify_and_update_orders({trade_doc_id: order_id})
+
+    def verify_and_update_orders(self, pending: Dict) -> set:
+        """
+        Verify fills of several orders ({trade_doc_id: order_id}) with one order book
+        read per round, marking filled trades in the database. Returns the filled trade ids.
+        """
         trades_collection = self.db_handler.get_trades_collection()
+        pending = dict(pending)
+        filled = set()
         for i in range(3):  # Retry 3 times
             try:
-                order_details = self.get_order_status(order_id)
-                # Status 2 indicates a fully traded/filled order in Fyers API
-                # We need to standardize this status check in the Connector eventually
-                # For now, assuming FyersConnector returns raw Fyers response which uses 'status': 2
-                if order_details and order_details.get('status') == 2:
-                    trades_collection.update_one(
-                        {'_id': trade_doc_id},
-                        {'$set': {'filled': True}}
-                    )
-                    logging.info(f"✅ Order {order_id} confirmed as FILLED.")
-                    return True
-                else:
-                    status = order_details.get('status', 'UNKNOWN')
-                    logging.warning(f"Order {order_id} not filled yet. Status: {status}. Retrying... ({i+1}/3)")
-                    time.sleep(5)  # Wait 5 seconds before retrying
+                orders = {order.order_id: order for order in self.rate_limiter.call(self.broker, "get_orders")}
+                for trade_doc_id, order_id in list(pending.items()):
+                    order_details = orders.get(str(order_id))
+                    # Orders carry the Fyers status codes for every broker (2 = filled)
+                    if order_details and order_details.is_filled:
+                        trades_collection.update_one(
+                            {'_id': trade_doc_id},
+                            {'$set': {'filled': True}}
+                        )
+                        logging.info(f"✅ Order {order_id} confirmed as FILLED.")
+                        filled.add(trade_doc_id)
+                        del pending[trade_doc_id]
+                    else:
+                        status = order_details.raw_status if order_details else 'UNKNOWN'
+                        logging.warning(f"Order {order_id} not filled yet. Status: {status}. Retrying... ({i+1}/3)")
+                if not pending:
+                    return filled
+                time.sleep(5)  # Wait 5 seconds before retrying
 
             except Exception as e:
-                logging.error(f"Exception while verifying order {order_id}: {e}")
+                logging.error(f"Exception while verifying orders {list(pending.values())}: {e}")
                 time.sleep(5)
 
-        logging.error(f"❌ Order {order_id} could not be confirmed as filled after 3 attempts.")
-        trades_collection.update_one(
-            {'_id': trade_doc_id},
-            {'$set': {'comment': 'FAILED TO CONFIRM FILL'}}
-        )
-        return False
+        for trade_doc_id, order_id in pending.items():
+            logging.error(f"❌ Order {order_id} could not be confirmed as filled after 3 attempts.")
+            trades_collection.update_one(
+                {'_id': trade_doc_id},
+                {'$set': {'comment': 'FAILED TO CONFIRM FILL'}}
+            )
+        return filled
 
     def get_order_book(self) -> List:
         """Get order book from Broker."""
-        def _get_orders():
-            return self.broker.get_orders()
-
         try:
-            response = self.rate_limiter.retry_with_backoff(_get_orders)
-            return response
+            return self.rate_limiter.call(self.broker, "get_orders")
         except Exception as e:
             logging.error(f"Error getting orderbook: {e}")
             return []
 
     def get_current_positions(self):
         """Get current holdings from Broker. Returns a tuple: (positions, is_successful)"""
-        def _get_holdings():
-            return self.broker.get_holdings()
-        
         try:
-            holdings_list = self.rate_limiter.retry_with_backoff(_get_holdings)
+            holdings_list = self.rate_limiter.call(self.broker, "get_holdings")
             
-            # BrokerConnector.get_holdings returns a List[Dict]
+            # BrokerConnector.get_holdings returns a List[Holding]
             # We need to convert it to the dict format expected by the strategy
             # Expected format: {symbol: {quantity, avg_price, current_price, pnl, pnl_pct}}
             
@@ -284,16 +333,13 @@ class SimpleNiftyTrader:
                 # print(f"[DEBUG] Holdings API Response: {holdings_list}")
                 positions = {}
                 
-                for pos in holdings_list:
-                    # FyersConnector returns raw Fyers holdings objects
-                    symbol = pos.get('symbol')
-                    qty = int(pos.get('quantity', 0))
-                    if qty > 0:
-                        positions[symbol] = {
-                            'quantity': qty,
-                            'avg_price': float(pos.get('costPrice', 0.0)),
-                            'current_price': float(pos.get('ltp', 0.0)),
-                            'pnl': float(pos.get('pl', 0.0)),
+                for holding in holdings_list:
+                    if holding.quantity > 0:
+                        positions[holding.symbol] = {
+                            'quantity': holding.quantity,
+                            'avg_price': holding.avg_price,
+                            'current_price': holding.ltp,
+                            'pnl': holding.pnl,
                             'pnl_pct': 0.0 # Will be calculated later
                         }
                             
@@ -307,34 +353,15 @@ class SimpleNiftyTrader:
             return {}, False # Failure
 
     def get_historical_data(self, symbol: str, days: int = 25) -> pd.DataFrame:
-        """Get historical data from Local DB (Data Warehouse) for MA calculation"""
+        """Get the last `days` NSE sessions from Local DB (Data Warehouse) for MA calculation"""
         try:
-            # Buffer for weekends/holidays (fetch extra days to ensure we get 'days' trading days)
-            start_date = datetime.now(UTC) - timedelta(days=days * 2) 
-            
-            # Query the Data Warehouse
-            candles_collection = self.db_handler.db[f'market_candles_{self.db_handler.env}']
+            # Exact session window from the trading calendar (layout-independent accessor)
+            df = self.candle_store.get_last_sessions([symbol], days).get(symbol, pd.DataFrame())
             
-            cursor = candles_collection.find(
-                {
-                    "symbol": symbol,
-                    "date": {"$gte": start_date}
-                }
-            ).sort("date", 1)
-            
-            candles = list(cursor)
-            
-            if not candles:
+            if df.empty:
                 # Fallback or Log Warning (Data Manager should have run)
                 logging.warning(f"⚠️ No local history found for {symbol}. Is Market Data Manager syncing?")
                 return pd.DataFrame()
-
-            # Convert to DataFrame
-            df = pd.DataFrame(candles)
-            
-            # Ensure columns exist and are correct types
-            df = df[['date', 'open', 'high', 'low', 'close', 'volume']]
-            df = df.sort_values('date').reset_index(drop=True)
             
             return df
 
@@ -354,18 +381,15 @@ class SimpleNiftyTrader:
             logging.info(f"TEST MODE: Buy order for {quantity} {symbol} would be placed here.")
             return {"s": "error", "message": "REJECTED_IN_TEST_ENV"}
 
-        def _place_order():
-            return self.broker.place_order(
+        try:
+            return self.rate_limiter.call(
+                self.broker, "place_order",
                 symbol=symbol,
                 qty=quantity,
                 side="BUY",
                 order_type="MARKET",
                 productType="CNC" # This might need to be configurable
             )
-        
-        try:
-            response = self.rate_limiter.retry_with_backoff(_place_order)
-            return response
         except Exception as e:
             logging.error(f"Error placing buy order for {symbol}: {e}")
             return {"s": "error", "message": str(e)}
@@ -376,30 +400,39 @@ class SimpleNiftyTrader:
             logging.info(f"TEST MODE: Sell order for {quantity} {symbol} would be placed here.")
             return {"s": "error", "message": "REJECTED_IN_TEST_ENV"}
             
-        def _place_order():
-            return self.broker.place_order(
+        try:
+            return self.rate_limiter.call(
+                self.broker, "place_order",
                 symbol=symbol,
                 qty=quantity,
                 side="SELL",
                 order_type="MARKET",
                 productType="CNC"
             )
-        
-        try:
-            response = self.rate_limiter.retry_with_backoff(_place_order)
-            return response
         except Exception as e:
             logging.error(f"Error placing sell order for {symbol}: {e}")
             return {"s": "error", "message": str(e)}
 
+    def place_sell_orders(self, legs: List[Dict]) -> List[Dict]:
+        """Place several sell orders as one basket; one response per leg"""
+        if self.db_handler.env == 'test':
+            for leg in legs:
+                logging.info(f"TEST MODE: Sell order for {leg['qty']} {leg['symbol']} would be placed here.")
+            return [{"s": "error", "message": "REJECTED_IN_TEST_ENV"} for _ in legs]
+
+        try:
+            return self.rate_limiter.call(self.broker, "place_orders", [
+                {**leg, "side": "SELL", "order_type": "MARKET", "productType": "CNC"} for leg in legs
+            ])
+        except Exception as e:
+            logging.error(f"Error placing {len(legs)} sell orders: {e}")
+            return [{"s": "error", "message": str(e)} for _ in legs]
+
     def get_account_balance(self) -> float:
         """Get available balance"""
-        def _get_funds():
-            return self.broker.get_funds()
-        
         try:
             # FyersConnector returns fund_limit list
-            funds_list = self.rate_limiter.retry_with_backoff(_get_funds)
+            funds_list = self.rate_limiter.call(self.broker, "get_funds")
             if funds_list and len(funds_list) > 0:
                 return float(funds_list[0].get('equityAmount', 0.0))
         except Exception as e:
@@ -423,15 +456,49 @@ class SimpleNiftyTrader:
 
         logging.info(f"🔍 Scanning for opportunities (MA Period: {self.ma_period}, Entry Threshold: {self.entry_threshold}%)")
 
+        # Precomputed MAs (one small doc per symbol); candles only for symbols without one
+        try:
+            moving_averages = self.indicator_store.get_moving_averages(symbols_to_scan, self.ma_period)
+            # Ignore documents a failed sync left behind the last session
+            fresh_from = last_completed_session().isoformat()
+            moving_averages = {s: v for s, v in moving_averages.items() if v['last_date'] >= fresh_from}
+        except Exception as e:
+            logging.error(f"Error loading precomputed indicators from DB: {e}")
+            moving_averages = {}
+
+        history_days = self.ma_period + 15
+        missing = [s for s in symbols_to_scan if s not in moving_averages]
+        histories = {}
+        if missing:
+            try:
+                histories = self.candle_store.get_last_sessions(missing, history_days)
+            except Exception as e:
+                logging.error(f"Error bulk loading historical data from DB: {e}")
+
+        mas = {}
         for symbol in symbols_to_scan:
             try:
-                df = self.get_historical_data(symbol, days=self.ma_period + 15)
-                if df.empty: continue
+                if symbol in moving_averages:
+                    ma = moving_averages[symbol]['mean']
+                else:
+                    df = histories.get(symbol)
+                    if df is None:
+                        df = self.get_historical_data(symbol, days=history_days)
+                    if df.empty: continue
 
-                ma = self.calculate_moving_average(df['close'])
+                    ma = self.calculate_moving_average(df['close'])
                 if ma is None: continue
+                mas[symbol] = ma
+            except Exception as e:
+                logging.warning(f"Could not scan {symbol}: {e}")
+                continue
+
+        # Broker quotes, with one batched data-source request for whatever the broker missed
+        prices = self.get_current_prices(list(mas))
 
-                current_price = self.get_current_price(symbol)
+        for symbol, ma in mas.items():
+            try:
+                current_price = prices.get(symbol, 0.0)
                 if current_price <= 0: continue
 
                 if current_price >= ma: continue
@@ -514,6 +581,7 @@ class SimpleNiftyTrader:
                     'quantity': quantity,
                     'date': datetime.now(UTC),
                     'order_id': order_id,
+                    'order_tag': order_response.get('tag'),
                     'is_averaging': is_averaging,
                     'comment': 'PENDING FILL'
                 }
@@ -544,7 +612,27 @@ class SimpleNiftyTrader:
         """Execute sell trade and verify fill."""
         try:
             order_response = self.place_sell_order(symbol, quantity)
+            return self._record_sells([(symbol, current_price, quantity, avg_price, order_response)]) == 1
+        except Exception as e:
+            logging.error(f"Exception in execute_sell for {symbol}: {e}")
+            return False
 
+    def execute_sells(self, exits: List[Dict]) -> int:
+        """Sell several exit candidates in one basket and verify their fills together. Returns the number filled."""
+        try:
+            responses = self.place_sell_orders([{'symbol': e['symbol'], 'qty': e['quantity']} for e in exits])
+            return self._record_sells([
+                (e['symbol'], e['current_price'], e['quantity'], e['avg_buy_price'], response)
+                for e, response in zip(exits, responses)
+            ])
+        except Exception as e:
+            logging.error(f"Exception in execute_sells for {[e['symbol'] for e in exits]}: {e}")
+            return 0
+
+    def _record_sells(self, sells: List) -> int:
+        """Save placed sells as pending trades, verify all fills at once and label the filled ones."""
+        placed = {}
+        for symbol, current_price, quantity, avg_price, order_response in sells:
             if order_response.get('s') == 'ok' and order_response.get('id'):
                 order_id = order_response['id']
                 profit = (current_price - avg_price) * quantity
@@ -557,32 +645,34 @@ class SimpleNiftyTrader:
                     'quantity': quantity,
                     'date': datetime.now(UTC),
                     'order_id': order_id,
+                    'order_tag': order_response.get('tag'),
                     'profit': profit,
                     'profit_pct': profit_pct,
                     'comment': 'PENDING FILL'
                 }
                 trade_doc_id = self.save_trade(trade_data)
-
-                if trade_doc_id and self.verify_and_update_order(trade_doc_id, order_id):
-                    comment = f'PROFIT EXIT: {profit_pct:.1f}%'
-                    self.db_handler.get_trades_collection().update_one(
-                        {'_id': trade_doc_id},
-                        {'$set': {'comment': comment}}
-                    )
-                    self.trades = self.load_trades()
-                    self.session_trades_count += 1
-                    logging.info(f"💰 SOLD and filled: {quantity} {symbol} at ₹{current_price:.2f}, Profit: ₹{profit:.2f}")
-                    return True
+                if trade_doc_id:
+                    placed[trade_doc_id] = (order_id, symbol, current_price, quantity, profit, profit_pct)
                 else:
                     logging.error(f"SELL order for {symbol} was placed but not confirmed as filled.")
-                    return False
             else:
                 logging.error(f"Failed to place sell order for {symbol}: {order_response}")
-                return False
 
-        except Exception as e:
-            logging.error(f"Exception in execute_sell for {symbol}: {e}")
-            return False
+        filled = self.verify_and_update_orders({doc_id: p[0] for doc_id, p in placed.items()}) if placed else set()
+        for trade_doc_id, (order_id, symbol, current_price, quantity, profit, profit_pct) in placed.items():
+            if trade_doc_id in filled:
+                comment = f'PROFIT EXIT: {profit_pct:.1f}%'
+                self.db_handler.get_trades_collection().update_one(
+                    {'_id': trade_doc_id},
+                    {'$set': {'comment': comment}}
+                )
+                self.session_trades_count += 1
+                logging.info(f"💰 SOLD and filled: {quantity} {symbol} at ₹{current_price:.2f}, Profit: ₹{profit:.2f}")
+            else:
+                logging.error(f"SELL order for {symbol} was placed but not confirmed as filled.")
+        if filled:
+            self.trades = self.load_trades()
+        return len(filled)
 
     def check_for_closed_positions(self, current_positions: Dict, positions_fetch_success: bool):
         """Check for manually closed positions and create a placeholder sell trade for manual update."""
@@ -661,19 +751,20 @@ class SimpleNiftyTrader:
         except Exception as e:
             logging.error(f"Error checking for closed positions: {e}", exc_info=True)
 
-    def get_current_price(self, symbol: str) -> float:
+    def get_current_price(self, symbol: str, max_age: float = QUOTE_MAX_AGE_ORDER) -> float:
         """Get current market price for a given symbol using Broker quotes API with fallback."""
+        # 0. A broker quote (or holdings LTP) observed within max_age seconds; delayed yfinance prices don't count
+        cached = quote_cache.get(symbol, max_age, realtime=True)
+        if cached:
+            return cached
+
         price = 0.0
         
         # 1. Try Broker (Real-time)
-        def _get_quote():
-            return self.broker.get_quote(symbol)
-        
         try:
-            response = self.rate_limiter.retry_with_backoff(_get_quote)
-            # FyersConnector/ZerodhaConnector returns standardized response
-            if response and response.get('s') == 'ok' and 'd' in response and len(response['d']) > 0:
-                price = float(response['d'][0]['v']['lp'])
+            quote = self.rate_limiter.call(self.broker, "get_quote", symbol)
+            if quote:
+                price = quote.ltp
         except Exception as e:
             logging.error(f"Error getting current price from broker for {symbol}: {e}")
             
@@ -687,6 +778,25 @@ class SimpleNiftyTrader:
                 
         return price
 
+    def get_current_prices(self, symbols: List[str], max_age: float = QUOTE_MAX_AGE_ORDER) -> Dict[str, float]:
+        """Current prices for several symbols: cache, broker quotes, then one batched fallback for the rest."""
+        prices = quote_cache.get_many(symbols, max_age, realtime=True)
+        to_quote = [s for s in symbols if s not in prices]
+        if to_quote:
+            try:
+                quotes = self.rate_limiter.call(self.broker, "get_quotes", to_quote)
+                prices.update({symbol: quote.ltp for symbol, quote in quotes.items()})
+            except Exception as e:
+                logging.error(f"Error getting current prices from broker for {len(to_quote)} symbols: {e}")
+
+        missing = [s for s in symbols if prices.get(s, 0) <= 0]
+        if missing:
+            try:
+                prices.update(self.data_source.get_latest_prices(missing))
+            except Exception as e:
+                logging.error(f"Error getting fallback prices for {len(missing)} symbols: {e}")
+        return prices
+
     def try_averaging_down(self, positions: Dict):
         """Try averaging down on worst performer (only if symbol is in active NIFTY 50 list)"""
         if not positions:
@@ -771,17 +881,22 @@ class SimpleNiftyTrader:
             exit_candidates = self.check_exit_conditions(current_positions)
             
             if exit_candidates:
-                best_exit = exit_candidates[0]
-                logging.info(f"🎯 EXIT OPPORTUNITY: {best_exit['symbol']} with {best_exit['profit_pct']:.1f}% profit")
+                exits = exit_candidates[:self.max_exits_per_run]
+                for exit_candidate in exits:
+                    logging.info(f"🎯 EXIT OPPORTUNITY: {exit_candidate['symbol']} with {exit_candidate['profit_pct']:.1f}% profit")
                 
-                if self.execute_sell(
-                    best_exit['symbol'],
-                    best_exit['current_price'],
-                    best_exit['quantity'],
-                    best_exit['avg_buy_price']
-                ):
-                    # Position will be removed on the next run when get_current_positions is called
-                    pass
+                if len(exits) == 1:
+                    best_exit = exits[0]
+                    self.execute_sell(
+                        best_exit['symbol'],
+                        best_exit['current_price'],
+                        best_exit['quantity'],
+                        best_exit['avg_buy_price']
+                    )
+                else:
+                    # Several exits go out as one basket, fills verified together
+                    self.execute_sells(exits)
+                # Sold positions will be removed on the next run when get_current_positions is called
             
             # Get fresh positions again before making buy decisions
             current_positions, positions_fetch_success = self.get_current_positions()
@@ -870,6 +985,7 @@ class SimpleNiftyTrader:
             update_data = {
                 'total_pnl': total_pnl,
                 'executed_trades_count': self.session_trades_count,
+                'api_retries': self.rate_limiter.budget.retries,
                 'end_time': datetime.now(UTC),
                 'status': 'COMPLETED'
             }
@@ -1045,8 +1161,6 @@ def main():
     broker_type = broker_config.get('broker_type')
     
     if broker_type == 'zerodha':
-        from connectors.zerodha import ZerodhaConnector
-        
         api_key = broker_config.get('api_key')
         api_secret = broker_config.get('api_secret')
         access_token = broker_config.get('access_token')
@@ -1055,10 +1169,8 @@ def main():
             logging.error("❌ Zerodha credentials incomplete in broker config")
             return
         
-        broker_connector = ZerodhaConnector(
-            api_key=api_key,
-            api_secret=api_secret,
-            access_token=access_token
+        broker_connector = connector_registry.get(
+            'zerodha', api_key, api_secret, access_token, broker_id=broker_config.get('broker_id')
         )
         logging.info("✅ Using Zerodha connector")
         
@@ -1071,11 +1183,10 @@ def main():
             logging.error("❌ Fyers credentials incomplete in broker config")
             return
         
-        broker_connector = FyersConnector(
-            api_key=api_key,
-            api_secret=api_secret,
-            access_token=access_token,
-            pin=broker_config.get('pin', '')  # PIN may be needed for some operations
+        broker_connector = connector_registry.get(
+            'fyers', api_key, api_secret, access_token,
+            pin=broker_config.get('pin', ''),  # PIN may be needed for some operations
+            broker_id=broker_config.get('broker_id')
         )
         logging.info("✅ Using Fyers connector")
     
@@ -1097,8 +1208,25 @@ def main():
         broker_id=broker_id,
         username=username
     )
-    
-    trader.run_daily_strategy()
+
+    # --- Optional replayed quote feed (test environment only): prices become latest-tick table reads ---
+    quote_stream = None
+    if QUOTE_REPLAY_SOURCE:
+        session = last_completed_session()
+        session_start = IST.localize(datetime(session.year, session.month, session.day))
+        quote_stream = replay_stream_from_config(
+            QUOTE_REPLAY_SOURCE, trader.candle_store.for_resolution("5"), trader.nifty50_symbols,
+            session_start, session_start + timedelta(days=1), env=db_handler.env
+        )
+    if quote_stream:
+        quote_stream.subscribe(trader.nifty50_symbols)
+        quote_stream.start()
+
+    try:
+        trader.run_daily_strategy()
+    finally:
+        if quote_stream:
+            quote_stream.stop()
 
 if __name__ == "__main__":
     main()
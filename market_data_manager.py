@@ -1,18 +1,36 @@
 
 import os
 import sys
+import argparse
 import logging
 from datetime import datetime, timedelta, date
 import pytz
 from pymongo import MongoClient, UpdateOne
 from dotenv import load_dotenv
 import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Load env vars
 load_dotenv()
 
-from config import MONGO_DB_NAME, MONGO_ENV
-from connectors.fyers import FyersConnector
+from config import (
+    MONGO_DB_NAME, MONGO_ENV, SYNC_MAX_WORKERS, SYNC_WRITE_BATCH_SIZE,
+    HISTORY_MAX_DAYS_PER_REQUEST, INTRADAY_RESOLUTIONS, INTRADAY_INITIAL_DAYS, CANDLE_COMPLETENESS_DAYS,
+    HISTORY_PROVIDER_RATE_LIMITS, HISTORY_HEDGE_PERCENTILE, HISTORY_HEDGE_MIN_SAMPLES
+)
+from connectors.registry import connector_registry
+from connectors.data_source import YFinanceDataSource
+from connectors.models import CandleBatch
+from history_providers import (
+    HistoryProviderChain, BrokerHistoryProvider, YFinanceHistoryProvider, HistoryUnavailable
+)
+from candle_store import CandleStore
+from candle_cache import CandleCache
+from indicator_store import IndicatorStore
+from corporate_actions import CorporateActions, detect_adjustment
+from utils.trading_calendar import trading_days, last_completed_session, session_ranges
 
 # Setup Logging
 logging.basicConfig(
@@ -48,6 +66,30 @@ NIFTY50_SYMBOLS = [
     "NSE:TRENT-EQ"
 ]
 
+PRICE_TOLERANCE = 1e-6
+
+
+def _same_candle(stored, incoming):
+    """True when an incoming OHLCV tuple matches the stored one."""
+    for old, new in zip(stored, incoming):
+        if old is None or new is None:
+            return False
+        if abs(float(old) - float(new)) > PRICE_TOLERANCE:
+            return False
+    return True
+
+
+def split_date_range(start_date, end_date, max_days):
+    """Split [start_date, end_date] into consecutive inclusive chunks of at most max_days days."""
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=max_days - 1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
 class MarketDataManager:
     def __init__(self):
         self.mongo_uri = os.getenv('MONGO_URI')
@@ -56,11 +98,19 @@ class MarketDataManager:
             
         self.client = MongoClient(self.mongo_uri)
         self.db = self.client[MONGO_DB_NAME]
-        self.candles_collection = self.db[f'market_candles_{MONGO_ENV}']
+        self.store = CandleStore(self.db, MONGO_ENV)
+        self.cache = CandleCache(env=MONGO_ENV)
+        self.indicators = IndicatorStore(self.db, MONGO_ENV)
+        self.actions = CorporateActions(self.db, MONGO_ENV)
+        self.candles_collection = self.store.collection
         self.broker_accounts = self.db['broker_accounts']
+        self.backfill_state = self.db[f'candle_backfill_state_{MONGO_ENV}']
+        self.completeness = self.db[f'candle_completeness_{MONGO_ENV}']
         
+        self.last_sync_report = {}
+
         # Ensure Index for fast lookups
-        self.candles_collection.create_index([("symbol", 1), ("date", -1)], unique=True)
+        self.store.ensure_indexes()
         
     def get_valid_fyers_token(self):
         """Find any valid Fyers access token, prioritizing admin."""
@@ -79,119 +129,572 @@ class MarketDataManager:
         logging.error("❌ No valid Fyers token found in the system!")
         return None
 
-    def fetch_history_from_broker(self, connector, symbol, start_date, end_date):
-        """Fetch historical data from Fyers."""
+    def fetch_history(self, chain, symbol, start_date, end_date, resolution="D"):
+        """Fetch history through the provider chain. Returns (candles, source)."""
+        logging.info(f"   Fetching {symbol} ({resolution}) from {start_date} to {end_date}")
         try:
-            # Fyers wants YYYY-MM-DD
-            s_str = start_date.strftime('%Y-%m-%d')
-            e_str = end_date.strftime('%Y-%m-%d')
-            
-            logging.info(f"   Fetching {symbol} from {s_str} to {e_str}")
-            
-            data = connector.get_historical_data(
-                symbol=symbol,
-                resolution="D", # Daily
-                from_date=s_str,
-                to_date=e_str
-            )
-            
-            if data and data.get('s') == 'ok':
-                return data.get('candles', [])
-            else:
-                logging.warning(f"   ⚠️ Fyers API returned error/empty: {data}")
-                return []
-                
+            return chain.fetch(symbol, resolution, start_date, end_date)
+        except HistoryUnavailable as e:
+            logging.error(f"   ❌ {e}")
+            return CandleBatch(), None
+
+    def get_stored_window(self, jobs, store=None):
+        """
+        Stored OHLCV for the re-fetch window of every symbol, in one query.
+        jobs: [(symbol, start_date), ...]
+        Returns {symbol: {epoch_seconds: (open, high, low, close, volume)}}.
+        """
+        if not jobs:
+            return {}
+        store = store or self.store
+        window_start = IST.localize(datetime.combine(min(start for _, start in jobs), datetime.min.time()))
+        return store.get_window([symbol for symbol, _ in jobs], window_start)
+
+    def _build_candle_ops(self, store, symbol, candles, stored, stats, source=None):
+        """Convert a CandleBatch to upserts, skipping rows that are already stored unchanged."""
+        ops = []
+        stored_rows = stored.get(symbol, {})
+        rows = list(candles.rows())
+        if stored_rows and store.resolution == "D":
+            # Provider re-adjusted its history (split/bonus): queue the factor for older candles
+            factor = detect_adjustment(stored_rows, rows)
+            if factor:
+                stats['adjustments'][symbol] = (candles.first_ts, factor)
+        for candle in rows:
+            # (timestamp, open, high, low, close, volume)
+            ts = candle[0]
+            incoming = tuple(candle[1:6])
+            existing = stored_rows.get(int(ts))
+
+            if existing is not None and _same_candle(existing, incoming):
+                stats['unchanged'] += 1
+                continue
+            stats['corrected' if existing is not None else 'inserted'] += 1
+            if store.resolution == "D":
+                stats['closes'].setdefault(symbol, {})[int(ts)] = incoming[3]
+
+            # Upsert based on symbol + session (layout handled by the store)
+            ops.append(store.candle_update(symbol, ts, incoming, source))
+        return ops
+
+    def _flush_candle_ops(self, store, ops, stats, checkpoints=None):
+        try:
+            result = store.bulk_write(ops)
+            stats['saved'] += result.upserted_count + result.modified_count
         except Exception as e:
-            logging.error(f"   ❌ Error fetching history: {e}")
-            return []
+            logging.error(f"❌ Bulk write of {len(ops)} candles failed: {e}")
+            return
+        # Only mark backfill chunks done once their candles are durably written
+        if checkpoints:
+            self._save_checkpoints(checkpoints)
+
+    def _candle_writer(self, store, write_queue, stored, stats):
+        """Single writer: drains fetched candles and bulk-writes them across symbols."""
+        pending = []
+        checkpoints = []
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+            symbol, candles, checkpoint, source = item
+            try:
+                ops = self._build_candle_ops(store, symbol, candles, stored, stats, source)
+                if ops:
+                    stats['changed'].add(symbol)
+                pending.extend(ops)
+                if checkpoint:
+                    checkpoints.append(checkpoint)
+            except Exception as e:
+                logging.error(f"❌ Error preparing candles for {symbol}: {e}")
+            if len(pending) >= SYNC_WRITE_BATCH_SIZE:
+                self._flush_candle_ops(store, pending, stats, checkpoints)
+                pending = []
+                checkpoints = []
+        if pending:
+            self._flush_candle_ops(store, pending, stats, checkpoints)
+        elif checkpoints:
+            self._save_checkpoints(checkpoints)
+
+    def _get_history_chain(self):
+        """
+        Provider chain for history: the admin/primary Fyers token, every other
+        valid Fyers or Zerodha token, then yfinance.
+        """
+        providers = []
+        primary = self.get_valid_fyers_token()
+        accounts = [primary] if primary else []
+        accounts += [
+            doc for doc in self.broker_accounts.find(
+                {"broker_type": {"$in": ["fyers", "zerodha"]}, "token_status": "valid"}
+            ).sort("broker_type", 1)
+            if not primary or doc.get('_id') != primary.get('_id')
+        ]
+
+        for doc in accounts:
+            b_type = doc.get('broker_type')
+            try:
+                connector = connector_registry.for_account(doc)
+            except Exception as e:
+                logging.warning(f"⚠️ Skipping {b_type} token of {doc.get('username')}: {e}")
+                continue
+            providers.append(BrokerHistoryProvider(
+                f"{b_type}:{doc.get('username')}", connector, HISTORY_PROVIDER_RATE_LIMITS[b_type]
+            ))
+
+        try:
+            providers.append(YFinanceHistoryProvider(YFinanceDataSource(), HISTORY_PROVIDER_RATE_LIMITS["yfinance"]))
+        except ImportError as e:
+            logging.warning(f"⚠️ yfinance fallback unavailable: {e}")
+
+        if not providers:
+            logging.error("❌ No history provider available!")
+            return None
+
+        logging.info(f"🔗 History providers: {' -> '.join(p.name for p in providers)}")
+        return HistoryProviderChain(
+            providers,
+            hedge_percentile=HISTORY_HEDGE_PERCENTILE or None,
+            hedge_min_samples=HISTORY_HEDGE_MIN_SAMPLES,
+            max_workers=SYNC_MAX_WORKERS
+        )
+
+    def _run_fetch_pipeline(self, chain, jobs, stored, label="Syncing", store=None):
+        """
+        Fetch (symbol, start, end, checkpoint) jobs concurrently through the
+        provider chain (each provider paces itself) and feed the single writer
+        thread. Returns the write stats, including chunks served per source.
+        """
+        store = store or self.store
+        write_queue = queue.Queue()
+        stats = {
+            'saved': 0, 'inserted': 0, 'corrected': 0, 'unchanged': 0,
+            'changed': set(), 'sources': {}, 'closes': {}, 'adjustments': {}
+        }
+        writer = threading.Thread(target=self._candle_writer, args=(store, write_queue, stored, stats), daemon=True)
+        writer.start()
+
+        def _fetch(symbol, start_date, end_date):
+            logging.info(f"🔄 {label} {symbol}...")
+            return self.fetch_history(chain, symbol, start_date, end_date, store.resolution)
+
+        try:
+            with ThreadPoolExecutor(max_workers=SYNC_MAX_WORKERS) as pool:
+                futures = {
+                    pool.submit(_fetch, symbol, start, end): (symbol, checkpoint)
+                    for symbol, start, end, checkpoint in jobs
+                }
+                for future in as_completed(futures):
+                    symbol, checkpoint = futures[future]
+                    try:
+                        candles, source = future.result()
+                        if source is None:
+                            # Every provider failed: leave the chunk un-checkpointed
+                            continue
+                        stats['sources'][source] = stats['sources'].get(source, 0) + 1
+                        # An empty chunk (e.g. before listing) is still a completed chunk
+                        if candles or checkpoint:
+                            write_queue.put((symbol, candles, checkpoint, source))
+                    except Exception as e:
+                        logging.error(f"❌ Error {label.lower()} {symbol}: {e}")
+        finally:
+            write_queue.put(None)
+            writer.join()
+        if len(stats['sources']) > 1 or chain.hedges:
+            logging.info(f"   🔗 Served by {stats['sources']} ({chain.hedges} hedged requests)")
+        return stats
 
     def sync_daily_data(self):
-        """Main sync function."""
+        """
+        Main sync function.
+
+        Pipelined: last dates come from one aggregation, histories are fetched
+        concurrently through the provider chain (each provider under its own
+        rate limit), and a single writer thread batches the upserts across symbols.
+        """
         logging.info("🚀 Starting Global Market Data Sync...")
-        
-        token_doc = self.get_valid_fyers_token()
-        if not token_doc:
+        sync_started = time.time()
+
+        chain = self._get_history_chain()
+        if not chain:
             return False
 
-        connector = FyersConnector(
-            api_key=token_doc['api_key'],
-            api_secret=token_doc['api_secret'],
-            access_token=token_doc['access_token'],
-            pin=token_doc.get('pin')
+        today = datetime.now(IST).date()
+
+        # 1. Check Last Dates in DB (one round trip)
+        last_dates = self.store.get_last_dates(NIFTY50_SYMBOLS)
+
+        jobs = []
+        for symbol in NIFTY50_SYMBOLS:
+            last_date = last_dates.get(symbol)
+            if last_date:
+                # User Request: Fetch from last_date (inclusive) to handle holidays/corrections
+                start_date = last_date
+            else:
+                logging.info(f"🆕 No data for {symbol}. Fetching last 60 days (use --backfill for deeper history).")
+                start_date = today - timedelta(days=60)
+
+            # 2. Check if we need to fetch
+            if start_date > today:
+                logging.info(f"✅ {symbol} is up to date ({start_date}).")
+                continue
+            jobs.append((symbol, start_date, today, None))
+
+        # Stored rows for the overlap window, so unchanged candles are not rewritten
+        stored = self.get_stored_window([(symbol, start) for symbol, start, _, _ in jobs])
+
+        # 3. Fetch concurrently, hand results to the single writer
+        try:
+            stats = self._run_fetch_pipeline(chain, jobs, stored)
+        finally:
+            chain.close()
+
+        self.last_sync_report = stats
+        logging.info(
+            f"   💾 Sync report for {len(jobs)} symbols: {stats['unchanged']} unchanged / "
+            f"{stats['corrected']} corrected / {stats['inserted']} inserted ({stats['saved']} written)"
         )
 
+        # 4. Rewrite history for splits/bonuses detected now or queued by hand
+        for symbol, (before_ts, factor) in stats['adjustments'].items():
+            self.actions.add(symbol, before_ts, factor, source="provider")
+        adjusted = self.apply_corporate_actions()
+
+        # 5. Refresh the local columnar cache for symbols that changed
+        self.refresh_cache(stats['changed'] | adjusted)
+
+        # 6. Roll the new closes into the precomputed moving averages
+        self.update_indicators(stats['closes'], rebuild=adjusted)
+
+        # 7. Keep the completeness index current (one read over the check window)
+        try:
+            self.build_completeness_index()
+        except Exception as e:
+            logging.error(f"❌ Completeness index update failed: {e}")
+
+        logging.info(f"✨ Market Data Sync Completed in {time.time() - sync_started:.1f}s.")
+        return True
+
+    def sync_intraday_data(self, resolutions=None, symbols=None):
+        """
+        Incremental intraday sync: for each resolution, fetch from the session of
+        the latest stored bar (inclusive) to today and upsert only new or
+        corrected bars into the time-partitioned intraday collection.
+        """
+        resolutions = resolutions or INTRADAY_RESOLUTIONS
+        symbols = symbols or NIFTY50_SYMBOLS
+        logging.info(f"🚀 Starting Intraday Market Data Sync ({', '.join(resolutions)} min)...")
+        started = time.time()
+
+        chain = self._get_history_chain()
+        if not chain:
+            return False
+
         today = datetime.now(IST).date()
+        try:
+            for resolution in resolutions:
+                store = self.store.for_resolution(resolution)
+                store.ensure_indexes()
+                max_days = HISTORY_MAX_DAYS_PER_REQUEST.get(resolution, HISTORY_MAX_DAYS_PER_REQUEST["D"])
 
-        for symbol in NIFTY50_SYMBOLS:
-            try:
-                # 1. Check Last Date in DB
-                last_candle = self.candles_collection.find_one(
-                    {"symbol": symbol},
-                    sort=[("date", -1)]
+                last_dates = store.get_last_dates(symbols)
+                jobs = []
+                for symbol in symbols:
+                    start_date = last_dates.get(symbol) or today - timedelta(days=INTRADAY_INITIAL_DAYS)
+                    for chunk_start, chunk_end in split_date_range(start_date, today, max_days):
+                        jobs.append((symbol, chunk_start, chunk_end, None))
+
+                stored = self.get_stored_window([(symbol, start) for symbol, start, _, _ in jobs], store)
+                stats = self._run_fetch_pipeline(chain, jobs, stored, label=f"Syncing {resolution}m", store=store)
+                logging.info(
+                    f"   💾 {resolution}m report: {stats['unchanged']} unchanged / "
+                    f"{stats['corrected']} corrected / {stats['inserted']} inserted"
                 )
-                
-                if last_candle:
-                    last_date = last_candle['date'].date()
-                    # User Request: Fetch from last_date (inclusive) to handle holidays/corrections
-                    start_date = last_date 
-                else:
-                    logging.info(f"🆕 No data for {symbol}. Fetching last 60 days.")
-                    start_date = today - timedelta(days=60)
-
-                # 2. Check if we need to fetch
-                if start_date > today:
-                    logging.info(f"✅ {symbol} is up to date ({last_date}).")
-                    continue
-                
-                logging.info(f"🔄 Syncing {symbol}...")
-                
-                # 3. Fetch Data
-                candles = self.fetch_history_from_broker(connector, symbol, start_date, today)
-                
-                if not candles:
+        finally:
+            chain.close()
+
+        logging.info(f"✨ Intraday Sync Completed in {time.time() - started:.1f}s.")
+        return True
+
+    # --- Deep History Backfill ---
+    def _save_checkpoints(self, checkpoints):
+        ops = [
+            UpdateOne(
+                {"_id": state_id},
+                {"$addToSet": {"done_chunks": chunk_key}, "$set": {"updated_at": datetime.now(UTC)}},
+                upsert=True
+            )
+            for state_id, chunk_key in checkpoints
+        ]
+        try:
+            self.backfill_state.bulk_write(ops, ordered=False)
+        except Exception as e:
+            logging.error(f"❌ Failed to save backfill checkpoints: {e}")
+
+    def backfill(self, start_date, end_date=None, symbols=None, resume=True, resolution="D"):
+        """
+        Load history for an arbitrary date range.
+
+        The range is split into provider-legal chunks (Fyers caps the days per
+        history request), chunks are fetched concurrently (each provider under
+        its own rate limit) and written through bulk upserts. Completed chunks are
+        checkpointed per symbol, so an interrupted backfill resumes where it
+        stopped.
+        """
+        symbols = symbols or NIFTY50_SYMBOLS
+        end_date = end_date or datetime.now(IST).date()
+        max_days = HISTORY_MAX_DAYS_PER_REQUEST.get(resolution, HISTORY_MAX_DAYS_PER_REQUEST["D"])
+        chunks = split_date_range(start_date, end_date, max_days)
+
+        logging.info(
+            f"🚀 Backfilling {len(symbols)} symbols from {start_date} to {end_date} "
+            f"({len(chunks)} chunks of <= {max_days} days each)..."
+        )
+        started = time.time()
+
+        chain = self._get_history_chain()
+        if not chain:
+            return False
+
+        done = {}
+        if resume:
+            state_ids = [f"{symbol}|{resolution}" for symbol in symbols]
+            for doc in self.backfill_state.find({"_id": {"$in": state_ids}}, {"done_chunks": 1}):
+                done[doc['_id']] = set(doc.get('done_chunks', []))
+        else:
+            self.backfill_state.delete_many({"_id": {"$in": [f"{symbol}|{resolution}" for symbol in symbols]}})
+
+        jobs = []
+        for symbol in symbols:
+            state_id = f"{symbol}|{resolution}"
+            for chunk_start, chunk_end in chunks:
+                chunk_key = f"{chunk_start.isoformat()}:{chunk_end.isoformat()}"
+                if chunk_key in done.get(state_id, ()):
                     continue
+                jobs.append((symbol, chunk_start, chunk_end, (state_id, chunk_key)))
 
-                # 4. Process and Bulk Write
-                bulk_ops = []
-                for candle in candles:
-                    # Fyers Candle: [timestamp, open, high, low, close, volume]
-                    ts = candle[0]
-                    # Convert TS to datetime (IST aware then to UTC or naive? Let's stick to simple date for daily)
-                    c_date = datetime.fromtimestamp(ts, pytz.timezone('Asia/Kolkata'))
-                    
-                    doc = {
-                        "symbol": symbol,
-                        "date": c_date, # MongoDB stores as ISODate
-                        "open": candle[1],
-                        "high": candle[2],
-                        "low": candle[3],
-                        "close": candle[4],
-                        "volume": candle[5],
-                        "updated_at": datetime.now(UTC)
-                    }
-                    
-                    # Upsert based on symbol + date
-                    bulk_ops.append(
-                        UpdateOne(
-                            {"symbol": symbol, "date": c_date},
-                            {"$set": doc},
-                            upsert=True
-                        )
-                    )
-                
-                if bulk_ops:
-                    result = self.candles_collection.bulk_write(bulk_ops)
-                    logging.info(f"   💾 Saved {result.upserted_count + result.modified_count} candles for {symbol}")
-                
-                # Rate limit safety
-                time.sleep(0.2)
+        skipped = len(symbols) * len(chunks) - len(jobs)
+        if skipped:
+            logging.info(f"   ⏭️ Resuming: {skipped} chunks already completed.")
+
+        # Deep ranges are not diffed against stored rows; every fetched candle is upserted
+        store = self.store.for_resolution(resolution)
+        store.ensure_indexes()
+        try:
+            stats = self._run_fetch_pipeline(chain, jobs, {}, label="Backfilling", store=store)
+        finally:
+            chain.close()
+
+        logging.info(f"   💾 Backfill wrote {stats['saved']} candles across {len(stats['changed'])} symbols")
+        if resolution == "D":
+            self.refresh_cache(stats['changed'], symbols)
+            self.update_indicators(stats['closes'])
+        logging.info(f"✨ Backfill Completed in {time.time() - started:.1f}s.")
+        return True
+
+    def refresh_cache(self, changed_symbols, symbols=None):
+        """
+        Republish changed, never cached or re-adjusted symbols and stamp the
+        cache with a new sync watermark.
+        """
+        symbols = symbols or NIFTY50_SYMBOLS
+        try:
+            cached = self.cache.adjustment_versions()
+            versions = self.store.get_adjustment_versions(list(set(symbols) | set(changed_symbols)))
+            to_publish = set(changed_symbols) | {s for s in symbols if s not in cached}
+            to_publish |= {s for s, v in versions.items() if s in cached and cached[s] != v}
+            if not to_publish and self.cache.is_fresh(self.store.get_sync_watermark()):
+                logging.info("🗄️ Candle cache is up to date.")
+                return
+
+            watermark = self.store.set_sync_watermark()
+            frames = self.store.get_candles_many(sorted(to_publish))
+            self.cache.publish(frames, watermark, versions)
+        except Exception as e:
+            # The cache is an optimisation; readers fall back to Mongo when it is stale
+            logging.error(f"❌ Candle cache refresh failed: {e}")
+
+    def update_indicators(self, closes, rebuild=()):
+        """
+        Apply written daily closes ({symbol: {ts: close}}) to indicators_{env}.
+        Symbols in `rebuild` had their history rewritten and are recomputed instead.
+        """
+        try:
+            if rebuild:
+                self.indicators.rebuild(self.store, rebuild)
+            self.indicators.apply(self.store, {s: c for s, c in closes.items() if s not in rebuild})
+        except Exception as e:
+            # Readers fall back to computing from candles when indicators are missing
+            logging.error(f"❌ Indicator update failed: {e}")
 
+    # --- Corporate Actions ---
+    def apply_corporate_actions(self, symbols=None):
+        """
+        Apply pending corporate actions to every stored resolution of the
+        affected symbol only, bumping its adjustment version each time.
+        Returns the set of adjusted symbols.
+        """
+        adjusted = set()
+        for action in self.actions.pending(symbols):
+            symbol = action['symbol']
+            try:
+                count = 0
+                for resolution in ["D"] + list(INTRADAY_RESOLUTIONS):
+                    count += self.store.for_resolution(resolution).adjust_history(
+                        symbol, action['before_ts'], action['factor']
+                    )
+                version = self.store.bump_adjustment_version(symbol)
+                self.actions.mark_applied(action['_id'], version, count)
+                adjusted.add(symbol)
+                logging.info(
+                    f"   🏷️ Adjusted {count} candles of {symbol} before {action.get('ex_date')} "
+                    f"by x{action['factor']:g} (version {version})"
+                )
             except Exception as e:
-                logging.error(f"❌ Error syncing {symbol}: {e}")
+                logging.error(f"❌ Failed to apply corporate action for {symbol}: {e}")
+        return adjusted
+
+    # --- Completeness & Gap Repair ---
+    def build_completeness_index(self, symbols=None, start_date=None):
+        """
+        Compare stored daily candles with the NSE calendar and record, per
+        symbol, the expected and present session counts plus the missing days.
+        Sessions before a symbol's first stored candle are not expected, and
+        days the provider has no data for (marked by repair_gaps) are excluded.
+        Returns {symbol: [missing dates]}.
+        """
+        symbols = symbols or NIFTY50_SYMBOLS
+        end_date = last_completed_session()
+        start_date = start_date or datetime.now(IST).date() - timedelta(days=CANDLE_COMPLETENESS_DAYS)
+        window_start = IST.localize(datetime.combine(start_date, datetime.min.time()))
+
+        present = self.store.get_session_dates(symbols, window_start)
+        unavailable = {
+            doc['_id']: set(date.fromisoformat(d) for d in doc.get('unavailable', []))
+            for doc in self.completeness.find({"_id": {"$in": list(symbols)}}, {"unavailable": 1})
+        }
+
+        ops = []
+        missing_by_symbol = {}
+        now = datetime.now(UTC)
+        for symbol in symbols:
+            stored = present.get(symbol)
+            if not stored:
+                # Nothing in the window: the daily sync seeds new symbols
+                continue
+            first = max(start_date, min(stored))
+            expected = [d for d in trading_days(first, end_date) if d not in unavailable.get(symbol, ())]
+            missing = [d for d in expected if d not in stored]
+            missing_by_symbol[symbol] = missing
+
+            ops.append(UpdateOne(
+                {"_id": symbol},
+                {"$set": {
+                    "first_session": first.isoformat(),
+                    "last_session": end_date.isoformat(),
+                    "expected": len(expected),
+                    "present": len(expected) - len(missing),
+                    "missing": [d.isoformat() for d in missing],
+                    "complete": not missing,
+                    "checked_at": now
+                }},
+                upsert=True
+            ))
+
+        if ops:
+            self.completeness.bulk_write(ops, ordered=False)
+
+        gaps = sum(len(m) for m in missing_by_symbol.values())
+        incomplete = sum(1 for m in missing_by_symbol.values() if m)
+        logging.info(f"📋 Completeness: {incomplete}/{len(ops)} symbols have gaps ({gaps} missing sessions)")
+        return missing_by_symbol
 
-        logging.info("✨ Market Data Sync Completed.")
+    def repair_gaps(self, symbols=None, start_date=None):
+        """
+        Fetch only the missing session ranges reported by the completeness
+        index. Sessions the provider still has no candle for afterwards are
+        recorded as unavailable so they are not requested again.
+        """
+        symbols = symbols or NIFTY50_SYMBOLS
+        logging.info("🩹 Starting candle gap repair...")
+        started = time.time()
+
+        missing = self.build_completeness_index(symbols, start_date)
+        max_days = HISTORY_MAX_DAYS_PER_REQUEST["D"]
+        jobs = []
+        for symbol, days in missing.items():
+            for run_start, run_end in session_ranges(days):
+                for chunk_start, chunk_end in split_date_range(run_start, run_end, max_days):
+                    jobs.append((symbol, chunk_start, chunk_end, None))
+
+        if not jobs:
+            logging.info("✅ No gaps to repair.")
+            return True
+
+        chain = self._get_history_chain()
+        if not chain:
+            return False
+
+        logging.info(f"   Fetching {len(jobs)} missing ranges across {sum(1 for d in missing.values() if d)} symbols")
+        try:
+            stats = self._run_fetch_pipeline(chain, jobs, {}, label="Repairing")
+        finally:
+            chain.close()
+        self.refresh_cache(stats['changed'], symbols)
+        self.update_indicators(stats['closes'])
+
+        still_missing = self.build_completeness_index(symbols, start_date)
+        ops = [
+            UpdateOne(
+                {"_id": symbol},
+                {"$addToSet": {"unavailable": {"$each": [d.isoformat() for d in days]}}}
+            )
+            for symbol, days in still_missing.items()
+            if days
+        ]
+        if ops:
+            self.completeness.bulk_write(ops, ordered=False)
+            logging.warning(f"   ⚠️ {sum(len(d) for d in still_missing.values())} sessions unavailable from the provider")
+            self.build_completeness_index(symbols, start_date)
+
+        logging.info(f"✨ Gap Repair Completed in {time.time() - started:.1f}s ({stats['saved']} candles written).")
         return True
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Market Data Manager: daily sync and deep-history backfill.")
+    parser.add_argument("--backfill", action="store_true", help="Backfill history instead of the daily sync")
+    parser.add_argument("--from", dest="from_date", type=str, help="Backfill start date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", type=str, default=None, help="Backfill end date (YYYY-MM-DD, default today)")
+    parser.add_argument("--symbols", nargs="+", default=None, help="Symbols to backfill (default NIFTY 50)")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore saved checkpoints and refetch every chunk")
+    parser.add_argument("--resolution", default="D", help="Backfill resolution: D or minutes (5, 15, 60)")
+    parser.add_argument("--intraday", action="store_true", help="Run the incremental intraday sync")
+    parser.add_argument("--corporate-action", nargs=3, metavar=("SYMBOL", "EX_DATE", "FACTOR"),
+                        help="Adjust SYMBOL's candles before EX_DATE by price FACTOR (e.g. 0.5 for a 1:2 split)")
+    parser.add_argument("--repair", action="store_true", help="Fetch missing daily sessions found by the completeness check")
+    args = parser.parse_args()
+
     manager = MarketDataManager()
-    manager.sync_daily_data()
+
+    if args.backfill:
+        if not args.from_date:
+            parser.error("--backfill requires --from")
+        start = datetime.strptime(args.from_date, '%Y-%m-%d').date()
+        end = datetime.strptime(args.to_date, '%Y-%m-%d').date() if args.to_date else None
+        manager.backfill(start, end, symbols=args.symbols, resume=not args.no_resume, resolution=args.resolution)
+    elif args.corporate_action:
+        symbol, ex_date, factor = args.corporate_action
+        ex_start = IST.localize(datetime.strptime(ex_date, '%Y-%m-%d'))
+        manager.actions.add(symbol, int(ex_start.timestamp()), float(factor), source="manual")
+        adjusted = manager.apply_corporate_actions([symbol])
+        manager.refresh_cache(adjusted)
+        manager.update_indicators({}, rebuild=adjusted)
+    elif args.repair:
+        start = datetime.strptime(args.from_date, '%Y-%m-%d').date() if args.from_date else None
+        manager.repair_gaps(symbols=args.symbols, start_date=start)
+    elif args.intraday:
+        manager.sync_intraday_data(symbols=args.symbols)
+    else:
+        manager.sync_daily_data()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Build (or rebuild) daily_activity_{env} from logs_{env} and trades_{env}.
+
+Usage:
+    python migration/backfill_daily_activity.py [--env prod] [--username chaitu_shop]
+
+Run it once after deploying the rollup, and again whenever its counts look
+off (e.g. after editing trades or logs directly in the database). Writers
+keep it up to date from then on.
+"""
+
+import os
+import sys
+import argparse
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+
+from config import MONGO_DB_NAME, MONGO_ENV
+from daily_activity import DailyActivityStore
+
+MONGO_URI = os.getenv('MONGO_URI')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the per-day log / trade counts behind dashboard pagination.")
+    parser.add_argument("--env", default=MONGO_ENV, help="Collection suffix (default: config MONGO_ENV)")
+    parser.add_argument("--username", default=None, help="Only rebuild this user's days")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Account-days per bulk_write")
+    args = parser.parse_args()
+
+    if not MONGO_URI:
+        print("❌ MONGO_URI not found in .env")
+        exit(1)
+
+    client = MongoClient(MONGO_URI, tz_aware=True)
+    db = client[MONGO_DB_NAME]
+
+    print(f"🔄 Counting logs_{args.env} / trades_{args.env} per account and IST day...")
+    written = DailyActivityStore(db, args.env).backfill(username=args.username, batch_size=args.batch_size)
+    print(f"✅ Wrote {written} account-days to daily_activity_{args.env}.")
+
+
+if __name__ == "__main__":
+    main()
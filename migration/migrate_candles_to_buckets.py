@@ -0,0 +1,55 @@
+"""
+Migrate market_candles_{env} (one document per symbol-day) into the
+monthly-bucket layout (market_candle_buckets_{env}).
+
+Usage:
+    python migration/migrate_candles_to_buckets.py [--env prod] [--batch-size 1000]
+
+After it completes, set CANDLE_STORAGE_MODE=bucket so the sync and all
+readers switch to the new layout. The source collection is left untouched.
+"""
+
+import os
+import sys
+import argparse
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+
+from config import MONGO_DB_NAME, MONGO_ENV
+from candle_store import CandleStore, migrate_daily_to_buckets
+
+MONGO_URI = os.getenv('MONGO_URI')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate daily candles into symbol-month buckets.")
+    parser.add_argument("--env", default=MONGO_ENV, help="Collection suffix (default: config MONGO_ENV)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Candles per bulk_write")
+    args = parser.parse_args()
+
+    if not MONGO_URI:
+        print("❌ MONGO_URI not found in .env")
+        exit(1)
+
+    client = MongoClient(MONGO_URI)
+    db = client[MONGO_DB_NAME]
+
+    daily = CandleStore(db, args.env, mode='daily')
+    buckets = CandleStore(db, args.env, mode='bucket')
+
+    print(f"🔄 Migrating market_candles_{args.env} -> market_candle_buckets_{args.env}...")
+    copied = migrate_daily_to_buckets(db, args.env, batch_size=args.batch_size)
+
+    print(f"✅ Migrated {copied} candles.")
+    print(f"   Daily documents:  {daily.count_documents()}")
+    print(f"   Bucket documents: {buckets.count_documents()}")
+    print("   Set CANDLE_STORAGE_MODE=bucket to switch readers and the sync over.")
+
+
+if __name__ == "__main__":
+    main()
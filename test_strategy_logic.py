@@ -21,6 +21,7 @@ from config import MONGO_DB_NAME, MONGO_ENV, MA_PERIOD, MAX_TRADE_VALUE
 from live_stratergy import DatabaseHandler, SimpleNiftyTrader
 from connectors.fyers import FyersConnector
 from connectors.data_source import YFinanceDataSource
+from connectors.models import Quote
 
 UTC = pytz.utc
 IST = pytz.timezone('Asia/Kolkata')
@@ -93,7 +94,8 @@ def test_strategy_logic(broker_id=None, dry_run=True):
         broker=broker_connector if broker_connector else type('MockBroker', (), {
             'get_holdings': lambda: [],
             'get_funds': lambda: [{'equityAmount': 50000}],
-            'get_quote': lambda s: {'s': 'ok', 'd': [{'v': {'lp': 100}}]},
+            'get_quote': lambda s: Quote(s, 100),
+            'get_quotes': lambda syms: {s: Quote(s, 100) for s in syms},
             'get_orders': lambda: [],
             'place_order': lambda **k: {'s': 'error', 'message': 'DRY RUN'}
         })(),
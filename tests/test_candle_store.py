@@ -0,0 +1,123 @@
+"""
+CandleStore: daily and bucketed layouts, intraday session buckets.
+
+    python -m pytest -q tests
+"""
+
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import pytz
+
+from candle_store import CandleStore, migrate_daily_to_buckets
+from utils.trading_calendar import trading_days
+
+IST = pytz.timezone('Asia/Kolkata')
+SYMBOL = "NSE:INFY-EQ"
+
+
+def session_ts(d: date) -> int:
+    """Fyers daily candles are stamped at IST midnight."""
+    return int(IST.localize(datetime(d.year, d.month, d.day)).timestamp())
+
+
+def ohlcv(i: int):
+    close = 1000.0 + i
+    return (close - 5, close + 10, close - 10, close, 1000 + i)
+
+
+# Spans a month boundary, so the bucket layout uses two documents
+SESSIONS = trading_days(date(2024, 5, 20), date(2024, 6, 14))
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient(tz_aware=True).db
+
+
+def write(store, symbol=SYMBOL, sessions=SESSIONS):
+    store.ensure_indexes()
+    store.bulk_write([store.candle_update(symbol, session_ts(d), ohlcv(i)) for i, d in enumerate(sessions)])
+
+
+def frame_rows(df):
+    return [(row.date.date(), row.open, row.high, row.low, row.close, row.volume) for row in df.itertuples()]
+
+
+# --- Layouts ---
+def test_daily_to_bucket_round_trip(db):
+    daily = CandleStore(db, "test", mode="daily")
+    write(daily)
+
+    assert migrate_daily_to_buckets(db, "test") == len(SESSIONS)
+    bucket = CandleStore(db, "test", mode="bucket")
+
+    assert bucket.collection.count_documents({}) == 2
+    assert frame_rows(bucket.get_candles(SYMBOL)) == frame_rows(daily.get_candles(SYMBOL))
+    assert frame_rows(bucket.get_candles(SYMBOL))[0] == (SESSIONS[0],) + ohlcv(0)
+
+    # Re-running re-sets the same packed days
+    migrate_daily_to_buckets(db, "test")
+    assert bucket.collection.count_documents({}) == 2
+    assert len(bucket.get_candles(SYMBOL)) == len(SESSIONS)
+
+
+@pytest.mark.parametrize("mode", ["daily", "bucket"])
+def test_range_reads_match_across_layouts(db, mode):
+    store = CandleStore(db, "test", mode=mode)
+    write(store)
+    start = IST.localize(datetime(2024, 5, 30))
+    end = IST.localize(datetime(2024, 6, 4, 23, 59))
+
+    dates = [row[0] for row in frame_rows(store.get_candles(SYMBOL, start, end))]
+    assert dates == [d for d in SESSIONS if date(2024, 5, 30) <= d <= date(2024, 6, 4)]
+
+
+@pytest.mark.parametrize("mode", ["daily", "bucket"])
+def test_last_dates_are_ist_sessions(db, mode):
+    store = CandleStore(db, "test", mode=mode)
+    write(store)
+    write(store, "NSE:TCS-EQ", SESSIONS[:3])
+
+    # IST midnight is the previous day in UTC; the stored session must not shift
+    assert store.get_last_dates([SYMBOL, "NSE:TCS-EQ", "NSE:NONE-EQ"]) == {
+        SYMBOL: SESSIONS[-1],
+        "NSE:TCS-EQ": SESSIONS[2],
+    }
+
+
+def test_intraday_bars_are_packed_per_session(db):
+    store = CandleStore(db, "test", resolution="15")
+    store.ensure_indexes()
+    today = datetime.now(IST).date()
+    days = [today - timedelta(days=2), today - timedelta(days=1)]
+    bars = [IST.localize(datetime(d.year, d.month, d.day, 9, 15 + 15 * i)) for d in days for i in range(3)]
+    store.bulk_write([store.candle_update(SYMBOL, int(bar.timestamp()), ohlcv(i)) for i, bar in enumerate(bars)])
+
+    docs = list(store.collection.find({}, {"_id": 0, "day": 1, "bars": 1, "session_start": 1}))
+    assert sorted(doc["day"] for doc in docs) == [d.strftime('%Y-%m-%d') for d in days]
+    assert all(sorted(doc["bars"]) == ["0915", "0930", "0945"] for doc in docs)
+    assert all(doc["session_start"].astimezone(IST).hour == 0 for doc in docs)
+    assert list(store.get_candles(SYMBOL)["date"]) == bars
+
+
+def test_intraday_sessions_expire_after_retention(db):
+    store = CandleStore(db, "test", resolution="15")
+    store.ensure_indexes()
+    ttl = [ix for ix in store.collection.index_information().values() if "expireAfterSeconds" in ix]
+    assert ttl[0]["key"] == [("session_start", 1)]
+    assert ttl[0]["expireAfterSeconds"] == 90 * 86400
+
+    old = IST.localize(datetime.combine(datetime.now(IST).date() - timedelta(days=91), time(9, 15)))
+    store.bulk_write([store.candle_update(SYMBOL, int(old.timestamp()), ohlcv(0))])
+    assert store.get_candles(SYMBOL).empty
+
+
+def test_unknown_layouts_are_rejected(db):
+    with pytest.raises(ValueError):
+        CandleStore(db, "test", mode="weekly")
+    with pytest.raises(ValueError):
+        CandleStore(db, "test", resolution="1")
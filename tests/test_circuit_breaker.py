@@ -0,0 +1,139 @@
+"""
+Circuit breaker state changes: closed -> open -> half-open probe -> closed / open.
+
+    python -m pytest -q tests
+"""
+
+import pytest
+
+from connectors import circuit_breaker
+from connectors.circuit_breaker import BrokerHealth, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def health(clock):
+    return BrokerHealth(window=10, min_calls=4, failure_rate=0.5, slow_call_secs=5.0, slow_call_rate=0.5, open_secs=30.0)
+
+
+def ok():
+    return {"s": "ok"}
+
+
+def boom():
+    raise ConnectionError("reset by peer")
+
+
+def token_expired():
+    raise PermissionError("token expired")
+
+
+def fail_times(health, n, endpoint="quotes"):
+    for _ in range(n):
+        with pytest.raises(ConnectionError):
+            health.call("fyers", endpoint, boom)
+
+
+def trip(health, endpoint="quotes"):
+    fail_times(health, 4, endpoint)
+    assert health.breaker("fyers", endpoint).state == OPEN
+
+
+def test_opens_once_the_failure_rate_is_reached(health):
+    health.call("fyers", "quotes", ok)
+    fail_times(health, 2)
+    assert health.breaker("fyers", "quotes").state == CLOSED   # 2 of 3: below min_calls
+
+    fail_times(health, 1)
+    assert health.breaker("fyers", "quotes").state == OPEN
+    with pytest.raises(CircuitOpenError) as err:
+        health.call("fyers", "quotes", ok)
+    assert err.value.retry_in == pytest.approx(30.0)
+
+
+def test_slow_calls_open_the_breaker(health, clock):
+    def slow():
+        clock.now += 6.0
+        return ok()
+
+    for _ in range(4):
+        health.call("fyers", "history", slow)
+    assert health.breaker("fyers", "history").state == OPEN
+
+
+def test_ignored_exceptions_and_flagged_results(health):
+    for _ in range(4):
+        with pytest.raises(PermissionError):
+            health.call("zerodha", "orders", token_expired, ignore=(PermissionError,))
+    assert health.breaker("zerodha", "orders").state == CLOSED
+
+    for _ in range(4):
+        health.call("zerodha", "orders", lambda: {"code": 503}, is_failure=lambda r: r["code"] >= 500)
+    assert health.breaker("zerodha", "orders").state == OPEN
+
+
+def test_single_probe_after_open_secs(health, clock):
+    trip(health)
+    breaker = health.breaker("fyers", "quotes")
+    clock.now += 30.0
+    assert breaker.state == HALF_OPEN
+
+    breaker.acquire()                       # the probe
+    with pytest.raises(CircuitOpenError):   # nobody else while it's in flight
+        breaker.acquire()
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    health.call("fyers", "quotes", ok)
+
+
+def test_failed_probe_reopens(health, clock):
+    trip(health)
+    clock.now += 30.0
+    fail_times(health, 1)
+
+    assert health.breaker("fyers", "quotes").state == OPEN
+    assert health.breaker("fyers", "quotes").retry_in() == pytest.approx(30.0)
+
+
+@pytest.mark.parametrize("interrupt", [KeyboardInterrupt, SystemExit])
+def test_interrupted_probe_frees_the_probe_slot(health, clock, interrupt):
+    trip(health)
+    clock.now += 30.0
+
+    def interrupted():
+        raise interrupt()
+
+    with pytest.raises(interrupt):
+        health.call("fyers", "quotes", interrupted)
+    assert health.breaker("fyers", "quotes").state == HALF_OPEN
+    assert health.call("fyers", "quotes", ok) == {"s": "ok"}
+    assert health.breaker("fyers", "quotes").state == CLOSED
+
+
+def test_available_and_status(health, clock):
+    health.call("fyers", "quotes", ok)
+    assert health.status("fyers") == "healthy"
+
+    trip(health, "holdings")
+    assert not health.available("fyers", "holdings")
+    assert health.available("fyers", "quotes")
+    assert not health.available("fyers")
+    assert health.available("zerodha")
+    assert health.status("fyers") == "down"
+
+    clock.now += 30.0
+    assert health.status("fyers") == "recovering"
@@ -0,0 +1,115 @@
+"""
+ConnectorRegistry: evicted connectors are closed, async ones on the broker loop.
+
+    python -m pytest -q tests
+"""
+
+import threading
+
+import pytest
+
+pytest.importorskip("fyers_apiv3")
+pytest.importorskip("kiteconnect")
+
+from connectors import registry as registry_module
+from connectors.async_base import AsyncBrokerConnector
+from connectors.registry import ConnectorRegistry
+
+
+class FakeConnector:
+    def __init__(self, api_key, api_secret, access_token=None, **kwargs):
+        self.name = "fake"
+        self.access_token = access_token
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+class FakeAsyncConnector(AsyncBrokerConnector):
+    def __init__(self, api_key, api_secret, access_token=None, **kwargs):
+        super().__init__(api_key, api_secret, access_token)
+        self.name = "fake"
+        self.closed = threading.Event()
+
+    async def aclose(self):
+        self.closed.set()
+
+
+FakeAsyncConnector.__abstractmethods__ = frozenset()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(registry_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def registry(monkeypatch, clock):
+    monkeypatch.setitem(registry_module.CONNECTOR_CLASSES, "zerodha", FakeConnector)
+    monkeypatch.setitem(registry_module.ASYNC_CONNECTOR_CLASSES, "zerodha", FakeAsyncConnector)
+    return ConnectorRegistry(idle_timeout=60)
+
+
+def get(registry, token="t1", broker_id="b1", asynchronous=False):
+    return registry.get("zerodha", "key", "secret", token, broker_id=broker_id, asynchronous=asynchronous)
+
+
+def test_reuse_does_not_close(registry):
+    connector = get(registry)
+
+    assert get(registry) is connector
+    assert connector.closed == 0
+    assert (registry.hits, registry.misses) == (1, 1)
+
+
+def test_token_change_closes_the_old_connector(registry):
+    old = get(registry, token="t1")
+    new = get(registry, token="t2")
+
+    assert new is not old
+    assert old.closed == 1 and new.closed == 0
+    assert len(registry) == 1
+
+
+def test_idle_connectors_are_closed_on_next_lookup(registry, clock):
+    idle = get(registry, broker_id="b1")
+    clock.now += 61
+    busy = get(registry, broker_id="b2")
+
+    assert idle.closed == 1 and busy.closed == 0
+    assert len(registry) == 1
+
+
+def test_evict_and_clear_close_sync_and_async(registry):
+    sync, async_ = get(registry), get(registry, asynchronous=True)
+    other = get(registry, broker_id="b2")
+
+    registry.evict("b1")
+    assert sync.closed == 1
+    assert async_.closed.wait(5)
+    assert other.closed == 0
+
+    registry.clear()
+    assert other.closed == 1
+    assert len(registry) == 0
+
+
+def test_failed_close_is_only_logged(registry):
+    def close():
+        raise RuntimeError("socket gone")
+
+    broken = get(registry, token="t1")
+    broken.close = close
+
+    assert get(registry, token="t2") is not broken
@@ -0,0 +1,96 @@
+"""
+Corporate actions: split detection during sync and per-symbol history adjustment.
+
+    python -m pytest -q tests
+"""
+
+from datetime import date, datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import pytz
+
+from candle_store import CandleStore
+from corporate_actions import CorporateActions, detect_adjustment
+from utils.trading_calendar import trading_days
+
+IST = pytz.timezone('Asia/Kolkata')
+SYMBOL = "NSE:INFY-EQ"
+SESSIONS = trading_days(date(2024, 5, 20), date(2024, 6, 14))
+
+
+def session_ts(d: date) -> int:
+    return int(IST.localize(datetime(d.year, d.month, d.day)).timestamp())
+
+
+def ohlcv(i: int):
+    close = 1000.0 + i
+    return (close - 5, close + 10, close - 10, close, 1000 + i)
+
+
+def stored(sessions):
+    return {session_ts(d): ohlcv(i) for i, d in enumerate(sessions)}
+
+
+def write(store, symbol=SYMBOL, sessions=SESSIONS):
+    store.ensure_indexes()
+    store.bulk_write([store.candle_update(symbol, session_ts(d), ohlcv(i)) for i, d in enumerate(sessions)])
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient(tz_aware=True).db
+
+
+def test_split_is_detected_from_a_consistent_factor():
+    overlap = SESSIONS[-5:]
+    # 1:2 split: the provider now serves every stored candle at half price, double volume
+    candles = [[session_ts(d)] + [p / 2 for p in ohlcv(i)[:4]] + [ohlcv(i)[4] * 2] for i, d in enumerate(overlap)]
+
+    assert detect_adjustment(stored(overlap), candles) == pytest.approx(0.5)
+
+
+def test_normal_gap_is_not_a_split():
+    overlap = SESSIONS[-5:-1]
+    candles = [[session_ts(d)] + list(ohlcv(i)) for i, d in enumerate(overlap)]
+    # The new session opens 20% lower, but the stored candles are re-served unchanged
+    gap_day = SESSIONS[-1]
+    candles.append([session_ts(gap_day), 800.0, 810.0, 790.0, 800.0, 5000])
+
+    assert detect_adjustment(stored(overlap), candles) is None
+
+
+def test_one_bad_candle_is_not_a_split():
+    overlap = SESSIONS[-3:]
+    candles = [[session_ts(d)] + list(ohlcv(i)) for i, d in enumerate(overlap)]
+    candles[-1] = [candles[-1][0]] + [p / 2 for p in ohlcv(2)[:4]] + [ohlcv(2)[4]]
+
+    assert detect_adjustment(stored(overlap), candles) is None
+
+
+@pytest.mark.parametrize("mode", ["daily", "bucket"])
+def test_applied_split_rewrites_only_older_candles_and_bumps_version(db, mode):
+    if mode == "daily":
+        pytest.skip("mongomock does not implement $mul")
+    store = CandleStore(db, "test", mode=mode)
+    write(store)
+    write(store, "NSE:TCS-EQ")
+    ex_date = SESSIONS[10]
+    actions = CorporateActions(db, "test")
+    actions.add(SYMBOL, session_ts(ex_date), 0.5, source="provider")
+    actions.add(SYMBOL, session_ts(ex_date), 0.5, source="provider")
+
+    [action] = actions.pending()
+    adjusted = store.adjust_history(SYMBOL, action["before_ts"], action["factor"])
+    version = store.bump_adjustment_version(SYMBOL)
+    actions.mark_applied(action["_id"], version, adjusted)
+
+    assert adjusted == 10
+    rows = [tuple(r) for r in store.get_candles(SYMBOL)[['open', 'high', 'low', 'close', 'volume']].itertuples(index=False)]
+    assert rows[9] == pytest.approx((ohlcv(9)[0] / 2, ohlcv(9)[1] / 2, ohlcv(9)[2] / 2, ohlcv(9)[3] / 2, ohlcv(9)[4] * 2))
+    assert rows[10] == pytest.approx(ohlcv(10))
+    assert store.get_candles("NSE:TCS-EQ")['close'].iloc[0] == ohlcv(0)[3]
+    assert store.get_adjustment_versions([SYMBOL, "NSE:TCS-EQ"]) == {SYMBOL: 1}
+    assert actions.pending() == []
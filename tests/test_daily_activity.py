@@ -0,0 +1,222 @@
+"""
+DailyActivityStore: counters per IST day, day paging, trades per day and backfill.
+
+    python -m pytest -q tests
+"""
+
+from collections import Counter
+from datetime import date, datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import pytz
+
+import daily_activity
+from daily_activity import DailyActivityStore, ist_day, trade_date
+
+UTC = pytz.utc
+
+# 18:15 UTC is 23:45 IST on the 12th; 18:45 UTC is 00:15 IST on the 13th
+BEFORE_MIDNIGHT = datetime(2024, 6, 12, 18, 15, tzinfo=UTC)
+AFTER_MIDNIGHT = datetime(2024, 6, 12, 18, 45, tzinfo=UTC)
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient(tz_aware=True).db
+
+
+@pytest.fixture
+def store(db):
+    return DailyActivityStore(db, env="test")
+
+
+def counts(db, counter="trades"):
+    return {d["date"]: d[counter] for d in db.daily_activity_test.find({"username": "u"})}
+
+
+# --- Writes ---
+def test_trade_counts_on_its_ist_day(db, store):
+    store.record_trade({"username": "u", "broker_id": "b1", "date": BEFORE_MIDNIGHT})
+    store.record_trade({"username": "u", "broker_id": "b1", "date": AFTER_MIDNIGHT})
+
+    assert counts(db) == {"2024-06-12": 1, "2024-06-13": 1}
+
+
+def test_trade_without_date_counts_on_created_at(db, store):
+    store.record_trade({"username": "u", "broker_id": "b1", "date": None, "created_at": AFTER_MIDNIGHT})
+
+    assert counts(db) == {"2024-06-13": 1}
+
+
+def test_move_trade_across_ist_midnight(db, store):
+    trade = {"username": "u", "broker_id": "b1", "date": BEFORE_MIDNIGHT}
+    store.record_trade(trade)
+    store.move_trade(trade, AFTER_MIDNIGHT)
+
+    assert counts(db) == {"2024-06-12": 0, "2024-06-13": 1}
+
+
+def test_move_trade_within_the_day_is_a_no_op(db, store):
+    trade = {"username": "u", "broker_id": "b1", "date": datetime(2024, 6, 12, 4, 0, tzinfo=UTC)}
+    store.record_trade(trade)
+    store.move_trade(trade, BEFORE_MIDNIGHT)
+
+    assert counts(db) == {"2024-06-12": 1}
+
+
+def test_unowned_records_are_skipped(db, store):
+    store.record_log(None, "b1", BEFORE_MIDNIGHT)
+    store.record_trade({"broker_id": "b1", "date": BEFORE_MIDNIGHT})
+
+    assert db.daily_activity_test.count_documents({}) == 0
+
+
+def test_record_days_adds_to_existing_counts(db, store):
+    store.record_log("u", "b1", BEFORE_MIDNIGHT)
+    store.record_days("u", "b1", {"2024-06-12": {"logs": 40}, "2024-06-13": {"logs": 2}})
+
+    assert counts(db, "logs") == {"2024-06-12": 41, "2024-06-13": 2}
+
+
+# --- Reads ---
+def test_page_sums_brokers_and_counts_active_days(store):
+    for day in range(1, 6):
+        ts = datetime(2024, 6, day, 6, 0, tzinfo=UTC)
+        store.record_log("u", "b1", ts)
+        store.record_log("u", "b2", ts)
+    store.record_trade({"username": "u", "broker_id": "b2", "date": datetime(2024, 6, 4, 6, 0, tzinfo=UTC)})
+    # A day whose only trade was deleted again isn't active
+    gone = {"username": "u", "broker_id": "b1", "date": datetime(2024, 6, 20, 6, 0, tzinfo=UTC)}
+    store.record_trade(gone)
+    store.record_trade(gone, -1)
+
+    days, total = store.page("u", skip=1, limit=2)
+    assert total == 5
+    assert days == [
+        {"date": date(2024, 6, 4), "logs": 2, "trades": 1},
+        {"date": date(2024, 6, 3), "logs": 2, "trades": 0},
+    ]
+
+    days, total = store.page("u", broker_id="b2", limit=10)
+    assert total == 5
+    assert days[1] == {"date": date(2024, 6, 4), "logs": 1, "trades": 1}
+
+
+def test_page_of_unknown_user_is_empty(store):
+    assert store.page("nobody") == ([], 0)
+
+
+def test_trades_by_day_with_and_without_date(db, store):
+    db.trades_test.insert_many([
+        {"username": "u", "broker_id": "b1", "symbol": "A", "date": BEFORE_MIDNIGHT},
+        {"username": "u", "broker_id": "b1", "symbol": "B", "created_at": datetime(2024, 6, 12, 5, tzinfo=UTC)},
+        {"username": "u", "broker_id": "b1", "symbol": "C", "date": None, "created_at": AFTER_MIDNIGHT},
+        # Listed under its date, not its created_at
+        {"username": "u", "broker_id": "b1", "symbol": "D", "date": datetime(2024, 6, 20, 5, tzinfo=UTC),
+         "created_at": BEFORE_MIDNIGHT},
+        {"username": "other", "broker_id": "b9", "symbol": "E", "date": BEFORE_MIDNIGHT},
+    ])
+
+    by_day = store.trades_by_day("u", None, [date(2024, 6, 12), date(2024, 6, 13)])
+
+    assert {day: [t["symbol"] for t in trades] for day, trades in by_day.items()} == {
+        "2024-06-12": ["A", "B"],
+        "2024-06-13": ["C"],
+    }
+    first = by_day["2024-06-12"][0]
+    assert first["date"] == BEFORE_MIDNIGHT.astimezone(daily_activity.IST)
+    assert "created_at" not in first
+
+
+def test_trades_by_day_agrees_with_the_counters(db, store):
+    trades = [
+        {"username": "u", "broker_id": "b1", "symbol": "A", "date": BEFORE_MIDNIGHT},
+        {"username": "u", "broker_id": "b1", "symbol": "B", "created_at": AFTER_MIDNIGHT},
+    ]
+    for trade in trades:
+        db.trades_test.insert_one(dict(trade))
+        store.record_trade(trade)
+
+    days, _ = store.page("u")
+    by_day = store.trades_by_day("u", None, [d["date"] for d in days])
+    assert {day: len(t) for day, t in by_day.items()} == {d["date"].strftime('%Y-%m-%d'): d["trades"] for d in days}
+
+
+def test_logs_for_day_pages_newest_first(db, store):
+    db.logs_test.insert_many([
+        {"username": "u", "broker_id": "b1", "message": f"m{i}", "level": "INFO",
+         "timestamp": datetime(2024, 6, 12, 4, i, tzinfo=UTC)}
+        for i in range(3)
+    ] + [{"username": "u", "broker_id": "b1", "message": "next day", "level": "INFO", "timestamp": AFTER_MIDNIGHT}])
+
+    logs, has_more = store.logs_for_day("u", None, date(2024, 6, 12), limit=2)
+    assert [log["message"] for log in logs] == ["m2", "m1"]
+    assert has_more
+
+    logs, has_more = store.logs_for_day("u", None, date(2024, 6, 12), skip=2, limit=2)
+    assert [log["message"] for log in logs] == ["m0"]
+    assert not has_more
+
+
+# --- Backfill ---
+@pytest.fixture
+def python_day_counts(monkeypatch):
+    """mongomock can't run $dateToString with a timezone: count the same way in Python."""
+    def count_by_day(self, collection, ts_fields, username):
+        query = {"username": username} if username else {"username": {"$ne": None}}
+        found = Counter()
+        for doc in collection.find(query):
+            ts = next((doc[f] for f in ts_fields if doc.get(f) is not None), None)
+            if ts is not None:
+                found[(doc["username"], doc.get("broker_id"), ist_day(ts))] += 1
+        return dict(found)
+    monkeypatch.setattr(DailyActivityStore, "_count_by_day", count_by_day)
+
+
+def snapshot(db):
+    return sorted((d["username"], d["broker_id"], d["date"], d.get("logs", 0), d.get("trades", 0))
+                  for d in db.daily_activity_test.find())
+
+
+def test_backfill_rebuilds_and_is_idempotent(db, store, python_day_counts):
+    db.logs_test.insert_many([
+        {"username": "u", "broker_id": "b1", "timestamp": BEFORE_MIDNIGHT},
+        {"username": "u", "broker_id": "b1", "timestamp": AFTER_MIDNIGHT},
+        {"username": None, "broker_id": "b1", "timestamp": AFTER_MIDNIGHT},
+    ])
+    db.trades_test.insert_many([
+        {"username": "u", "broker_id": "b1", "date": BEFORE_MIDNIGHT},
+        {"username": "u", "broker_id": "b1", "created_at": AFTER_MIDNIGHT},
+    ])
+    # Drift: a day with no records behind it and a wrong count
+    store.record_days("u", "b1", {"2024-01-01": {"logs": 7}, "2024-06-12": {"logs": 99}})
+
+    assert store.backfill() == 2
+    first = snapshot(db)
+    assert first == [
+        ("u", "b1", "2024-06-12", 1, 1),
+        ("u", "b1", "2024-06-13", 1, 1),
+    ]
+
+    assert store.backfill() == 2
+    assert snapshot(db) == first
+
+
+def test_backfill_of_one_user_leaves_others_alone(db, store, python_day_counts):
+    db.logs_test.insert_one({"username": "u", "broker_id": "b1", "timestamp": BEFORE_MIDNIGHT})
+    store.record_log("other", "b9", BEFORE_MIDNIGHT)
+
+    store.backfill(username="u")
+    assert snapshot(db) == [
+        ("other", "b9", "2024-06-12", 1, 0),
+        ("u", "b1", "2024-06-12", 1, 0),
+    ]
+
+
+def test_trade_date_prefers_date():
+    assert trade_date({"date": BEFORE_MIDNIGHT, "created_at": AFTER_MIDNIGHT}) == BEFORE_MIDNIGHT
+    assert trade_date({"date": None, "created_at": AFTER_MIDNIGHT}) == AFTER_MIDNIGHT
+    assert trade_date({}) is None
@@ -0,0 +1,85 @@
+"""
+HistoryProviderChain: failover, and hedging only primaries that are actually slow.
+
+    python -m pytest -q tests
+"""
+
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from history_providers import HistoryProvider, HistoryProviderChain, HistoryUnavailable
+
+START, END = date(2024, 6, 10), date(2024, 6, 14)
+CANDLE = [1718150400, 1480.0, 1495.0, 1475.0, 1490.5, 1000]
+
+
+class FakeProvider(HistoryProvider):
+    def __init__(self, name, seconds=0.0, fails=False, latencies=()):
+        super().__init__(name, rate=1000)
+        self.seconds = seconds
+        self.fails = fails
+        self.calls = 0
+        self.latencies.extend(latencies)
+
+    def _fetch(self, symbol, resolution, from_date, to_date):
+        self.calls += 1
+        time.sleep(self.seconds)
+        if self.fails:
+            raise RuntimeError(f"{self.name} down")
+        return [CANDLE]
+
+
+def test_fails_over_in_priority_order():
+    chain = HistoryProviderChain([FakeProvider("fyers", fails=True), FakeProvider("yfinance")])
+
+    candles, source = chain.fetch("NSE:INFY-EQ", "D", START, END)
+    assert source == "yfinance"
+    assert list(candles.rows())[0][0] == CANDLE[0]
+
+
+def test_every_provider_failing_raises():
+    chain = HistoryProviderChain([FakeProvider("fyers", fails=True), FakeProvider("yfinance", fails=True)])
+
+    with pytest.raises(HistoryUnavailable, match="fyers down.*yfinance down"):
+        chain.fetch("NSE:INFY-EQ", "D", START, END)
+
+
+def test_slow_primary_is_hedged():
+    primary = FakeProvider("fyers", seconds=0.5, latencies=[0.05] * 20)
+    secondary = FakeProvider("yfinance")
+    chain = HistoryProviderChain([primary, secondary], hedge_percentile=95, hedge_min_samples=20, max_workers=1)
+    try:
+        _, source = chain.fetch("NSE:INFY-EQ", "D", START, END)
+    finally:
+        chain.close()
+
+    assert source == "yfinance"
+    assert chain.hedges == 1
+
+
+def test_queued_primaries_are_not_hedged():
+    # More callers than the pool has threads: primaries wait for a thread longer than
+    # the hedge delay, but each request itself is fast
+    primary = FakeProvider("fyers", seconds=0.1, latencies=[0.3] * 20)
+    secondary = FakeProvider("yfinance")
+    chain = HistoryProviderChain([primary, secondary], hedge_percentile=95, hedge_min_samples=20, max_workers=1)
+    sources = []
+
+    def caller():
+        sources.append(chain.fetch("NSE:INFY-EQ", "D", START, END)[1])
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        chain.close()
+
+    assert sources == ["fyers"] * 8
+    assert chain.hedges == 0
+    assert secondary.calls == 0
@@ -0,0 +1,127 @@
+"""
+HoldingsSnapshotService: a failed refresh keeps the last good snapshot.
+
+    python -m pytest -q tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("fyers_apiv3")
+pytest.importorskip("kiteconnect")
+
+import pytz
+
+from connectors.models import Holding
+from holdings_snapshots import HoldingsSnapshotService
+
+UTC = pytz.utc
+BROKER = {"broker_id": "b1", "broker_type": "zerodha", "username": "u", "display_name": "Kite"}
+INFY = Holding("NSE:INFY", 3, 1480.0, 1490.5, 31.5)
+
+
+class FakeConnector:
+    """get_holdings returns the scripted holdings or raises the scripted exception."""
+
+    def __init__(self, result):
+        self.result = result
+
+    def get_holdings(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return list(self.result)
+
+
+class FakeAsyncConnector(FakeConnector):
+    async def get_holdings(self):
+        return FakeConnector.get_holdings(self)
+
+
+class FakeRegistry:
+    def __init__(self, result):
+        self.result = result
+
+    def for_account(self, broker, asynchronous=False):
+        return (FakeAsyncConnector if asynchronous else FakeConnector)(self.result)
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient(tz_aware=True).db
+
+
+def service(db, result):
+    return HoldingsSnapshotService(db, env="test", registry=FakeRegistry(result), fresh_secs=60, timeout=1)
+
+
+def test_refresh_stores_holdings(db):
+    svc = service(db, [INFY])
+    assert svc.refresh([BROKER]) == {"b1": None}
+
+    snapshot = svc.get([BROKER])["b1"]
+    assert snapshot.holdings == [INFY]
+    assert snapshot.last_error is None
+
+
+def test_failed_refresh_keeps_last_good_snapshot(db):
+    service(db, [INFY]).refresh([BROKER])
+    before = db.holdings_snapshots_test.find_one({"broker_id": "b1"})
+
+    failing = service(db, Exception("TokenException: token expired"))
+    errors = failing.refresh([BROKER])
+    after = db.holdings_snapshots_test.find_one({"broker_id": "b1"})
+
+    assert "token expired" in errors["b1"]
+    assert after["holdings"] == before["holdings"]
+    assert after["fetched_at"] == before["fetched_at"]
+    assert "token expired" in after["last_error"]
+
+
+def test_never_fetched_broker_keeps_only_the_error(db):
+    svc = service(db, Exception("api down"))
+    snapshot = svc.get([BROKER])["b1"]
+
+    assert snapshot.holdings == []
+    assert snapshot.fetched_at is None
+    assert snapshot.last_error == "api down"
+
+
+def test_stale_snapshot_is_served_while_refreshing(db):
+    svc = service(db, [INFY])
+    svc.refresh([BROKER])
+    db.holdings_snapshots_test.update_one({"broker_id": "b1"},
+                                          {"$set": {"fetched_at": datetime.now(UTC) - timedelta(minutes=5)}})
+
+    snapshot = svc.get([BROKER])["b1"]
+    assert snapshot.holdings == [INFY]
+    assert snapshot.age() >= 60
+
+
+# --- Zerodha connectors raise instead of reporting "no holdings" ---
+class FailingKite:
+    def holdings(self):
+        raise Exception("Incorrect `api_key` or `access_token`.")
+
+
+def test_zerodha_get_holdings_raises_on_failure():
+    from connectors.zerodha import ZerodhaConnector
+
+    connector = ZerodhaConnector.__new__(ZerodhaConnector)
+    connector.name, connector.kite = "zerodha", FailingKite()
+    with pytest.raises(Exception, match="access_token"):
+        connector.get_holdings()
+
+
+def test_async_zerodha_get_holdings_raises_on_failure():
+    from connectors.async_base import run_sync
+    from connectors.async_zerodha import AsyncZerodhaConnector
+
+    async def failing_kite(*args, **kwargs):
+        raise Exception("Kite /portfolio/holdings failed: token expired")
+
+    connector = AsyncZerodhaConnector.__new__(AsyncZerodhaConnector)
+    connector._kite = failing_kite
+    with pytest.raises(Exception, match="token expired"):
+        run_sync(connector.get_holdings())
@@ -0,0 +1,141 @@
+"""
+IndicatorStore: O(1) running sums must stay equal to a full recompute.
+
+    python -m pytest -q tests
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import pytz
+
+from candle_store import CandleStore
+from config import MA_PERIOD
+from indicator_store import IndicatorStore
+from utils.trading_calendar import session_start, trading_days
+
+IST = pytz.timezone('Asia/Kolkata')
+SYMBOL = "NSE:INFY-EQ"
+PERIODS = [5, 20]
+
+
+def session_ts(d) -> int:
+    return int(IST.localize(datetime(d.year, d.month, d.day)).timestamp())
+
+
+def expected(closes, period):
+    """Full recompute of one period from the close series."""
+    window = closes[-period:]
+    if len(window) < period:
+        return {"count": len(window), "sum": pytest.approx(sum(window)), "mean": None, "deviation_pct": None}
+    mean = sum(window) / period
+    return {"count": period, "sum": pytest.approx(sum(window)), "mean": pytest.approx(mean),
+            "deviation_pct": pytest.approx((closes[-1] - mean) / mean * 100)}
+
+
+def stored(db):
+    return db.indicators_test.find_one({"_id": SYMBOL})
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient(tz_aware=True).db
+
+
+@pytest.fixture
+def candles(db):
+    """30 stored sessions ending at the current one (a rebuild reads up to today's, possibly partial, candle)."""
+    store = CandleStore(db, "test", mode="daily")
+    store.ensure_indexes()
+    end = session_start(1)
+    sessions = trading_days(end - timedelta(days=90), end)[-30:]
+    closes = [1000.0 + 7 * (i % 5) - i for i in range(len(sessions))]
+    store.bulk_write([store.candle_update(SYMBOL, session_ts(d), (c, c + 5, c - 5, c, 100))
+                      for d, c in zip(sessions, closes)])
+    return store, sessions, closes
+
+
+def test_running_sums_match_full_recompute_after_many_updates(db, candles):
+    store, sessions, closes = candles
+    indicators = IndicatorStore(db, "test")
+    indicators.rebuild(store, [SYMBOL], PERIODS)
+
+    rng = random.Random(7)
+    closes = list(closes)
+    last_ts = session_ts(sessions[-1])
+    for step in range(60):
+        if step % 4 == 3:
+            # Latest session re-fetched with a corrected close
+            close = round(rng.uniform(900, 1100), 2)
+            closes[-1] = close
+            indicators.apply(store, {SYMBOL: {last_ts: close}}, PERIODS)
+        else:
+            # One or two new sessions in a single sync
+            new = {}
+            for _ in range(1 + step % 2):
+                last_ts += 86400
+                new[last_ts] = round(rng.uniform(900, 1100), 2)
+                closes.append(new[last_ts])
+            indicators.apply(store, {SYMBOL: new}, PERIODS)
+
+        doc = stored(db)
+        assert doc["last_ts"] == last_ts
+        assert doc["last_close"] == closes[-1]
+        assert doc["closes"] == pytest.approx(closes[-max(PERIODS):])
+        for p in PERIODS:
+            assert doc["periods"][str(p)] == expected(closes, p)
+
+
+def test_window_fills_up_before_a_mean_is_published(db, candles):
+    store, sessions, closes = candles
+    # Only three sessions stored: the 5-session mean isn't defined yet
+    db.market_candles_test.delete_many({"date": {"$lt": IST.localize(datetime.combine(sessions[-3], datetime.min.time()))}})
+    indicators = IndicatorStore(db, "test")
+    indicators.rebuild(store, [SYMBOL], PERIODS)
+    assert stored(db)["periods"]["5"] == expected(closes[-3:], 5)
+
+    last_ts = session_ts(sessions[-1])
+    for i, close in enumerate([990.0, 991.0], start=1):
+        indicators.apply(store, {SYMBOL: {last_ts + i * 86400: close}}, PERIODS)
+    assert stored(db)["periods"]["5"] == expected(closes[-3:] + [990.0, 991.0], 5)
+    assert indicators.get_moving_averages([SYMBOL], 5)[SYMBOL]["mean"] == pytest.approx(
+        (sum(closes[-3:]) + 990.0 + 991.0) / 5)
+    assert indicators.get_moving_averages([SYMBOL], 20) == {}
+
+
+def test_correction_behind_latest_session_rebuilds_from_candles(db, candles):
+    store, sessions, closes = candles
+    indicators = IndicatorStore(db, "test")
+    indicators.rebuild(store, [SYMBOL], PERIODS)
+
+    # An older session is corrected in the candle store, then reported
+    corrected = session_ts(sessions[-4])
+    store.bulk_write([store.candle_update(SYMBOL, corrected, (900.0, 905.0, 895.0, 900.0, 100))])
+    indicators.apply(store, {SYMBOL: {corrected: 900.0}}, PERIODS)
+
+    closes = list(closes)
+    closes[-4] = 900.0
+    for p in PERIODS:
+        assert stored(db)["periods"][str(p)] == expected(closes, p)
+
+
+def test_missing_document_or_new_period_rebuilds(db, candles):
+    store, sessions, closes = candles
+    indicators = IndicatorStore(db, "test")
+
+    indicators.apply(store, {SYMBOL: {session_ts(sessions[-1]): closes[-1]}}, [5])
+    assert set(stored(db)["periods"]) == {"5"}
+
+    indicators.apply(store, {SYMBOL: {session_ts(sessions[-1]): closes[-1]}}, PERIODS)
+    assert set(stored(db)["periods"]) == {"5", "20"}
+    assert stored(db)["periods"]["20"] == expected(closes, 20)
+
+
+def test_periods_come_from_broker_accounts(db):
+    db.broker_accounts.insert_many([{"ma_period": 10}, {"ma_period": "50"}, {"ma_period": "x"}, {"ma_period": 0}, {}])
+
+    assert IndicatorStore(db, "test").get_periods() == sorted({MA_PERIOD, 10, 50})
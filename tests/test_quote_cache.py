@@ -0,0 +1,55 @@
+"""
+QuoteCache: freshness per reader, canonical keys, delayed sources kept out of order-grade reads.
+
+    python -m pytest -q tests
+"""
+
+import time
+
+import pytest
+
+from connectors.quote_cache import QuoteCache
+
+
+@pytest.fixture
+def cache():
+    return QuoteCache(ttl=300)
+
+
+def test_spellings_share_an_entry(cache):
+    cache.put("NSE:INFY-EQ", 1490.5, "fyers")
+
+    assert cache.get("NSE:INFY") == 1490.5
+    assert cache.get("INFY.NS") == 1490.5
+
+
+def test_readers_choose_their_freshness(cache):
+    cache.put("NSE:INFY-EQ", 1490.5, "fyers", at=time.time() - 60)
+
+    assert cache.get("NSE:INFY-EQ", max_age=5) is None
+    assert cache.get("NSE:INFY-EQ", max_age=300) == 1490.5
+
+
+def test_older_observation_never_replaces_newer(cache):
+    cache.put("NSE:INFY-EQ", 1490.5, "fyers")
+    cache.put("NSE:INFY-EQ", 1400.0, "fyers", at=time.time() - 30)
+
+    assert cache.get("NSE:INFY-EQ") == 1490.5
+
+
+def test_delayed_prices_are_display_only(cache):
+    cache.put_many({"NSE:INFY-EQ": 1490.5, "NSE:TCS-EQ": 3900.0}, "yfinance")
+
+    assert cache.get("NSE:INFY-EQ", max_age=5) == 1490.5
+    assert cache.get("NSE:INFY-EQ", max_age=5, realtime=True) is None
+    assert cache.get_many(["NSE:INFY-EQ", "NSE:TCS-EQ"], max_age=5, realtime=True) == {}
+
+    cache.put("NSE:INFY-EQ", 1491.0, "zerodha")
+    assert cache.get("NSE:INFY-EQ", max_age=5, realtime=True) == 1491.0
+
+
+def test_invalid_prices_are_ignored(cache):
+    for price in (0, -1, None, "n/a"):
+        cache.put("NSE:INFY-EQ", price, "fyers")
+
+    assert cache.get("NSE:INFY-EQ") is None
@@ -0,0 +1,210 @@
+"""
+place_order_safely / place_orders_safely: an order must never be sent twice
+unless the broker's order book confirms it isn't there.
+
+    python -m pytest -q tests
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from connectors import retry
+from connectors.retry import RetryBudget, place_order_safely, place_orders_safely
+
+THROTTLED = {"s": "error", "code": 429, "message": "request limit reached"}
+# Fyers' throttle codes are >= 500 but mean "not placed", never "maybe placed"
+THROTTLE_CODES = (429, 10006, 10007)
+
+
+def throttled(code):
+    return {"s": "error", "code": code, "message": "request limit reached"}
+
+
+class FakeBroker:
+    """Scripted responses for place_order / place_orders; the order book holds accepted tags."""
+
+    def __init__(self, responses=(), basket=None, lookup_fails=False):
+        self.responses = list(responses)
+        self.basket = basket
+        self.lookup_fails = lookup_fails
+        self.book = []
+        self.sent = []
+        self.lookups = 0
+
+    def _accept(self, tag):
+        order_id = f"OID{len(self.book) + 1}"
+        self.book.append(SimpleNamespace(order_id=order_id, tag=tag))
+        return order_id
+
+    def place_order(self, tag=None, **order):
+        self.sent.append(tag)
+        response = self.responses.pop(0)
+        if response == "ok":
+            return {"s": "ok", "id": self._accept(tag)}
+        if response == "timeout_after_accept":
+            self._accept(tag)
+            raise TimeoutError("read timed out")
+        if response == "timeout":
+            raise TimeoutError("read timed out")
+        return dict(response)
+
+    def place_orders(self, legs):
+        self.sent.extend(leg["tag"] for leg in legs)
+        results = []
+        for leg, outcome in zip(legs, self.basket):
+            if outcome == "ok":
+                results.append({"s": "ok", "id": self._accept(leg["tag"])})
+            elif outcome == "lost_after_accept":
+                self._accept(leg["tag"])
+                results.append({"s": "error", "message": "gateway timeout", "code": 504})
+            elif outcome == "lost":
+                results.append({"s": "error", "message": "gateway timeout", "code": 504})
+            else:
+                results.append(dict(outcome))
+        return results
+
+    def get_orders(self):
+        self.lookups += 1
+        if self.lookup_fails:
+            raise ConnectionError("order book unavailable")
+        return list(self.book)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(retry.time, "sleep", sleeps.append)
+    return sleeps
+
+
+ORDER = {"symbol": "NSE:INFY-EQ", "qty": 1, "side": "BUY", "order_type": "MARKET"}
+
+
+# --- place_order_safely ---
+def test_ambiguous_then_found_is_not_resent(no_sleep):
+    broker = FakeBroker(["timeout_after_accept", "ok"])
+    response = place_order_safely(broker, RetryBudget(), tag="nsabc", **ORDER)
+
+    assert response["s"] == "ok"
+    assert response["id"] == "OID1"
+    assert broker.sent == ["nsabc"]
+    assert broker.lookups == 1
+    assert retry.ORDER_SETTLE_SECS in no_sleep
+
+
+def test_ambiguous_and_absent_is_resent_once():
+    broker = FakeBroker(["timeout", "ok"])
+    response = place_order_safely(broker, RetryBudget(), tag="nsabc", **ORDER)
+
+    assert response["s"] == "ok"
+    assert broker.sent == ["nsabc", "nsabc"]
+    assert len(broker.book) == 1
+
+
+def test_ambiguous_with_failed_lookup_is_not_resent():
+    broker = FakeBroker(["timeout_after_accept", "ok"], lookup_fails=True)
+    response = place_order_safely(broker, RetryBudget(), tag="nsabc", **ORDER)
+
+    assert response["s"] == "error"
+    assert "state unknown" in response["message"]
+    assert broker.sent == ["nsabc"]
+
+
+def test_settle_wait_is_fixed_not_jittered(monkeypatch, no_sleep):
+    monkeypatch.setattr(retry.random, "uniform", lambda a, b: 0.0)
+    broker = FakeBroker(["timeout", "ok"])
+    place_order_safely(broker, RetryBudget(), **ORDER)
+
+    assert no_sleep[0] == retry.ORDER_SETTLE_SECS > 0
+
+
+@pytest.mark.parametrize("code", THROTTLE_CODES)
+def test_throttled_is_retried_with_the_same_tag(code, no_sleep):
+    broker = FakeBroker([throttled(code), "ok"])
+    response = place_order_safely(broker, RetryBudget(), tag="nsabc", **ORDER)
+
+    assert response["s"] == "ok"
+    assert broker.sent == ["nsabc", "nsabc"]
+    assert broker.lookups == 0
+    assert retry.ORDER_SETTLE_SECS not in no_sleep
+
+
+def test_exhausted_budget_stops_retries():
+    budget = RetryBudget(max_retries=0)
+
+    throttled = FakeBroker([THROTTLED, "ok"])
+    assert place_order_safely(throttled, budget, **ORDER)["code"] == 429
+    assert len(throttled.sent) == 1
+
+    # Still looked up (that never double-submits), but not re-sent
+    absent = FakeBroker(["timeout", "ok"])
+    response = place_order_safely(absent, budget, **ORDER)
+    assert response["s"] == "error"
+    assert len(absent.sent) == 1
+    assert absent.lookups == 1
+
+
+def test_rejection_is_returned_as_is():
+    broker = FakeBroker([{"s": "error", "code": -50, "message": "insufficient funds"}])
+    response = place_order_safely(broker, RetryBudget(), **ORDER)
+
+    assert response["message"] == "insufficient funds"
+    assert len(broker.sent) == 1
+    assert broker.lookups == 0
+
+
+# --- place_orders_safely ---
+def test_basket_ambiguous_legs_found_in_one_lookup():
+    broker = FakeBroker(basket=["ok", "lost_after_accept", "lost_after_accept"])
+    results = place_orders_safely(broker, RetryBudget(), [dict(ORDER) for _ in range(3)])
+
+    assert [r["s"] for r in results] == ["ok", "ok", "ok"]
+    assert broker.lookups == 1
+    assert len(broker.sent) == 3
+
+
+def test_basket_absent_leg_is_resent_alone():
+    broker = FakeBroker(["ok"], basket=["ok", "lost"])
+    results = place_orders_safely(broker, RetryBudget(), [dict(ORDER), dict(ORDER)])
+
+    assert [r["s"] for r in results] == ["ok", "ok"]
+    assert broker.sent.count(results[1]["tag"]) == 2
+    assert broker.sent.count(results[0]["tag"]) == 1
+
+
+def test_basket_failed_lookup_resends_nothing():
+    broker = FakeBroker(["ok"], basket=["lost_after_accept", "lost"], lookup_fails=True)
+    results = place_orders_safely(broker, RetryBudget(), [dict(ORDER), dict(ORDER)])
+
+    assert all("state unknown" in r["message"] for r in results)
+    assert len(broker.sent) == 2
+
+
+@pytest.mark.parametrize("code", THROTTLE_CODES)
+def test_basket_throttled_leg_is_resent_once(code):
+    broker = FakeBroker(["ok", "ok"], basket=["ok", throttled(code)])
+    results = place_orders_safely(broker, RetryBudget(), [dict(ORDER), dict(ORDER)])
+
+    assert [r["s"] for r in results] == ["ok", "ok"]
+    assert broker.lookups == 0
+    assert len(broker.book) == 2
+    assert broker.sent.count(results[1]["tag"]) == 2
+
+
+def test_basket_ambiguous_and_throttled_legs_each_resent_once():
+    broker = FakeBroker(["ok", "ok"], basket=["lost", throttled(10006)])
+    results = place_orders_safely(broker, RetryBudget(), [dict(ORDER), dict(ORDER)])
+
+    assert [r["s"] for r in results] == ["ok", "ok"]
+    assert broker.lookups == 1
+    assert len(broker.book) == 2
+
+
+def test_basket_exhausted_budget_resends_nothing():
+    broker = FakeBroker(["ok", "ok"], basket=["lost", THROTTLED])
+    results = place_orders_safely(broker, RetryBudget(max_retries=0), [dict(ORDER), dict(ORDER)])
+
+    assert [r["s"] for r in results] == ["error", "error"]
+    assert len(broker.sent) == 2
+    assert broker.lookups == 1
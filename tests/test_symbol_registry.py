@@ -0,0 +1,67 @@
+"""
+SymbolRegistry: every spelling of a stock resolves to one canonical symbol.
+
+    python -m pytest -q tests
+"""
+
+import pytest
+
+from utils.symbol_registry import SymbolRegistry
+
+
+@pytest.fixture
+def registry():
+    return SymbolRegistry(["NSE:BAJAJ-AUTO", "NSE:M&M", "NSE:SUZLON-BE"])
+
+
+@pytest.mark.parametrize("spelling", ["NSE:BAJAJ-AUTO", "NSE:BAJAJ-AUTO-EQ", "BAJAJ-AUTO.NS", " nse:bajaj-auto-eq "])
+def test_spellings_share_one_canonical(registry, spelling):
+    forms = registry.forms(spelling)
+
+    assert forms.canonical == "NSE:BAJAJ-AUTO"
+    assert forms.tradingsymbol == "BAJAJ-AUTO"   # the hyphen in the name isn't a series
+    assert forms.fyers == "NSE:BAJAJ-AUTO-EQ"
+    assert forms.zerodha == "NSE:BAJAJ-AUTO"
+    assert forms.yahoo == "BAJAJ-AUTO.NS"
+
+
+def test_conversions(registry):
+    assert registry.to_fyers("NSE:M&M") == "NSE:M&M-EQ"
+    assert registry.to_zerodha("NSE:M&M-EQ") == "NSE:M&M"
+    assert registry.to_yahoo("NSE:M&M-EQ") == "M&M.NS"
+    assert registry.canonical("M&M.NS") == "NSE:M&M"
+
+
+def test_be_series_is_not_folded_into_eq(registry):
+    be = registry.forms("NSE:SUZLON-BE")
+    eq = registry.forms("NSE:SUZLON-EQ")
+
+    assert be.canonical == "NSE:SUZLON-BE" != eq.canonical == "NSE:SUZLON"
+    assert (be.series, eq.series) == ("BE", "EQ")
+    assert be.fyers == "NSE:SUZLON-BE"
+    assert be.zerodha == "NSE:SUZLON-BE"
+    assert registry.tradingsymbol("NSE:SUZLON-BE") == "SUZLON-BE"
+
+
+def test_yahoo_spelling_resolves_to_eq(registry):
+    # Yahoo has no series: SUZLON.NS is the EQ stock even though only -BE was registered
+    assert registry.canonical("SUZLON.NS") == "NSE:SUZLON"
+    assert registry.to_yahoo("NSE:SUZLON-BE") == "SUZLON.NS"
+
+
+def test_bse_symbols(registry):
+    forms = registry.forms("RELIANCE.BO")
+
+    assert forms.canonical == "BSE:RELIANCE"
+    assert forms.exchange == "BSE"
+    assert registry.canonical("BSE:RELIANCE-EQ") == "BSE:RELIANCE"
+
+
+def test_unknown_symbols_are_memoized(registry):
+    assert "NSE:INFY-EQ" not in registry
+    size = len(registry)
+
+    registry.canonical("NSE:INFY-EQ")
+    assert "NSE:INFY-EQ" in registry and "INFY.NS" in registry
+    registry.canonical("INFY.NS")
+    assert len(registry) == size + 1
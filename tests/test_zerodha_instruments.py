@@ -0,0 +1,97 @@
+"""
+InstrumentMaster: one download per IST day, and a failed download falls back to the last file.
+
+    python -m pytest -q tests
+"""
+
+import json
+
+import pytest
+
+from connectors import zerodha_instruments
+from connectors.zerodha_instruments import INSTRUMENT_FIELDS, InstrumentMaster
+
+INFY = {"tradingsymbol": "INFY", "instrument_token": 408065, "exchange_token": 1594, "name": "INFOSYS",
+        "instrument_type": "EQ", "segment": "NSE", "tick_size": 0.05, "lot_size": 1}
+
+
+class FakeKite:
+    def __init__(self, fails=False):
+        self.fails = fails
+        self.calls = 0
+
+    def instruments(self, exchange):
+        self.calls += 1
+        if self.fails:
+            raise ConnectionError("instruments dump unavailable")
+        return [INFY]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(zerodha_instruments.time, "monotonic", clock)
+    return clock
+
+
+def write_file(master, day, token=408065):
+    with open(master.path, "w") as f:
+        json.dump({"exchange": "NSE", "date": day, "fields": INSTRUMENT_FIELDS,
+                   "rows": {"INFY": [token, 1594, "INFOSYS", "EQ", "NSE", 0.05, 1]}}, f)
+
+
+def test_downloads_once_per_day(tmp_path, clock):
+    kite = FakeKite()
+    master = InstrumentMaster("NSE", cache_dir=str(tmp_path))
+
+    assert master.ensure_loaded(kite) and master.ensure_loaded(kite)
+    assert kite.calls == 1
+    assert master.get_token("NSE:INFY-EQ") == 408065
+
+    # Another process picks up today's file without downloading
+    other = InstrumentMaster("NSE", cache_dir=str(tmp_path))
+    assert other.ensure_loaded(FakeKite(fails=True))
+    assert other.symbol_for_token(408065) == "INFY"
+
+
+def test_failed_download_serves_previous_days_file(tmp_path, clock):
+    master = InstrumentMaster("NSE", cache_dir=str(tmp_path))
+    write_file(master, "2020-01-01", token=111)
+    kite = FakeKite(fails=True)
+
+    assert master.ensure_loaded(kite)
+    assert master.get_token("INFY") == 111
+    assert kite.calls == 1
+
+
+def test_failed_download_backs_off(tmp_path, clock):
+    master = InstrumentMaster("NSE", cache_dir=str(tmp_path))
+    kite = FakeKite(fails=True)
+
+    assert not master.ensure_loaded(kite)
+    assert not master.ensure_loaded(kite)
+    assert kite.calls == 1
+    assert master.known(["NSE:INFY-EQ"]) == ["NSE:INFY-EQ"]   # no index: nothing filtered out
+
+    clock.now += zerodha_instruments.INSTRUMENT_RETRY_SECS
+    kite.fails = False
+    assert master.ensure_loaded(kite)
+    assert kite.calls == 2
+    assert master.get_token("INFY") == 408065
+
+
+def test_no_client_falls_back_to_last_file(tmp_path, clock):
+    master = InstrumentMaster("NSE", cache_dir=str(tmp_path))
+    assert not master.ensure_loaded(None)
+
+    write_file(master, "2020-01-01")
+    assert master.ensure_loaded(None)
+    assert master.get("NSE:INFY")["instrument_token"] == 408065
@@ -4,7 +4,7 @@ import logging
 from datetime import datetime
 import pytz
 from pymongo import MongoClient
-from connectors.fyers import FyersConnector
+from connectors.registry import connector_registry
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -48,11 +48,8 @@ class TokenManager:
             return False
 
         # Initialize Connector
-        connector = FyersConnector(
-            api_key=api_key, 
-            api_secret=api_secret, 
-            access_token=access_token,
-            pin=pin
+        connector = connector_registry.get(
+            'fyers', api_key, api_secret, access_token, pin=pin, broker_id=broker_id
         )
 
         # 1. Check Validity
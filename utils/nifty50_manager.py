@@ -24,7 +24,9 @@ load_dotenv()
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import MONGO_DB_NAME, MONGO_ENV
+from config import MONGO_DB_NAME, MONGO_ENV, QUOTE_MAX_AGE_DISPLAY
+from connectors.quote_cache import quote_cache
+from utils.symbol_registry import symbol_registry
 
 UTC = pytz.utc
 IST = pytz.timezone('Asia/Kolkata')
@@ -74,6 +76,7 @@ class Nifty50Manager:
         
         # Return only active symbols
         symbols = [s['symbol'] for s in doc.get('symbols', []) if s.get('status') == 'active']
+        symbol_registry.register_many(symbols)
         logging.info(f"Loaded {len(symbols)} active symbols from DB")
         return symbols
     
@@ -88,7 +91,7 @@ class Nifty50Manager:
     
     def _get_hardcoded_symbols(self) -> List[str]:
         """Fallback hardcoded NIFTY 50 symbols"""
-        return [
+        symbols = [
             "NSE:RELIANCE-EQ", "NSE:TCS-EQ", "NSE:HDFCBANK-EQ", "NSE:INFY-EQ",
             "NSE:HINDUNILVR-EQ", "NSE:ICICIBANK-EQ", "NSE:KOTAKBANK-EQ",
             "NSE:SBIN-EQ", "NSE:BHARTIARTL-EQ", "NSE:BAJFINANCE-EQ",
@@ -107,6 +110,8 @@ class Nifty50Manager:
             "NSE:SHREECEM-EQ", "NSE:ADANIENT-EQ", "NSE:LTIM-EQ",
             "NSE:TRENT-EQ"
         ]
+        symbol_registry.register_many(symbols)
+        return symbols
     
     def fetch_from_nse(self) -> Optional[List[Dict]]:
         """
@@ -174,17 +179,13 @@ class Nifty50Manager:
         logging.info("📡 Fetching from Fyers API (backup)...")
         
         try:
-            from connectors.fyers import FyersConnector
+            from connectors.registry import connector_registry
             
             if not all([self.fyers_api_key, self.fyers_api_secret, self.fyers_access_token]):
                 logging.error("Fyers credentials not available")
                 return None
             
-            connector = FyersConnector(
-                api_key=self.fyers_api_key,
-                api_secret=self.fyers_api_secret,
-                access_token=self.fyers_access_token
-            )
+            connector = connector_registry.get('fyers', self.fyers_api_key, self.fyers_api_secret, self.fyers_access_token)
             
             # Get all symbols from Fyers
             data = connector.get_data()
@@ -205,7 +206,7 @@ class Nifty50Manager:
                 if sym in current_list:
                     fyers_symbols.append({
                         'symbol': sym,
-                        'company_name': sym.replace('NSE:', '').replace('-EQ', ''),
+                        'company_name': symbol_registry.tradingsymbol(sym),
                         'source': 'FYERS'
                     })
             
@@ -223,35 +224,34 @@ class Nifty50Manager:
         Returns: (is_valid, current_price)
         """
         try:
+            # Any recent quote proves the symbol trades
+            cached = quote_cache.get(symbol, QUOTE_MAX_AGE_DISPLAY)
+            if cached:
+                return (True, cached)
+
             # Try Fyers first
-            from connectors.fyers import FyersConnector
+            from connectors.registry import connector_registry
             
             if all([self.fyers_api_key, self.fyers_api_secret, self.fyers_access_token]):
-                connector = FyersConnector(
-                    api_key=self.fyers_api_key,
-                    api_secret=self.fyers_api_secret,
-                    access_token=self.fyers_access_token
-                )
+                connector = connector_registry.get('fyers', self.fyers_api_key, self.fyers_api_secret, self.fyers_access_token)
                 
                 quote = connector.get_quote(symbol)
                 
-                if quote.get('s') == 'ok' and 'd' in quote and len(quote['d']) > 0:
-                    price = float(quote['d'][0]['v'].get('lp', 0))
-                    if price > 0:
-                        return (True, price)
+                if quote and quote.ltp > 0:
+                    return (True, quote.ltp)
             
             # Fallback to YFinance
             try:
                 import yfinance as yf
                 
                 # Convert symbol format: NSE:SYMBOL-EQ -> SYMBOL.NS
-                ticker_symbol = symbol.replace('NSE:', '').replace('-EQ', '')
-                yf_symbol = f"{ticker_symbol}.NS"
+                yf_symbol = symbol_registry.to_yahoo(symbol)
                 
                 ticker = yf.Ticker(yf_symbol)
                 price = ticker.fast_info.last_price
                 
                 if price and price > 0:
+                    quote_cache.put(symbol, price, "yfinance")
                     return (True, float(price))
                     
             except Exception:
@@ -494,27 +494,21 @@ class Nifty50Manager:
             if result.get('symbols_removed'):
                 # Check if user has positions in removed stocks
                 try:
-                    from connectors.fyers import FyersConnector
+                    from connectors.registry import connector_registry
                     
                     if all([self.fyers_api_key, self.fyers_api_secret, self.fyers_access_token]):
-                        connector = FyersConnector(
-                            api_key=self.fyers_api_key,
-                            api_secret=self.fyers_api_secret,
-                            access_token=self.fyers_access_token
-                        )
+                        connector = connector_registry.get('fyers', self.fyers_api_key, self.fyers_api_secret, self.fyers_access_token)
                         
                         holdings = connector.get_holdings()
                         
                         for removed_sym in result['symbols_removed']:
                             for holding in holdings:
-                                if holding.get('symbol') == removed_sym:
-                                    qty = holding.get('quantity', 0)
-                                    if qty > 0:
-                                        positions_in_removed.append({
-                                            'symbol': removed_sym,
-                                            'quantity': qty,
-                                            'avg_price': holding.get('costPrice', 0)
-                                        })
+                                if holding.symbol == removed_sym and holding.quantity > 0:
+                                    positions_in_removed.append({
+                                        'symbol': removed_sym,
+                                        'quantity': holding.quantity,
+                                        'avg_price': holding.avg_price
+                                    })
                 except Exception as e:
                     logging.error(f"Failed to check positions: {e}")
             
@@ -563,7 +557,7 @@ class Nifty50Manager:
                     "$push": {
                         "symbols": {
                             "symbol": symbol,
-                            "company_name": company_name or symbol.replace('NSE:', '').replace('-EQ', ''),
+                            "company_name": company_name or symbol_registry.tradingsymbol(symbol),
                             "status": "active",
                             "added_date": datetime.now(UTC),
                             "removed_date": None,
@@ -0,0 +1,125 @@
+"""
+Symbol Registry
+
+One place that knows how a stock is spelled by each system:
+
+    canonical   NSE:BAJAJ-AUTO         (exchange:tradingsymbol)
+    fyers       NSE:BAJAJ-AUTO-EQ
+    zerodha     NSE:BAJAJ-AUTO         (tradingsymbol BAJAJ-AUTO)
+    yahoo       BAJAJ-AUTO.NS
+
+Only the EQ series is spelled without its suffix. Other series keep it in
+every broker form (NSE:SUZLON-BE is its own instrument, not SUZLON); Yahoo
+has no series, so its spelling resolves to the EQ symbol.
+
+Forms are precomputed into dicts in both directions, so conversion and
+reconciliation are exact O(1) lookups. The registry is seeded from the
+NIFTY 50 constituents and the Zerodha instrument master; any other symbol
+is parsed once on first sight and memoized.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable
+
+YAHOO_SUFFIX = {"NSE": ".NS", "BSE": ".BO"}
+EQ_SERIES = "EQ"
+SERIES = ("EQ", "BE")    # NSE series the registry recognises in a -SUFFIX
+
+
+@dataclass(frozen=True)
+class SymbolForms:
+    canonical: str
+    exchange: str
+    tradingsymbol: str
+    series: str
+    fyers: str
+    zerodha: str
+    yahoo: str
+
+
+def _parse(symbol: str) -> SymbolForms:
+    """Derive every form from any one spelling (the only place that does string surgery)."""
+    s = symbol.strip().upper()
+    exchange, series = "NSE", EQ_SERIES
+    for exch, suffix in YAHOO_SUFFIX.items():
+        if s.endswith(suffix):
+            exchange, s = exch, s[:-len(suffix)]
+            break
+    else:
+        if ':' in s:
+            exchange, s = s.split(':', 1)
+            name, _, suffix = s.rpartition('-')
+            if name and suffix in SERIES:
+                s, series = name, suffix
+    # Brokers spell EQ as the bare name (Fyers adds -EQ); any other series stays on it
+    tradingsymbol = s if series == EQ_SERIES else f"{s}-{series}"
+    return SymbolForms(
+        canonical=f"{exchange}:{tradingsymbol}",
+        exchange=exchange,
+        tradingsymbol=tradingsymbol,
+        series=series,
+        fyers=f"{exchange}:{s}-{series}",
+        zerodha=f"{exchange}:{tradingsymbol}",
+        yahoo=f"{s}{YAHOO_SUFFIX.get(exchange, '.NS')}"
+    )
+
+
+class SymbolRegistry:
+    """Bidirectional canonical <-> Fyers / Zerodha / Yahoo symbol maps."""
+
+    def __init__(self, symbols: Iterable[str] = ()):
+        self._forms: Dict[str, SymbolForms] = {}     # canonical -> forms
+        self._lookup: Dict[str, str] = {}            # any known spelling -> canonical
+        self._lock = threading.Lock()
+        self.register_many(symbols)
+
+    def register(self, symbol: str) -> SymbolForms:
+        forms = _parse(symbol)
+        with self._lock:
+            existing = self._forms.get(forms.canonical)
+            if existing:
+                self._lookup[symbol] = existing.canonical
+                return existing
+            self._forms[forms.canonical] = forms
+            for spelling in (symbol, forms.canonical, forms.fyers, forms.zerodha):
+                self._lookup[spelling] = forms.canonical
+            # A Yahoo spelling names no series: it belongs to the EQ symbol
+            if forms.series == EQ_SERIES:
+                self._lookup[forms.yahoo] = forms.canonical
+        return forms
+
+    def register_many(self, symbols: Iterable[str]):
+        for symbol in symbols:
+            self.register(symbol)
+
+    def forms(self, symbol: str) -> SymbolForms:
+        canonical = self._lookup.get(symbol)
+        if canonical is None:
+            return self.register(symbol)
+        return self._forms[canonical]
+
+    # --- Conversions ---
+    def canonical(self, symbol: str) -> str:
+        return self.forms(symbol).canonical
+
+    def to_fyers(self, symbol: str) -> str:
+        return self.forms(symbol).fyers
+
+    def to_zerodha(self, symbol: str) -> str:
+        return self.forms(symbol).zerodha
+
+    def to_yahoo(self, symbol: str) -> str:
+        return self.forms(symbol).yahoo
+
+    def tradingsymbol(self, symbol: str) -> str:
+        return self.forms(symbol).tradingsymbol
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._lookup
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+
+symbol_registry = SymbolRegistry()
@@ -0,0 +1,108 @@
+"""
+NSE Trading Calendar
+
+Equity-segment sessions for the National Stock Exchange: weekdays minus the
+exchange holidays, plus the odd special weekend/holiday session (budget day,
+Muhurat trading) for which Fyers publishes a daily candle.
+
+Holiday lists come from the NSE annual holiday circulars. Add the next year's
+list when NSE publishes it; years without a list fall back to weekdays only.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+import pytz
+
+IST = pytz.timezone('Asia/Kolkata')
+
+MARKET_CLOSE = time(15, 30)
+
+NSE_HOLIDAYS = {
+    # 2023
+    date(2023, 1, 26), date(2023, 3, 7), date(2023, 3, 30), date(2023, 4, 4),
+    date(2023, 4, 7), date(2023, 4, 14), date(2023, 5, 1), date(2023, 6, 28),
+    date(2023, 8, 15), date(2023, 9, 19), date(2023, 10, 2), date(2023, 10, 24),
+    date(2023, 11, 14), date(2023, 11, 27), date(2023, 12, 25),
+    # 2024
+    date(2024, 1, 22), date(2024, 1, 26), date(2024, 3, 8), date(2024, 3, 25),
+    date(2024, 3, 29), date(2024, 4, 11), date(2024, 4, 17), date(2024, 5, 1),
+    date(2024, 5, 20), date(2024, 6, 17), date(2024, 7, 17), date(2024, 8, 15),
+    date(2024, 10, 2), date(2024, 11, 1), date(2024, 11, 15), date(2024, 11, 20),
+    date(2024, 12, 25),
+    # 2025
+    date(2025, 2, 26), date(2025, 3, 14), date(2025, 3, 31), date(2025, 4, 10),
+    date(2025, 4, 14), date(2025, 4, 18), date(2025, 5, 1), date(2025, 8, 15),
+    date(2025, 8, 27), date(2025, 10, 2), date(2025, 10, 21), date(2025, 10, 22),
+    date(2025, 11, 5), date(2025, 12, 25),
+    # 2026
+    date(2026, 1, 26), date(2026, 3, 3), date(2026, 3, 26), date(2026, 3, 31),
+    date(2026, 4, 3), date(2026, 4, 14), date(2026, 5, 1), date(2026, 5, 28),
+    date(2026, 6, 26), date(2026, 9, 14), date(2026, 10, 2), date(2026, 10, 20),
+    date(2026, 11, 10), date(2026, 11, 24), date(2026, 12, 25),
+}
+
+# Sessions held on a weekend or holiday (Muhurat trading, special live sessions)
+NSE_SPECIAL_SESSIONS = {
+    date(2023, 11, 12),
+    date(2024, 1, 20), date(2024, 3, 2), date(2024, 11, 1),
+    date(2025, 2, 1), date(2025, 10, 21),
+}
+
+
+def is_trading_day(d: date) -> bool:
+    if d in NSE_SPECIAL_SESSIONS:
+        return True
+    return d.weekday() < 5 and d not in NSE_HOLIDAYS
+
+
+def trading_days(start: date, end: date) -> List[date]:
+    """All sessions in [start, end], oldest first."""
+    days = []
+    d = start
+    while d <= end:
+        if is_trading_day(d):
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def previous_trading_day(d: date) -> date:
+    """Latest session strictly before d."""
+    d -= timedelta(days=1)
+    while not is_trading_day(d):
+        d -= timedelta(days=1)
+    return d
+
+
+def last_completed_session(now: Optional[datetime] = None) -> date:
+    """Latest session whose daily candle is final (today only after the close)."""
+    now = now.astimezone(IST) if now else datetime.now(IST)
+    today = now.date()
+    if is_trading_day(today) and now.time() >= MARKET_CLOSE:
+        return today
+    return previous_trading_day(today)
+
+
+def session_start(n: int, end: Optional[date] = None) -> date:
+    """First session of the last n sessions ending at `end` (inclusive, default today)."""
+    d = end or datetime.now(IST).date()
+    if not is_trading_day(d):
+        d = previous_trading_day(d)
+    for _ in range(n - 1):
+        d = previous_trading_day(d)
+    return d
+
+
+def session_ranges(days: List[date]) -> List[tuple]:
+    """
+    Group sessions into (first, last) runs with no other session between them,
+    e.g. a Friday and the following Monday form one run.
+    """
+    ranges = []
+    for d in sorted(days):
+        if ranges and previous_trading_day(d) == ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], d)
+        else:
+            ranges.append((d, d))
+    return ranges